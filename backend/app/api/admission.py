@@ -0,0 +1,60 @@
+from contextlib import asynccontextmanager
+import time
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from app import config
+from app.services.admission import (
+    AdmissionLimiter, AdmissionRejected, cpu_limiter, request_wait_budget, start_wait_budget
+)
+
+# Generation endpoints put under admission control
+ADMITTED_PATHS = {"/generate", "/generate/batch"}
+
+
+class AdmissionMiddleware:
+    """
+    Starts the wait budget of generation requests, and turns them away with
+    429 before their upload is read when the CPU queue is already full.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or not config.ADMISSION_ENABLED
+                or scope["method"] != "POST" or scope["path"] not in ADMITTED_PATHS):
+            await self.app(scope, receive, send)
+            return
+
+        start_wait_budget()
+        try:
+            cpu_limiter.check_queue()
+        except AdmissionRejected as e:
+            response = JSONResponse(
+                {"detail": str(e)}, status_code=e.status_code, headers={"Retry-After": str(e.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+
+        await self.app(scope, receive, send)
+
+
+@asynccontextmanager
+async def admitted(limiter: AdmissionLimiter):
+    """
+    Holds a slot of `limiter` for the enclosed work. Raises an HTTPException
+    with a Retry-After header when the request is not admitted.
+    """
+    if not config.ADMISSION_ENABLED:
+        yield
+        return
+
+    try:
+        await limiter.acquire(request_wait_budget())
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        limiter.release(time.monotonic() - start)
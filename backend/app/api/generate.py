@@ -1,9 +1,21 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, UploadFile, File, Form, Header, HTTPException
 from fastapi.responses import StreamingResponse
-from typing import Optional
-from app.services.template_parser import analyze_presentation
-from app.services.slide_planner import generate_slide_plan
-from app.services.ppt.ppt_exporter import generate_presentation
+from typing import List, Optional
+from app import config
+from app.api.admission import admitted
+from app.services.admission import cpu_limiter, llm_limiter
+from app.services.batch_generator import generate_batch
+from app.services.metrics import timed
+from app.services.profiler import ProfiledStreamingResponse, start_request_profile
+from app.services.uploads import open_upload
+from app.services.slide_planner import generate_slide_plan, needs_chunked_planning, StreamedPlan
+from app.services.ppt_executor import (
+    open_template, open_registered_template, analyze_template, stream_presentation,
+    supports_streamed_export, export_streamed
+)
+import asyncio
+import functools
+import hmac
 import logging
 
 # Configure logger
@@ -17,44 +29,141 @@ async def generate_ppt(
     text_input: str = Form(...),
     guidance: Optional[str] = Form(None),
     api_key: str = Form(...),
-    file: UploadFile = File(...)
+    file: Optional[UploadFile] = File(None),
+    template_id: Optional[str] = Form(None),
+    x_ppt_profile: Optional[str] = Header(None)
 ):
-    if not api_key:
-        raise HTTPException(status_code=400, detail="API Key is required")
+    """
+    Generates a deck from an uploaded template (`file`) or a registered one (`template_id`).
+    """
+    # Admin-only: profile this one request (see PPT_ADMIN_TOKEN / PPT_PROFILE_DIR)
+    if x_ppt_profile is not None:
+        if not config.PPT_ADMIN_TOKEN or not hmac.compare_digest(x_ppt_profile, config.PPT_ADMIN_TOKEN):
+            raise HTTPException(status_code=403, detail="Invalid admin token")
+        profile = start_request_profile()
+        if profile is not None:
+            try:
+                # The deck may still be written while the body is sent: the
+                # response stops the profile once sending has ended
+                response = await _generate_response(
+                    text_input, guidance, api_key, file, template_id,
+                    response_class=functools.partial(ProfiledStreamingResponse, profile=profile)
+                )
+            except BaseException:
+                await profile.stop()
+                raise
+            response.headers["X-Profile-Id"] = profile.request_id
+            return response
+
+    return await _generate_response(text_input, guidance, api_key, file, template_id)
+
+
+async def _open_request_template(file: Optional[UploadFile], template_id: Optional[str]) -> tuple:
+    """
+    Returns (TemplateSource, metadata) for the uploaded or registered template.
+    The caller closes the TemplateSource.
+    """
+    if (file is None) == (not template_id):
+        raise HTTPException(status_code=400, detail="Provide either a template file or a template_id")
+
+    if template_id:
+        # Registered templates are already parsed and analyzed
+        with timed("template_load"):
+            opened = await open_registered_template(template_id)
+        if opened is None:
+            raise HTTPException(status_code=404, detail="Template not found")
+        return opened
+
+    # Read and parse template once; analysis and export share the parsed state.
+    # Parsing, analysis and export are CPU-bound and run off the event loop.
+    # The upload is spooled by the form parser; malformed files are rejected
+    # from the ZIP directory alone, and large ones are parsed from a memory map
+    try:
+        with timed("upload_read"):
+            template_data = await asyncio.to_thread(open_upload, file.file)
+        with timed("template_parse"):
+            template = await open_template(template_data)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid PowerPoint template")
+    del template_data
 
     try:
-        # Read and analyze template
-        template_bytes = await file.read()
-        
         # Analyze template to extract layouts, colors, fonts, and images
         logger.info("Analyzing template...")
-        template_metadata = analyze_presentation(template_bytes)
-        
+        with timed("analyze"):
+            template_metadata = await analyze_template(template)
         if template_metadata.get("error"):
             raise HTTPException(status_code=400, detail="Invalid PowerPoint template")
-        
-        # Generate Slide Plan using LLM
-        logger.info("Generating slide plan with LLM...")
-        try:
-            plan = await generate_slide_plan(text_input, guidance, api_key)
-        except Exception as e:
-            logger.error(f"Slide Planning Failed: {e}")
-            raise HTTPException(status_code=500, detail=f"Failed to generate slide plan: {str(e)}")
-
-        if not plan:
-            raise HTTPException(status_code=500, detail="LLM returned empty plan")
-
-        logger.info(f"Plan generated: {plan.get('meta', {}).get('slide_count', 0)} slides")
-
-        # Generate PowerPoint with template metadata (images, colors, fonts)
-        try:
-            pptx_io = generate_presentation(template_bytes, plan, template_metadata)
-        except Exception as e:
-            logger.error(f"PPT Generation Failed: {e}")
-            raise HTTPException(status_code=500, detail=f"Failed to generate PPT: {str(e)}")
+    except BaseException:
+        template.close()
+        raise
+    return template, template_metadata
+
+
+async def _generate_response(text_input: str, guidance: Optional[str], api_key: str,
+                             file: Optional[UploadFile], template_id: Optional[str],
+                             response_class=StreamingResponse) -> StreamingResponse:
+    if not api_key:
+        raise HTTPException(status_code=400, detail="API Key is required")
+
+    template = None
+    try:
+        # Parsing and analysis take a CPU slot; planning an LLM slot; the build a CPU slot again
+        async with admitted(cpu_limiter):
+            template, template_metadata = await _open_request_template(file, template_id)
+
+        body = None
+
+        # Streaming mode: build each slide while the LLM is still generating the rest.
+        # Long inputs are planned in parallel chunks instead.
+        if (config.LLM_STREAM_PLAN and supports_streamed_export(template)
+                and not needs_chunked_planning(text_input)):
+            logger.info("Streaming slide plan and building slides as they arrive...")
+            try:
+                streamed_plan = StreamedPlan(text_input, guidance, api_key)
+                # Slides are built while the plan streams in: the LLM slot is held
+                # throughout, a CPU slot only while a slide is built or the deck saved
+                async with admitted(llm_limiter):
+                    body = await export_streamed(
+                        template, streamed_plan, template_metadata, cpu_slot=lambda: admitted(cpu_limiter)
+                    )
+                logger.info(f"Plan streamed: {len(streamed_plan.plan['slides'])} slides")
+            except HTTPException:
+                raise
+            except Exception as e:
+                logger.warning(f"Streamed generation failed, falling back to buffered planning: {e}")
+                body = None
+
+        if body is None:
+            # Generate Slide Plan using LLM
+            logger.info("Generating slide plan with LLM...")
+            try:
+                async with admitted(llm_limiter):
+                    plan = await generate_slide_plan(text_input, guidance, api_key)
+            except HTTPException:
+                raise
+            except Exception as e:
+                logger.error(f"Slide Planning Failed: {e}")
+                raise HTTPException(status_code=500, detail=f"Failed to generate slide plan: {str(e)}")
+
+            if not plan:
+                raise HTTPException(status_code=500, detail="LLM returned empty plan")
+
+            logger.info(f"Plan generated: {plan.get('meta', {}).get('slide_count', 0)} slides")
+
+            # Generate PowerPoint with template metadata (images, colors, fonts)
+            try:
+                async with admitted(cpu_limiter):
+                    body = await stream_presentation(template, plan, template_metadata)
+            except HTTPException:
+                raise
+            except Exception as e:
+                logger.error(f"PPT Generation Failed: {e}")
+                raise HTTPException(status_code=500, detail=f"Failed to generate PPT: {str(e)}")
             
-        return StreamingResponse(
-            pptx_io,
+        # The deck is written into the response body as it is saved (see PPT_OUTPUT_MODE)
+        return response_class(
+            body,
             media_type="application/vnd.openxmlformats-officedocument.presentationml.presentation",
             headers={"Content-Disposition": "attachment; filename=generated_presentation.pptx"}
         )
@@ -64,3 +173,53 @@ async def generate_ppt(
     except Exception as e:
         logger.error(f"Unexpected API Error: {e}")
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+    finally:
+        if template:
+            template.close()
+
+
+@router.post("/generate/batch")
+async def generate_ppt_batch(
+    text_inputs: List[str] = Form(...),
+    guidance: Optional[str] = Form(None),
+    api_key: str = Form(...),
+    file: Optional[UploadFile] = File(None),
+    template_id: Optional[str] = Form(None)
+):
+    """
+    Generates one deck per `text_inputs` entry from a single template
+    (uploaded as `file` or registered, by `template_id`).
+    Returns a ZIP with the decks and a manifest.json describing every item.
+    """
+    if not api_key:
+        raise HTTPException(status_code=400, detail="API Key is required")
+    if len(text_inputs) > config.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many inputs: at most {config.BATCH_MAX_ITEMS} per batch"
+        )
+
+    template = None
+    try:
+        # The template is parsed and analyzed once for the whole batch. Only this
+        # step is admitted; the batch's own fan-out is bounded by BATCH_*_CONCURRENCY
+        async with admitted(cpu_limiter):
+            template, template_metadata = await _open_request_template(file, template_id)
+
+        logger.info(f"Generating batch of {len(text_inputs)} decks...")
+        body = await generate_batch(template, template_metadata, text_inputs, guidance, api_key)
+
+        return StreamingResponse(
+            body,
+            media_type="application/zip",
+            headers={"Content-Disposition": "attachment; filename=generated_presentations.zip"}
+        )
+
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logger.error(f"Unexpected API Error: {e}")
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+    finally:
+        if template:
+            template.close()
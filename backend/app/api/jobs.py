@@ -0,0 +1,79 @@
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi.responses import FileResponse
+from typing import Optional
+from app.services import job_queue
+from app.services.job_worker import notify_job_submitted
+from app.services.uploads import open_upload
+import asyncio
+import logging
+import os
+
+# Configure logger
+logger = logging.getLogger("JobsAPI")
+logger.setLevel(logging.INFO)
+
+router = APIRouter()
+
+@router.post("/jobs", status_code=202)
+async def submit_job(
+    text_input: str = Form(...),
+    guidance: Optional[str] = Form(None),
+    api_key: str = Form(...),
+    file: UploadFile = File(...)
+):
+    """
+    Queues a generation job and returns its id right away.
+    Poll GET /jobs/{job_id}, then download GET /jobs/{job_id}/result.
+    """
+    if not api_key:
+        raise HTTPException(status_code=400, detail="API Key is required")
+
+    # Cheap check up front; the template is fully parsed by the worker
+    try:
+        template_data = await asyncio.to_thread(open_upload, file.file)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid PowerPoint template")
+
+    try:
+        job_id = await asyncio.to_thread(job_queue.create_job, template_data, text_input, guidance, api_key)
+    except Exception as e:
+        logger.error(f"Could not queue job: {e}")
+        raise HTTPException(status_code=500, detail="Could not queue job")
+
+    notify_job_submitted()
+    logger.info(f"Queued job {job_id}")
+    return {"job_id": job_id, "status": "queued"}
+
+
+async def _get_job_or_404(job_id: str) -> dict:
+    job = await asyncio.to_thread(job_queue.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job
+
+
+@router.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """
+    Status ("queued", "running", "done", "failed") and current stage of a job.
+    """
+    job = await _get_job_or_404(job_id)
+    return {"job_id": job.pop("id"), **job}
+
+
+@router.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    job = await _get_job_or_404(job_id)
+    if job["status"] == "failed":
+        raise HTTPException(status_code=409, detail=f"Job failed: {job['error']}")
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job is not finished (status: {job['status']})")
+
+    path = job_queue.result_path(job_id)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return FileResponse(
+        path,
+        media_type="application/vnd.openxmlformats-officedocument.presentationml.presentation",
+        filename="generated_presentation.pptx"
+    )
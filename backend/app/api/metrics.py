@@ -0,0 +1,75 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app import config
+from app.services import metrics, plan_cache
+import asyncio
+import logging
+import time
+
+# Configure logger
+logger = logging.getLogger("MetricsAPI")
+logger.setLevel(logging.INFO)
+
+router = APIRouter()
+
+
+class ServerTimingMiddleware:
+    """
+    Collects the stage timings of each HTTP request and returns them in a
+    Server-Timing header. Stages that finish after the headers are sent (e.g.
+    the save in PPT_OUTPUT_MODE=stream) only reach the /metrics histograms.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = metrics.start_request_timings()
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - start
+                headers = list(message.get("headers", []))
+                value = metrics.format_server_timing({**timings, "total": elapsed})
+                headers.append((b"server-timing", value.encode("latin-1")))
+                message = {**message, "headers": headers}
+
+                # Label by route template, not raw path, to keep label cardinality bounded
+                route = scope.get("route")
+                path = getattr(route, "path", "unmatched")
+                metrics.HTTP_REQUEST_DURATION.observe(elapsed, path, str(message["status"]))
+            await send(message)
+
+        await self.app(scope, receive, send_with_timing)
+
+
+def _plan_cache_lines() -> list:
+    try:
+        stats = plan_cache.stats()
+    except Exception as e:
+        logger.warning(f"Could not read plan cache stats: {e}")
+        return []
+    lines = []
+    for name in ("hits", "misses", "evictions"):
+        lines.append(f"# HELP ppt_plan_cache_{name}_total Plan cache {name} (all workers on this host)")
+        lines.append(f"# TYPE ppt_plan_cache_{name}_total counter")
+        lines.append(f"ppt_plan_cache_{name}_total {stats[name]}")
+    for name in ("entries", "size_bytes"):
+        lines.append(f"# HELP ppt_plan_cache_{name} Plan cache {name.replace('_', ' ')}")
+        lines.append(f"# TYPE ppt_plan_cache_{name} gauge")
+        lines.append(f"ppt_plan_cache_{name} {stats[name]}")
+    return lines
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Prometheus text exposition of this process's metrics.
+    """
+    extra = await asyncio.to_thread(_plan_cache_lines) if config.PLAN_CACHE_ENABLED else []
+    return PlainTextResponse(metrics.render_metrics(extra), media_type="text/plain; version=0.0.4")
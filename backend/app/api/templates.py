@@ -0,0 +1,40 @@
+from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi.responses import JSONResponse
+from app.services import template_registry
+from app.services.uploads import open_upload
+import asyncio
+import logging
+
+# Configure logger
+logger = logging.getLogger("TemplatesAPI")
+logger.setLevel(logging.INFO)
+
+router = APIRouter()
+
+@router.post("/templates")
+async def register_template(file: UploadFile = File(...)):
+    """
+    Registers a template for reuse: /generate then accepts its `template_id`
+    instead of the file. Returns 201 when it is new, 200 when the same file
+    was already registered.
+    """
+    try:
+        template_data = await asyncio.to_thread(open_upload, file.file)
+        summary, created = await asyncio.to_thread(template_registry.register_template, template_data)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid PowerPoint template")
+    except template_registry.RegistryFullError as e:
+        raise HTTPException(status_code=507, detail=str(e))
+    except Exception as e:
+        logger.error(f"Could not register template: {e}")
+        raise HTTPException(status_code=500, detail="Could not register template")
+
+    return JSONResponse(summary, status_code=201 if created else 200)
+
+
+@router.get("/templates/{template_id}")
+async def get_template(template_id: str):
+    summary = await asyncio.to_thread(template_registry.get_summary, template_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Template not found")
+    return summary
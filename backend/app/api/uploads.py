@@ -0,0 +1,41 @@
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+from app import config
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Rejects request bodies larger than UPLOAD_MAX_BYTES with 413: right away
+    when Content-Length announces it, otherwise as soon as that many bytes have
+    been received, so an oversized upload is never buffered or spooled whole.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit = config.UPLOAD_MAX_BYTES
+        detail = f"Request body exceeds {limit} bytes"
+        content_length = Headers(scope=scope).get("content-length", "")
+        if content_length.isdigit() and int(content_length) > limit:
+            response = JSONResponse({"detail": detail}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def receive_limited():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, receive_limited, send)
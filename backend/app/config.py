@@ -0,0 +1,145 @@
+import os
+import tempfile
+
+# Runtime settings, read once from the environment at import time.
+
+# How CPU-bound PPTX stages (template analysis, deck export) run:
+# - "thread": in the default thread pool of the event loop
+# - "process": in a shared process pool, using all cores
+PPT_EXECUTION_MODE = os.getenv("PPT_EXECUTION_MODE", "thread").lower()
+
+# Worker processes for "process" mode (defaults to the CPU count)
+PPT_PROCESS_WORKERS = int(os.getenv("PPT_PROCESS_WORKERS", "0")) or os.cpu_count() or 1
+
+# Stream the slide plan from the LLM and build each slide as soon as it is complete
+# (thread execution mode only; falls back to the buffered path on any failure)
+LLM_STREAM_PLAN = os.getenv("LLM_STREAM_PLAN", "false").lower() in ("1", "true", "yes")
+
+# Connection pool limits for each LLM provider's shared HTTP client
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+
+# Inputs longer than this (in characters) are planned in chunks (map-reduce)
+PLAN_CHUNK_THRESHOLD_CHARS = int(os.getenv("PLAN_CHUNK_THRESHOLD_CHARS", "12000"))
+# Maximum size of each chunk, and how many chunks are planned at once
+PLAN_CHUNK_MAX_CHARS = int(os.getenv("PLAN_CHUNK_MAX_CHARS", "8000"))
+PLAN_CHUNK_CONCURRENCY = int(os.getenv("PLAN_CHUNK_CONCURRENCY", "4"))
+
+# On-disk slide plan cache shared by all workers on this host
+PLAN_CACHE_ENABLED = os.getenv("PLAN_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+PLAN_CACHE_PATH = os.getenv(
+    "PLAN_CACHE_PATH",
+    os.path.join(tempfile.gettempdir(), "ppt-generator", "plan_cache.sqlite3")
+)
+PLAN_CACHE_TTL_SECONDS = int(os.getenv("PLAN_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+PLAN_CACHE_MAX_BYTES = int(os.getenv("PLAN_CACHE_MAX_BYTES", str(100 * 1024 * 1024)))
+
+# Per-request cap on template image bytes that generated slides carry
+# (each distinct image counted once, whether loaded or already in the package)
+IMAGE_MEMORY_BUDGET_BYTES = int(os.getenv("IMAGE_MEMORY_BUDGET_BYTES", str(64 * 1024 * 1024)))
+
+# Downsample template images in generated decks to their displayed size at
+# MEDIA_TARGET_DPI. MEDIA_POLICY "lossless" keeps PNGs as PNG, "lossy" also
+# turns opaque PNGs into JPEGs. Results are cached per process up to MEDIA_CACHE_MAX_BYTES
+MEDIA_OPTIMIZATION_ENABLED = os.getenv("MEDIA_OPTIMIZATION_ENABLED", "false").lower() in ("1", "true", "yes")
+MEDIA_TARGET_DPI = int(os.getenv("MEDIA_TARGET_DPI", "150"))
+MEDIA_POLICY = os.getenv("MEDIA_POLICY", "lossless").lower()
+MEDIA_JPEG_QUALITY = int(os.getenv("MEDIA_JPEG_QUALITY", "85"))
+MEDIA_CACHE_MAX_BYTES = int(os.getenv("MEDIA_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+MEDIA_OPTIMIZER_WORKERS = int(os.getenv("MEDIA_OPTIMIZER_WORKERS", "0")) or os.cpu_count() or 1
+
+# Fit bullets to the body placeholder: shrink the font down to this fraction of
+# the template's size, and move what still does not fit to continuation slides
+AUTOFIT_ENABLED = os.getenv("AUTOFIT_ENABLED", "true").lower() in ("1", "true", "yes")
+AUTOFIT_MIN_FONT_SCALE = float(os.getenv("AUTOFIT_MIN_FONT_SCALE", "0.7"))
+# Extra directories searched for TrueType fonts used to measure text
+AUTOFIT_FONT_DIRS = [d for d in os.getenv("AUTOFIT_FONT_DIRS", "").split(os.pathsep) if d]
+
+# How the generated deck is written to the response:
+# - "buffer": saved into memory, then sent
+# - "spool": saved into a temp file kept in memory up to PPT_OUTPUT_SPOOL_BYTES, on disk above
+# - "stream": the ZIP container is written straight into the response while it is saved
+PPT_OUTPUT_MODE = os.getenv("PPT_OUTPUT_MODE", "spool").lower()
+PPT_OUTPUT_SPOOL_BYTES = int(os.getenv("PPT_OUTPUT_SPOOL_BYTES", str(8 * 1024 * 1024)))
+
+# Request bodies larger than UPLOAD_MAX_BYTES are rejected with 413. Uploaded
+# files are kept in memory up to UPLOAD_SPOOL_BYTES and spooled to disk above
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(100 * 1024 * 1024)))
+UPLOAD_SPOOL_BYTES = int(os.getenv("UPLOAD_SPOOL_BYTES", str(2 * 1024 * 1024)))
+
+# Admission control for /generate and /generate/batch: concurrent CPU-heavy
+# PPTX stages (parse, analyze, build) and concurrent LLM planning calls, each
+# with a bounded wait queue. Requests spend at most ADMISSION_MAX_WAIT_SECONDS
+# queueing for slots in total (time holding a slot does not count); a full
+# queue is answered with 429, an exhausted wait budget with 503
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() in ("1", "true", "yes")
+ADMISSION_CPU_CONCURRENCY = int(os.getenv("ADMISSION_CPU_CONCURRENCY", "0")) or os.cpu_count() or 1
+ADMISSION_CPU_QUEUE_SIZE = int(os.getenv("ADMISSION_CPU_QUEUE_SIZE", "32"))
+ADMISSION_LLM_CONCURRENCY = int(os.getenv("ADMISSION_LLM_CONCURRENCY", "64"))
+ADMISSION_LLM_QUEUE_SIZE = int(os.getenv("ADMISSION_LLM_QUEUE_SIZE", "128"))
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "30"))
+
+# Batch generation (/generate/batch): maximum inputs per request, slide plans
+# requested concurrently, and decks built concurrently
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "50"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
+BATCH_BUILD_CONCURRENCY = int(os.getenv("BATCH_BUILD_CONCURRENCY", str(os.cpu_count() or 1)))
+
+# Asynchronous jobs (/jobs): queue database and per-job files (template, result),
+# worker tasks per process, result lifetime, lease after which an interrupted
+# job is picked up again, and how many times a job may be started
+JOB_DIR = os.getenv("JOB_DIR", os.path.join(tempfile.gettempdir(), "ppt-generator", "jobs"))
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", os.path.join(JOB_DIR, "jobs.sqlite3"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_RESULT_TTL_SECONDS = int(os.getenv("JOB_RESULT_TTL_SECONDS", "3600"))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "120"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_POLL_INTERVAL_SECONDS = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "1.0"))
+
+# Registered templates (/templates): where templates and their precompiled
+# artifacts are stored, how many may be registered, and how many stay parsed
+# in memory per process
+TEMPLATE_REGISTRY_DIR = os.getenv("TEMPLATE_REGISTRY_DIR", os.path.join(tempfile.gettempdir(), "ppt-generator", "templates"))
+TEMPLATE_REGISTRY_MAX_TEMPLATES = int(os.getenv("TEMPLATE_REGISTRY_MAX_TEMPLATES", "100"))
+TEMPLATE_REGISTRY_CACHE_SIZE = int(os.getenv("TEMPLATE_REGISTRY_CACHE_SIZE", "16"))
+
+# Admin token enabling per-request profiling (X-PPT-Profile header on /generate);
+# profiling is unavailable while it is empty
+PPT_ADMIN_TOKEN = os.getenv("PPT_ADMIN_TOKEN", "")
+# Where profiles are written (one directory per profiled request), the sampling
+# interval, the stack depth recorded per allocation, how many allocation sites
+# are listed, and when a profile is stopped if its response never completes
+PPT_PROFILE_DIR = os.getenv("PPT_PROFILE_DIR", os.path.join(tempfile.gettempdir(), "ppt-generator", "profiles"))
+PPT_PROFILE_INTERVAL_SECONDS = float(os.getenv("PPT_PROFILE_INTERVAL_SECONDS", "0.005"))
+PPT_PROFILE_TRACEBACK_DEPTH = int(os.getenv("PPT_PROFILE_TRACEBACK_DEPTH", "10"))
+PPT_PROFILE_TOP_ALLOCATIONS = int(os.getenv("PPT_PROFILE_TOP_ALLOCATIONS", "25"))
+PPT_PROFILE_MAX_SECONDS = float(os.getenv("PPT_PROFILE_MAX_SECONDS", "300"))
+
+# Hedged LLM calls: when a planning call takes longer than the provider's recent
+# LLM_HEDGE_QUANTILE latency (over the last LLM_HEDGE_WINDOW successful calls, once
+# LLM_HEDGE_MIN_SAMPLES are known; LLM_HEDGE_DEFAULT_DELAY_SECONDS before that, never
+# less than LLM_HEDGE_MIN_DELAY_SECONDS), an identical request is raced against it.
+# At most LLM_HEDGE_MAX_IN_FLIGHT hedge requests run at once per process.
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", "0.9"))
+LLM_HEDGE_WINDOW = int(os.getenv("LLM_HEDGE_WINDOW", "200"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_DEFAULT_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY_SECONDS", "10"))
+LLM_HEDGE_MIN_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "1"))
+LLM_HEDGE_MAX_IN_FLIGHT = int(os.getenv("LLM_HEDGE_MAX_IN_FLIGHT", "4"))
+
+# Retries of provider errors (429, 5xx, connection failures) during planning:
+# full-jitter exponential backoff from LLM_BACKOFF_BASE_SECONDS up to
+# LLM_BACKOFF_MAX_SECONDS, never shorter than the provider's Retry-After; a
+# Retry-After longer than LLM_RETRY_AFTER_MAX_SECONDS fails the call instead
+LLM_PROVIDER_MAX_RETRIES = int(os.getenv("LLM_PROVIDER_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "20"))
+LLM_RETRY_AFTER_MAX_SECONDS = float(os.getenv("LLM_RETRY_AFTER_MAX_SECONDS", "60"))
+
+# Input compaction before planning (whitespace, running headers/footers, duplicate
+# paragraphs) and bounds of the output token budget sized from the input
+PROMPT_COMPACTION_ENABLED = os.getenv("PROMPT_COMPACTION_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_MIN_OUTPUT_TOKENS = int(os.getenv("LLM_MIN_OUTPUT_TOKENS", "1024"))
+LLM_MAX_OUTPUT_TOKENS = int(os.getenv("LLM_MAX_OUTPUT_TOKENS", "8192"))
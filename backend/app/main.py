@@ -1,8 +1,29 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import generate
+from app.api import generate, jobs, metrics, templates
+from app.api.admission import AdmissionMiddleware
+from app.api.uploads import UploadSizeLimitMiddleware
+from app.services.ppt_executor import start_executor, shutdown_executor
+from app.services.llm.http_client import start_http_clients, close_http_clients
+from app.services.slide_planner import LLM_PROVIDERS
+from app.services.job_worker import start_job_workers, stop_job_workers
+from app.services.uploads import configure_upload_spooling
 
-app = FastAPI(title="PPT Generator API - Phase 1")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_executor()
+    start_http_clients(LLM_PROVIDERS)
+    start_job_workers()
+    yield
+    await stop_job_workers()
+    await close_http_clients()
+    shutdown_executor()
+
+
+app = FastAPI(title="PPT Generator API - Phase 1", lifespan=lifespan)
+configure_upload_spooling()
 
 origins = ["*"]
 
@@ -12,9 +33,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+app.add_middleware(UploadSizeLimitMiddleware)
+app.add_middleware(AdmissionMiddleware)
+app.add_middleware(metrics.ServerTimingMiddleware)
 
 app.include_router(generate.router)
+app.include_router(jobs.router)
+app.include_router(templates.router)
+app.include_router(metrics.router)
 
 @app.get("/")
 def read_root():
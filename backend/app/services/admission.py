@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Optional
+from app import config
+from app.services import metrics
+
+logger = logging.getLogger("Admission")
+logger.setLevel(logging.INFO)
+
+# Admission control: a limiter per kind of work (CPU-heavy PPTX stages, LLM
+# calls) lets a fixed number of requests in at a time and queues a bounded
+# number of others in arrival order. A request that finds the queue full is
+# turned away at once (429), and one that has spent its wait budget (time
+# actually spent queueing, across all its slots) gives up (503), both with a
+# Retry-After estimate, so overload is shed instead of slowing every request down.
+
+# Weight of the latest hold time in the moving average used for Retry-After
+_HOLD_SMOOTHING = 0.2
+_RETRY_AFTER_MAX_SECONDS = 60
+
+# {"remaining": seconds} of the current request; a dict so that tasks the
+# request spawns (which copy the context) draw from the same budget
+_wait_budget: ContextVar[Optional[dict]] = ContextVar("admission_wait_budget", default=None)
+
+
+class AdmissionRejected(Exception):
+    """
+    No slot could be granted. `status_code` is 429 (queue full) or 503 (wait
+    budget spent); `retry_after` is a hint in whole seconds.
+    """
+
+    def __init__(self, limiter: str, status_code: int, retry_after: int, reason: str):
+        super().__init__(f"Server busy ({limiter} {reason}), retry in {retry_after}s")
+        self.limiter = limiter
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class AdmissionLimiter:
+    """
+    At most `limit` holders, at most `max_queue` waiters, served first come first served.
+    Slots are handed straight to the next waiter on release, so a burst of
+    newcomers cannot overtake requests that are already queued.
+    Must be used from the event loop thread.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int):
+        self.name = name
+        self.limit = max(1, limit)
+        self.max_queue = max(0, max_queue)
+        self.in_flight = 0
+        self._waiters = deque()
+        # Moving average of how long a slot is held, in seconds
+        self._hold_seconds = 1.0
+        self._update_gauges()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def queue_full(self) -> bool:
+        return self.in_flight >= self.limit and len(self._waiters) >= self.max_queue
+
+    def retry_after(self) -> int:
+        """
+        Seconds until a slot is likely to be free for a newcomer.
+        """
+        wait = self._hold_seconds * (len(self._waiters) + 1) / self.limit
+        return max(1, min(_RETRY_AFTER_MAX_SECONDS, math.ceil(wait)))
+
+    def check_queue(self):
+        """
+        Raises AdmissionRejected (429) right away if a newcomer would find the queue full.
+        """
+        if self.queue_full():
+            self._reject(429, "queue_full", 0.0)
+
+    def _update_gauges(self):
+        metrics.ADMISSION_IN_FLIGHT.set(self.in_flight, self.name)
+        metrics.ADMISSION_QUEUE_DEPTH.set(len(self._waiters), self.name)
+
+    def _reject(self, status_code: int, reason: str, waited: float):
+        metrics.ADMISSION_WAIT.observe(waited, self.name, "rejected")
+        metrics.ADMISSION_REJECTIONS.inc(self.name, reason)
+        retry_after = self.retry_after()
+        logger.warning(
+            f"Rejected request: {self.name} {reason} "
+            f"({self.in_flight} running, {len(self._waiters)} queued, retry after {retry_after}s)"
+        )
+        raise AdmissionRejected(self.name, status_code, retry_after, reason)
+
+    def _remove_waiter(self, waiter):
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+        self._update_gauges()
+
+    async def acquire(self, budget: dict = None):
+        """
+        Takes a slot, waiting in line for at most `budget["remaining"]` seconds,
+        and deducts the time spent waiting from the budget.
+        Raises AdmissionRejected when the queue is full or the budget runs out.
+        """
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            self._update_gauges()
+            metrics.ADMISSION_WAIT.observe(0.0, self.name, "admitted")
+            return
+        if len(self._waiters) >= self.max_queue:
+            self._reject(429, "queue_full", 0.0)
+        timeout = None if budget is None else budget["remaining"]
+        if timeout is not None and timeout <= 0:
+            self._reject(503, "deadline", 0.0)
+
+        start = time.monotonic()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._update_gauges()
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            self._remove_waiter(waiter)
+            waited = self._spend(budget, start)
+            self._reject(503, "deadline", waited)
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as this request was cancelled
+                self.release()
+            else:
+                self._remove_waiter(waiter)
+            self._spend(budget, start)
+            raise
+        metrics.ADMISSION_WAIT.observe(self._spend(budget, start), self.name, "admitted")
+
+    @staticmethod
+    def _spend(budget: Optional[dict], start: float) -> float:
+        waited = time.monotonic() - start
+        if budget is not None:
+            budget["remaining"] -= waited
+        return waited
+
+    def release(self, held_seconds: float = None):
+        if held_seconds is not None:
+            self._hold_seconds += _HOLD_SMOOTHING * (held_seconds - self._hold_seconds)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # in_flight is unchanged: the slot passes to the waiter
+                waiter.set_result(None)
+                self._update_gauges()
+                return
+        self.in_flight -= 1
+        self._update_gauges()
+
+
+cpu_limiter = AdmissionLimiter("cpu", config.ADMISSION_CPU_CONCURRENCY, config.ADMISSION_CPU_QUEUE_SIZE)
+llm_limiter = AdmissionLimiter("llm", config.ADMISSION_LLM_CONCURRENCY, config.ADMISSION_LLM_QUEUE_SIZE)
+
+
+def start_wait_budget():
+    """
+    Starts the current request's wait budget: it may spend
+    ADMISSION_MAX_WAIT_SECONDS queueing for slots in total. Time spent
+    holding a slot (e.g. waiting for the LLM) does not count.
+    """
+    _wait_budget.set({"remaining": config.ADMISSION_MAX_WAIT_SECONDS})
+
+
+def request_wait_budget() -> Optional[dict]:
+    return _wait_budget.get()
@@ -0,0 +1,108 @@
+import asyncio
+import json
+import logging
+import tempfile
+import zipfile
+from typing import AsyncIterator, List, Optional
+from app import config
+from app.services.slide_planner import generate_slide_plan
+from app.services.ppt_executor import TemplateSource, export_presentation
+from app.services.ppt import output_writer
+
+logger = logging.getLogger("BatchGenerator")
+logger.setLevel(logging.INFO)
+
+
+def deck_filename(index: int) -> str:
+    return f"deck_{index + 1:03d}.pptx"
+
+
+class BatchArchive:
+    """
+    ZIP of the generated decks plus a manifest.json with the status of every item.
+
+    Decks are added as soon as they are built, so at most the decks still being
+    built are held in memory. The archive itself is spooled to disk above
+    PPT_OUTPUT_SPOOL_BYTES. PPTX files are already compressed and are stored as is.
+    """
+
+    def __init__(self):
+        self._spool = tempfile.SpooledTemporaryFile(max_size=config.PPT_OUTPUT_SPOOL_BYTES)
+        self._zip = zipfile.ZipFile(self._spool, "w")
+        self._lock = asyncio.Lock()
+
+    async def add_deck(self, filename: str, data):
+        async with self._lock:
+            await asyncio.to_thread(self._zip.writestr, filename, data, zipfile.ZIP_STORED)
+
+    async def finish(self, manifest: dict) -> AsyncIterator[bytes]:
+        """
+        Writes the manifest, closes the archive and returns it as a response body.
+        """
+        async with self._lock:
+            self._zip.writestr("manifest.json", json.dumps(manifest, indent=2), zipfile.ZIP_DEFLATED)
+            self._zip.close()
+        self._spool.seek(0)
+        return await output_writer.primed(output_writer.iter_fileobj(self._spool))
+
+    def close(self):
+        self._zip.close()
+        self._spool.close()
+
+
+async def generate_batch(
+    template: TemplateSource,
+    template_metadata: dict,
+    text_inputs: List[str],
+    guidance: Optional[str],
+    api_key: str
+) -> AsyncIterator[bytes]:
+    """
+    Generates one deck per text input from a single analyzed template.
+
+    Slide plans are requested concurrently (up to BATCH_LLM_CONCURRENCY) and
+    each deck is built as soon as its plan arrives (up to BATCH_BUILD_CONCURRENCY
+    at once). A failed item does not fail the batch; it is reported in the
+    manifest. Returns the ZIP archive as a response body.
+    """
+    llm_slots = asyncio.Semaphore(config.BATCH_LLM_CONCURRENCY)
+    build_slots = asyncio.Semaphore(config.BATCH_BUILD_CONCURRENCY)
+    archive = BatchArchive()
+
+    async def run_item(index: int, text_input: str) -> dict:
+        entry = {"index": index, "status": "error", "file": None}
+        try:
+            if not text_input.strip():
+                raise ValueError("Text input is empty")
+
+            async with llm_slots:
+                plan = await generate_slide_plan(text_input, guidance, api_key)
+            if not plan:
+                raise ValueError("LLM returned empty plan")
+
+            async with build_slots:
+                output = await export_presentation(template, plan, template_metadata)
+
+            filename = deck_filename(index)
+            await archive.add_deck(filename, output.getbuffer())
+            entry.update(status="ok", file=filename, slide_count=len(plan.get("slides", [])))
+        except Exception as e:
+            logger.error(f"Batch item {index} failed: {e}")
+            entry["error"] = str(e)
+        return entry
+
+    try:
+        items = await asyncio.gather(*(run_item(i, text) for i, text in enumerate(text_inputs)))
+        succeeded = sum(1 for item in items if item["status"] == "ok")
+        logger.info(f"Batch finished: {succeeded}/{len(items)} decks generated")
+
+        manifest = {
+            "total": len(items),
+            "succeeded": succeeded,
+            "failed": len(items) - succeeded,
+            "items": items
+        }
+        return await archive.finish(manifest)
+    except BaseException:
+        archive.close()
+        raise
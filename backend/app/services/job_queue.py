@@ -0,0 +1,224 @@
+import logging
+import os
+import shutil
+import sqlite3
+import time
+import uuid
+from contextlib import closing
+from typing import Optional
+from app import config
+from app.services.private_dirs import ensure_private_dir
+
+logger = logging.getLogger("JobQueue")
+logger.setLevel(logging.INFO)
+
+# Persistent queue of generation jobs.
+# Job rows live in a local SQLite database (WAL mode) shared by every uvicorn
+# worker on the host; the uploaded template and the finished deck are files in
+# a per-job directory under JOB_DIR. A running job holds a lease that its
+# worker keeps renewing. If the process dies, the lease runs out and the job is
+# claimed again by any worker, so interrupted jobs resume after a restart.
+#
+# The API key is stored with the job until it finishes (done or failed), then
+# wiped together with the input text and the template. JOB_DIR and the
+# database directory must be private to this user (see private_dirs).
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    text_input TEXT,
+    guidance TEXT,
+    api_key TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_until REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created_at ON jobs (status, created_at);
+"""
+
+_initialized_path = None
+
+TEMPLATE_FILENAME = "template.pptx"
+RESULT_FILENAME = "result.pptx"
+
+
+def check_storage():
+    """
+    Creates JOB_DIR and the database directory if needed, and raises
+    UnsafeDirectoryError if another user could read or replace them.
+    """
+    ensure_private_dir(config.JOB_DIR)
+    ensure_private_dir(os.path.dirname(os.path.abspath(config.JOB_DB_PATH)))
+
+
+def _connect() -> sqlite3.Connection:
+    global _initialized_path
+    path = config.JOB_DB_PATH
+    if _initialized_path != path:
+        # Job rows hold API keys while they are pending: keep them private to this user
+        check_storage()
+    conn = sqlite3.connect(path, timeout=5.0, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    if _initialized_path != path:
+        os.chmod(path, 0o600)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        _initialized_path = path
+    return conn
+
+
+def job_dir(job_id: str) -> str:
+    ensure_private_dir(config.JOB_DIR)
+    return os.path.join(config.JOB_DIR, job_id)
+
+
+def template_path(job_id: str) -> str:
+    return os.path.join(job_dir(job_id), TEMPLATE_FILENAME)
+
+
+def result_path(job_id: str) -> str:
+    return os.path.join(job_dir(job_id), RESULT_FILENAME)
+
+
+def create_job(template_bytes: bytes, text_input: str, guidance: Optional[str], api_key: str) -> str:
+    """
+    Stores the template and queues a job for it. Returns the job id.
+    """
+    job_id = uuid.uuid4().hex
+    check_storage()
+    os.makedirs(job_dir(job_id), mode=0o700)
+    with open(template_path(job_id), "wb") as f:
+        f.write(template_bytes)
+
+    now = time.time()
+    with closing(_connect()) as conn:
+        conn.execute(
+            "INSERT INTO jobs (id, status, stage, text_input, guidance, api_key, created_at, updated_at) "
+            "VALUES (?, 'queued', 'queued', ?, ?, ?, ?, ?)",
+            (job_id, text_input, guidance, api_key, now, now)
+        )
+    return job_id
+
+
+def claim_job() -> Optional[dict]:
+    """
+    Marks the oldest runnable job as running and returns it (including its
+    inputs and API key), or None. Runnable jobs are queued ones and running
+    ones whose lease has expired. A job interrupted JOB_MAX_ATTEMPTS times
+    is failed instead of being started again.
+    """
+    now = time.time()
+    with closing(_connect()) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            while True:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE status = 'queued' "
+                    "OR (status = 'running' AND lease_until < ?) "
+                    "ORDER BY created_at LIMIT 1",
+                    (now,)
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                if row["attempts"] >= config.JOB_MAX_ATTEMPTS:
+                    logger.warning(f"Job {row['id']} was interrupted too many times")
+                    _finish(conn, row["id"], "failed", "Job was interrupted too many times", now)
+                    continue
+
+                if row["status"] == "running":
+                    logger.info(f"Resuming interrupted job {row['id']}")
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', stage = 'starting', attempts = attempts + 1, "
+                    "lease_until = ?, updated_at = ? WHERE id = ?",
+                    (now + config.JOB_LEASE_SECONDS, now, row["id"])
+                )
+                conn.execute("COMMIT")
+                return dict(row)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def update_stage(job_id: str, stage: str = None):
+    """
+    Renews the lease of a running job, optionally recording its current stage.
+    """
+    now = time.time()
+    with closing(_connect()) as conn:
+        conn.execute(
+            "UPDATE jobs SET stage = COALESCE(?, stage), lease_until = ?, updated_at = ? "
+            "WHERE id = ? AND status = 'running'",
+            (stage, now + config.JOB_LEASE_SECONDS, now, job_id)
+        )
+
+
+def release_job(job_id: str):
+    """
+    Puts a running job back in the queue (e.g. on shutdown) without counting the attempt.
+    """
+    with closing(_connect()) as conn:
+        conn.execute(
+            "UPDATE jobs SET status = 'queued', stage = 'queued', attempts = MAX(attempts - 1, 0), "
+            "lease_until = NULL, updated_at = ? WHERE id = ? AND status = 'running'",
+            (time.time(), job_id)
+        )
+
+
+def _finish(conn: sqlite3.Connection, job_id: str, status: str, error: Optional[str], now: float):
+    conn.execute(
+        "UPDATE jobs SET status = ?, stage = ?, error = ?, text_input = NULL, guidance = NULL, "
+        "api_key = NULL, lease_until = NULL, updated_at = ?, finished_at = ? WHERE id = ?",
+        (status, status, error, now, now, job_id)
+    )
+    try:
+        os.remove(template_path(job_id))
+    except OSError:
+        pass
+
+
+def complete_job(job_id: str):
+    with closing(_connect()) as conn:
+        _finish(conn, job_id, "done", None, time.time())
+
+
+def fail_job(job_id: str, error: str):
+    with closing(_connect()) as conn:
+        _finish(conn, job_id, "failed", error, time.time())
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    """
+    Public view of a job (never includes its inputs or API key).
+    """
+    with closing(_connect()) as conn:
+        row = conn.execute(
+            "SELECT id, status, stage, error, attempts, created_at, updated_at, finished_at "
+            "FROM jobs WHERE id = ?",
+            (job_id,)
+        ).fetchone()
+    if row is None:
+        return None
+    job = dict(row)
+    job["expires_at"] = job["finished_at"] + config.JOB_RESULT_TTL_SECONDS if job["finished_at"] else None
+    return job
+
+
+def expire_jobs() -> int:
+    """
+    Deletes finished jobs (and their files) older than JOB_RESULT_TTL_SECONDS.
+    """
+    cutoff = time.time() - config.JOB_RESULT_TTL_SECONDS
+    with closing(_connect()) as conn:
+        ids = [r[0] for r in conn.execute("SELECT id FROM jobs WHERE finished_at < ?", (cutoff,)).fetchall()]
+        for job_id in ids:
+            shutil.rmtree(job_dir(job_id), ignore_errors=True)
+            conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+    if ids:
+        logger.info(f"Expired {len(ids)} finished jobs")
+    return len(ids)
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import os
+import time
+from typing import List, Optional
+from app import config
+from app.services import job_queue
+from app.services.slide_planner import generate_slide_plan
+from app.services.ppt_executor import open_template, analyze_template, save_presentation
+from app.services.uploads import map_template_file
+
+logger = logging.getLogger("JobWorker")
+logger.setLevel(logging.INFO)
+
+# Worker tasks of this process, and the event that wakes them up on submission
+_workers: List[asyncio.Task] = []
+_wakeup: Optional[asyncio.Event] = None
+_last_expiry = 0.0
+_EXPIRY_INTERVAL_SECONDS = 60
+
+
+def start_job_workers():
+    """
+    Starts JOB_WORKERS worker tasks on the running event loop.
+    Called once on application startup; fails it if the job storage is unsafe.
+    """
+    global _wakeup
+    job_queue.check_storage()
+    if config.JOB_WORKERS <= 0 or _workers:
+        return
+    _wakeup = asyncio.Event()
+    for n in range(config.JOB_WORKERS):
+        _workers.append(asyncio.create_task(_worker_loop(n), name=f"job-worker-{n}"))
+    logger.info(f"Started {config.JOB_WORKERS} job workers")
+
+
+async def stop_job_workers():
+    """
+    Stops the worker tasks. Jobs they were running go back to the queue.
+    Called once on application shutdown.
+    """
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+
+
+def notify_job_submitted():
+    """
+    Wakes up an idle worker of this process. Workers of other processes
+    pick the job up on their next poll.
+    """
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+async def _wait_for_work():
+    try:
+        await asyncio.wait_for(_wakeup.wait(), timeout=config.JOB_POLL_INTERVAL_SECONDS)
+    except asyncio.TimeoutError:
+        pass
+    _wakeup.clear()
+
+
+async def _expire_if_due():
+    global _last_expiry
+    now = time.monotonic()
+    if now - _last_expiry < _EXPIRY_INTERVAL_SECONDS:
+        return
+    _last_expiry = now
+    try:
+        await asyncio.to_thread(job_queue.expire_jobs)
+    except Exception as e:
+        logger.warning(f"Job expiry failed: {e}")
+
+
+async def _worker_loop(n: int):
+    while True:
+        await _expire_if_due()
+        try:
+            job = await asyncio.to_thread(job_queue.claim_job)
+        except Exception as e:
+            logger.error(f"Job worker {n} could not claim a job: {e}")
+            job = None
+        if job is None:
+            await _wait_for_work()
+            continue
+
+        try:
+            await run_job(job)
+        except asyncio.CancelledError:
+            logger.info(f"Job {job['id']} interrupted by shutdown, returning it to the queue")
+            await asyncio.shield(asyncio.to_thread(job_queue.release_job, job["id"]))
+            raise
+
+
+async def _keep_lease(job_id: str):
+    """
+    Renews the job lease while it runs, so it is not taken over by another worker.
+    """
+    while True:
+        await asyncio.sleep(config.JOB_LEASE_SECONDS / 3)
+        try:
+            await asyncio.to_thread(job_queue.update_stage, job_id)
+        except Exception as e:
+            logger.warning(f"Could not renew lease of job {job_id}: {e}")
+
+
+async def run_job(job: dict):
+    """
+    Runs planning and export for a claimed job and records the outcome.
+    """
+    job_id = job["id"]
+    logger.info(f"Running job {job_id} (attempt {job['attempts'] + 1})")
+    lease_task = asyncio.create_task(_keep_lease(job_id))
+    template = None
+    try:
+        await asyncio.to_thread(job_queue.update_stage, job_id, "analyzing")
+        try:
+            template_data = await asyncio.to_thread(map_template_file, job_queue.template_path(job_id))
+            template = await open_template(template_data)
+        except ValueError:
+            raise ValueError("Invalid PowerPoint template")
+        del template_data
+
+        template_metadata = await analyze_template(template)
+        if template_metadata.get("error"):
+            raise ValueError("Invalid PowerPoint template")
+
+        await asyncio.to_thread(job_queue.update_stage, job_id, "planning")
+        plan = await generate_slide_plan(job["text_input"], job["guidance"], job["api_key"])
+        if not plan:
+            raise ValueError("LLM returned empty plan")
+
+        await asyncio.to_thread(job_queue.update_stage, job_id, "building")
+        output_path = job_queue.result_path(job_id)
+        partial_path = f"{output_path}.part"
+        await save_presentation(template, plan, template_metadata, partial_path)
+        os.replace(partial_path, output_path)
+
+        await asyncio.to_thread(job_queue.complete_job, job_id)
+        logger.info(f"Job {job_id} done")
+
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.error(f"Job {job_id} failed: {e}")
+        await asyncio.to_thread(job_queue.fail_job, job_id, str(e))
+    finally:
+        lease_task.cancel()
+        if template:
+            template.close()
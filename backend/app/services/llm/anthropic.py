@@ -1,15 +1,20 @@
 import httpx
+import json
 import logging
-from .base import LLMClient
+from typing import AsyncIterator, Optional
+from .base import LLMClient, ProviderError, iter_sse_data, provider_error
+from .http_client import get_http_client
 
 logger = logging.getLogger("LLMClient")
 
 class AnthropicClient(LLMClient):
-    async def generate(self, prompt: str, api_key: str) -> str:
-        """
-        Anthropic Claude API client.
-        Supports Claude 3 models (Haiku, Sonnet, Opus).
-        """
+    provider = "anthropic"
+    # Use Claude 3 Haiku for speed and cost-effectiveness
+    model = "claude-3-haiku-20240307"
+    default_max_tokens = 2000
+    max_output_tokens = 4096
+
+    def _build_request(self, prompt: str, api_key: str, stream: bool = False, max_tokens: Optional[int] = None):
         url = "https://api.anthropic.com/v1/messages"
         headers = {
             "Content-Type": "application/json",
@@ -17,10 +22,9 @@ class AnthropicClient(LLMClient):
             "anthropic-version": "2023-06-01"
         }
         
-        # Use Claude 3 Haiku for speed and cost-effectiveness
         data = {
-            "model": "claude-3-haiku-20240307",
-            "max_tokens": 2000,
+            "model": self.model,
+            "max_tokens": self.output_budget(max_tokens),
             "temperature": 0.3,
             "messages": [
                 {
@@ -29,27 +33,72 @@ class AnthropicClient(LLMClient):
                 }
             ]
         }
+        if stream:
+            data["stream"] = True
+        return url, headers, data
+
+    async def generate(self, prompt: str, api_key: str, max_tokens: Optional[int] = None) -> str:
+        """
+        Anthropic Claude API client.
+        Supports Claude 3 models (Haiku, Sonnet, Opus).
+        """
+        url, headers, data = self._build_request(prompt, api_key, max_tokens=max_tokens)
 
         timeout = httpx.Timeout(30.0, connect=5.0)
         
-        async with httpx.AsyncClient(timeout=timeout) as client:
+        client = get_http_client(self.provider)
+        
+        try:
+            response = await client.post(url, json=data, headers=headers, timeout=timeout)
+            response.raise_for_status()
+            result = response.json()
+            
+            # Extract text from Anthropic response structure
             try:
-                response = await client.post(url, json=data, headers=headers)
-                response.raise_for_status()
-                result = response.json()
+                # Anthropic returns content as an array of content blocks
+                content = result['content'][0]['text']
+                return content
+            except (KeyError, IndexError) as e:
+                logger.error(f"Anthropic Response Parse Error: {result}")
+                raise ValueError("Unexpected response format from Anthropic")
                 
-                # Extract text from Anthropic response structure
-                try:
-                    # Anthropic returns content as an array of content blocks
-                    content = result['content'][0]['text']
-                    return content
-                except (KeyError, IndexError) as e:
-                    logger.error(f"Anthropic Response Parse Error: {result}")
-                    raise ValueError("Unexpected response format from Anthropic")
-                    
-            except httpx.HTTPStatusError as e:
-                logger.error(f"Anthropic API Error: {e.response.status_code} - {e.response.text}")
-                raise ValueError(f"Provider Error: {e.response.status_code}")
-            except Exception as e:
-                logger.error(f"Network/Client Error: {str(e)}")
-                raise ValueError("LLM Connection Failed")
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Anthropic API Error: {e.response.status_code} - {e.response.text}")
+            raise provider_error(e.response)
+        except Exception as e:
+            logger.error(f"Network/Client Error: {str(e)}")
+            raise ProviderError("LLM Connection Failed")
+
+    async def stream(self, prompt: str, api_key: str, max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        """
+        Streams text deltas from the Messages API (server-sent events).
+        """
+        url, headers, data = self._build_request(prompt, api_key, stream=True, max_tokens=max_tokens)
+
+        timeout = httpx.Timeout(30.0, connect=5.0)
+
+        client = get_http_client(self.provider)
+
+        try:
+            async with client.stream("POST", url, json=data, headers=headers, timeout=timeout) as response:
+                if response.is_error:
+                    await response.aread()
+                response.raise_for_status()
+                async for payload in iter_sse_data(response):
+                    event = json.loads(payload)
+                    event_type = event.get("type")
+                    if event_type == "content_block_delta":
+                        text = event.get("delta", {}).get("text")
+                        if text:
+                            yield text
+                    elif event_type == "message_stop":
+                        break
+                    elif event_type == "error":
+                        logger.error(f"Anthropic Stream Error: {event}")
+                        raise ValueError("Anthropic stream error")
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Anthropic API Error: {e.response.status_code} - {e.response.text}")
+            raise provider_error(e.response)
+        except Exception as e:
+            logger.error(f"Network/Client Error: {str(e)}")
+            raise ProviderError("LLM Connection Failed")
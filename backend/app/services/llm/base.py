@@ -1,10 +1,88 @@
+import time
 from abc import ABC, abstractmethod
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Optional
+
+
+class ProviderError(ValueError):
+    """
+    The provider rejected the call or could not be reached.
+    `status_code` is None for connection failures; `retry_after` holds the
+    provider's Retry-After hint in seconds, if any.
+    """
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parses a Retry-After header (delay in seconds or an HTTP date).
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def provider_error(response) -> ProviderError:
+    """
+    ProviderError for an HTTP error response.
+    """
+    return ProviderError(
+        f"Provider Error: {response.status_code}",
+        status_code=response.status_code,
+        retry_after=parse_retry_after(response.headers.get("retry-after"))
+    )
+
 
 class LLMClient(ABC):
+    # Provider name, used to pick the shared HTTP connection pool
+    provider = "unknown"
+    # Model identifier sent to the provider (part of the plan cache key)
+    model = "unknown"
+    # Output token budget used when the caller does not pass one, and the model's upper limit
+    default_max_tokens = None
+    max_output_tokens = None
+
+    def output_budget(self, max_tokens: Optional[int]) -> Optional[int]:
+        """
+        The output token limit to send: the caller's budget (or the default), capped by the model limit.
+        """
+        budget = max_tokens or self.default_max_tokens
+        if budget and self.max_output_tokens:
+            budget = min(budget, self.max_output_tokens)
+        return budget
+
     @abstractmethod
-    async def generate(self, prompt: str, api_key: str) -> str:
+    async def generate(self, prompt: str, api_key: str, max_tokens: Optional[int] = None) -> str:
         """
         Generates a response from the LLM provider.
         Must handle its own HTTP calls and error mapping.
+        `max_tokens` is the output token budget for this call (provider default if None).
         """
         pass
+
+    async def stream(self, prompt: str, api_key: str, max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        """
+        Streams the response as text chunks as the provider produces them.
+        Providers without streaming support yield the full response once.
+        """
+        yield await self.generate(prompt, api_key, max_tokens)
+
+
+async def iter_sse_data(response) -> AsyncIterator[str]:
+    """
+    Yields the payload of each `data:` line of a server-sent events response.
+    """
+    async for line in response.aiter_lines():
+        if line.startswith("data:"):
+            yield line[5:].strip()
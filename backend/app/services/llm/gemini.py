@@ -1,14 +1,24 @@
 import httpx
 import logging
 import json
-from .base import LLMClient
+from typing import AsyncIterator, Optional
+from .base import LLMClient, ProviderError, iter_sse_data, provider_error
+from .http_client import get_http_client
 
 logger = logging.getLogger("LLMClient")
 
 class GeminiClient(LLMClient):
-    async def generate(self, prompt: str, api_key: str) -> str:
-        # Use Gemini 1.5 Flash for speed and efficiency
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent?key={api_key}"
+    provider = "gemini"
+    # Use Gemini 1.5 Flash for speed and efficiency
+    model = "gemini-1.5-flash"
+    max_output_tokens = 8192
+
+    def _build_request(self, prompt: str, api_key: str, stream: bool = False, max_tokens: Optional[int] = None):
+        base_url = f"https://generativelanguage.googleapis.com/v1beta/models/{self.model}"
+        if stream:
+            url = f"{base_url}:streamGenerateContent?alt=sse&key={api_key}"
+        else:
+            url = f"{base_url}:generateContent?key={api_key}"
         
         headers = {
             "Content-Type": "application/json"
@@ -24,26 +34,60 @@ class GeminiClient(LLMClient):
                 "temperature": 0.3
             }
         }
+        budget = self.output_budget(max_tokens)
+        if budget:
+            data["generationConfig"]["maxOutputTokens"] = budget
+        return url, headers, data
+
+    async def generate(self, prompt: str, api_key: str, max_tokens: Optional[int] = None) -> str:
+        url, headers, data = self._build_request(prompt, api_key, max_tokens=max_tokens)
 
         timeout = httpx.Timeout(30.0, connect=5.0)
         
-        async with httpx.AsyncClient(timeout=timeout) as client:
+        client = get_http_client(self.provider)
+        
+        try:
+            response = await client.post(url, json=data, headers=headers, timeout=timeout)
+            response.raise_for_status()
+            result = response.json()
+            
+            # Extract text from Gemini response structure
             try:
-                response = await client.post(url, json=data, headers=headers)
-                response.raise_for_status()
-                result = response.json()
+                content = result['candidates'][0]['content']['parts'][0]['text']
+                return content
+            except (KeyError, IndexError) as e:
+                logger.error(f"Gemini Response Parse Error: {result}")
+                raise ValueError("Unexpected response format from Gemini")
                 
-                # Extract text from Gemini response structure
-                try:
-                    content = result['candidates'][0]['content']['parts'][0]['text']
-                    return content
-                except (KeyError, IndexError) as e:
-                    logger.error(f"Gemini Response Parse Error: {result}")
-                    raise ValueError("Unexpected response format from Gemini")
-                    
-            except httpx.HTTPStatusError as e:
-                logger.error(f"Gemini API Error: {e.response.status_code} - {e.response.text}")
-                raise ValueError(f"Provider Error: {e.response.status_code}")
-            except Exception as e:
-                logger.error(f"Network/Client Error: {str(e)}")
-                raise ValueError("LLM Connection Failed")
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Gemini API Error: {e.response.status_code} - {e.response.text}")
+            raise provider_error(e.response)
+        except Exception as e:
+            logger.error(f"Network/Client Error: {str(e)}")
+            raise ProviderError("LLM Connection Failed")
+
+    async def stream(self, prompt: str, api_key: str, max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        url, headers, data = self._build_request(prompt, api_key, stream=True, max_tokens=max_tokens)
+
+        timeout = httpx.Timeout(30.0, connect=5.0)
+
+        client = get_http_client(self.provider)
+
+        try:
+            async with client.stream("POST", url, json=data, headers=headers, timeout=timeout) as response:
+                if response.is_error:
+                    await response.aread()
+                response.raise_for_status()
+                async for payload in iter_sse_data(response):
+                    # Each event carries a partial GenerateContentResponse
+                    chunk = json.loads(payload)
+                    for candidate in chunk.get("candidates", [])[:1]:
+                        for part in candidate.get("content", {}).get("parts", []):
+                            if part.get("text"):
+                                yield part["text"]
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Gemini API Error: {e.response.status_code} - {e.response.text}")
+            raise provider_error(e.response)
+        except Exception as e:
+            logger.error(f"Network/Client Error: {str(e)}")
+            raise ProviderError("LLM Connection Failed")
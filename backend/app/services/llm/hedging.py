@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import math
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+from app import config
+
+logger = logging.getLogger("LLMHedging")
+logger.setLevel(logging.INFO)
+
+# Hedged LLM calls: if an attempt has not produced a result after a delay
+# derived from the provider's recent latency, an identical second request is
+# sent and whichever valid result arrives first is used; the other request is
+# cancelled. The number of hedge requests in flight is capped process-wide so
+# the extra cost stays bounded.
+
+T = TypeVar("T")
+
+_latencies: Dict[str, deque] = {}
+_hedges_in_flight = 0
+
+
+def record_latency(provider: str, seconds: float):
+    """
+    Records the latency of a successful call, used to derive the hedge delay.
+    """
+    window = _latencies.get(provider)
+    if window is None:
+        window = _latencies[provider] = deque(maxlen=config.LLM_HEDGE_WINDOW)
+    window.append(seconds)
+
+
+def latency_quantile(provider: str, quantile: float) -> Optional[float]:
+    """
+    Quantile of the recent latencies of a provider, or None without enough samples.
+    """
+    window = _latencies.get(provider)
+    if not window or len(window) < config.LLM_HEDGE_MIN_SAMPLES:
+        return None
+    ordered = sorted(window)
+    return ordered[min(len(ordered) - 1, math.ceil(quantile * len(ordered)) - 1)]
+
+
+def hedge_delay(provider: str) -> float:
+    observed = latency_quantile(provider, config.LLM_HEDGE_QUANTILE)
+    delay = observed if observed is not None else config.LLM_HEDGE_DEFAULT_DELAY_SECONDS
+    return max(delay, config.LLM_HEDGE_MIN_DELAY_SECONDS)
+
+
+def _acquire_hedge_slot() -> bool:
+    global _hedges_in_flight
+    if _hedges_in_flight >= config.LLM_HEDGE_MAX_IN_FLIGHT:
+        return False
+    _hedges_in_flight += 1
+    return True
+
+
+def _release_hedge_slot():
+    global _hedges_in_flight
+    _hedges_in_flight -= 1
+
+
+async def _cancel(tasks):
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def hedged(attempt: Callable[[bool], Awaitable[T]], provider: str, on_hedge: Callable[[str], None] = None) -> T:
+    """
+    Runs `attempt(False)`; if it is still running after the hedge delay and a
+    hedge slot is free, also runs `attempt(True)`. Returns the first successful
+    result and cancels the other attempt. If both fail, raises the last error.
+
+    `attempt` should include validation, so that an invalid response from one
+    request does not win over a valid one still in flight. `on_hedge` is called
+    with "sent" when the hedge starts and "won" when it beats the first request.
+    """
+    primary = asyncio.ensure_future(attempt(False))
+    if not config.LLM_HEDGE_ENABLED:
+        return await primary
+
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=hedge_delay(provider))
+    except BaseException:
+        await _cancel([primary])
+        raise
+    if done or not _acquire_hedge_slot():
+        return await primary
+
+    logger.info(f"{provider} call slower than {hedge_delay(provider):.1f}s, sending a hedge request")
+    if on_hedge:
+        on_hedge("sent")
+    hedge = asyncio.ensure_future(attempt(True))
+    pending = {primary, hedge}
+    try:
+        last_error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            # Prefer the first request if both finished together
+            for task in sorted(done, key=lambda t: t is hedge):
+                if task.exception() is None:
+                    if task is hedge and on_hedge:
+                        on_hedge("won")
+                    return task.result()
+                last_error = task.exception()
+        raise last_error
+    finally:
+        await _cancel(list(pending))
+        _release_hedge_slot()
@@ -0,0 +1,56 @@
+import httpx
+import logging
+from typing import Dict
+from app import config
+
+logger = logging.getLogger("LLMHttpClient")
+
+try:
+    import h2  # noqa: F401  (enables httpx HTTP/2 support)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# One pooled client per provider, shared by every request in this process
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def get_http_client(provider: str) -> httpx.AsyncClient:
+    """
+    Returns the process-wide pooled HTTP client for an LLM provider.
+    Connections are kept alive and reused across requests, so only the first
+    call to a provider pays for the TCP+TLS handshake.
+    """
+    client = _clients.get(provider)
+    if client is None or client.is_closed:
+        limits = httpx.Limits(
+            max_connections=config.LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=config.LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=config.LLM_KEEPALIVE_EXPIRY
+        )
+        client = httpx.AsyncClient(
+            limits=limits,
+            http2=HTTP2_AVAILABLE,
+            timeout=httpx.Timeout(30.0, connect=5.0)
+        )
+        _clients[provider] = client
+        logger.info(f"Opened pooled HTTP client for {provider} (http2={HTTP2_AVAILABLE})")
+    return client
+
+
+def start_http_clients(providers):
+    """
+    Creates the pooled clients up front. Called once on application startup.
+    """
+    for provider in providers:
+        get_http_client(provider)
+
+
+async def close_http_clients():
+    """
+    Closes all pooled clients. Called once on application shutdown.
+    """
+    for provider, client in list(_clients.items()):
+        await client.aclose()
+        logger.info(f"Closed pooled HTTP client for {provider}")
+    _clients.clear()
@@ -1,38 +1,80 @@
 import httpx
+import json
 import logging
-from .base import LLMClient
+from typing import AsyncIterator, Optional
+from .base import LLMClient, ProviderError, iter_sse_data, provider_error
+from .http_client import get_http_client
 
 logger = logging.getLogger("LLMClient")
 
 class OpenAIClient(LLMClient):
-    async def generate(self, prompt: str, api_key: str) -> str:
+    provider = "openai"
+    model = "gpt-3.5-turbo"
+    default_max_tokens = 1500
+    max_output_tokens = 4096
+
+    def _build_request(self, prompt: str, api_key: str, stream: bool = False, max_tokens: Optional[int] = None):
         url = "https://api.openai.com/v1/chat/completions"
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {api_key}"
         }
         data = {
-            "model": "gpt-3.5-turbo",
+            "model": self.model,
             "messages": [
                 {"role": "system", "content": "You are a helpful assistant that outputs JSON."},
                 {"role": "user", "content": prompt}
             ],
             "temperature": 0.3,
-            "max_tokens": 1500
+            "max_tokens": self.output_budget(max_tokens)
         }
+        if stream:
+            data["stream"] = True
+        return url, headers, data
+
+    async def generate(self, prompt: str, api_key: str, max_tokens: Optional[int] = None) -> str:
+        url, headers, data = self._build_request(prompt, api_key, max_tokens=max_tokens)
 
         timeout = httpx.Timeout(20.0, connect=5.0)
         
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            try:
-                response = await client.post(url, json=data, headers=headers)
+        client = get_http_client(self.provider)
+        
+        try:
+            response = await client.post(url, json=data, headers=headers, timeout=timeout)
+            response.raise_for_status()
+            result = response.json()
+            content = result['choices'][0]['message']['content']
+            return content
+        except httpx.HTTPStatusError as e:
+            logger.error(f"OpenAI API Error: {e.response.status_code} - {e.response.text}")
+            raise provider_error(e.response)
+        except Exception as e:
+            logger.error(f"Network/Client Error: {str(e)}")
+            raise ProviderError("LLM Connection Failed")
+
+    async def stream(self, prompt: str, api_key: str, max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        url, headers, data = self._build_request(prompt, api_key, stream=True, max_tokens=max_tokens)
+
+        # Streams send data continuously, so the read timeout applies between chunks
+        timeout = httpx.Timeout(20.0, connect=5.0)
+
+        client = get_http_client(self.provider)
+
+        try:
+            async with client.stream("POST", url, json=data, headers=headers, timeout=timeout) as response:
+                if response.is_error:
+                    await response.aread()
                 response.raise_for_status()
-                result = response.json()
-                content = result['choices'][0]['message']['content']
-                return content
-            except httpx.HTTPStatusError as e:
-                logger.error(f"OpenAI API Error: {e.response.status_code} - {e.response.text}")
-                raise ValueError(f"Provider Error: {e.response.status_code}")
-            except Exception as e:
-                logger.error(f"Network/Client Error: {str(e)}")
-                raise ValueError("LLM Connection Failed")
+                async for payload in iter_sse_data(response):
+                    if payload == "[DONE]":
+                        break
+                    choices = json.loads(payload).get("choices") or [{}]
+                    text = choices[0].get("delta", {}).get("content")
+                    if text:
+                        yield text
+        except httpx.HTTPStatusError as e:
+            logger.error(f"OpenAI API Error: {e.response.status_code} - {e.response.text}")
+            raise provider_error(e.response)
+        except Exception as e:
+            logger.error(f"Network/Client Error: {str(e)}")
+            raise ProviderError("LLM Connection Failed")
@@ -0,0 +1,206 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+# In-process metrics: per-request stage timings (returned as a Server-Timing
+# header) and Prometheus-format histograms and counters (served at /metrics).
+#
+# Stage timings are collected in a context variable, so they follow the request
+# into asyncio tasks and asyncio.to_thread calls. Work done in the process pool
+# is timed as a whole by the caller. Each server process keeps its own metrics.
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = tuple(1024 * 4 ** i for i in range(10))  # 1 KiB .. 256 MiB
+
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = (), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, (counts, total, count) in sorted(self._series.items()):
+                labels = _format_labels(self.label_names, label_values)
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{self.name}_bucket{_join_labels(labels, _le(bound))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_join_labels(labels, _le('+Inf'))} {count}")
+                lines.append(f"{self.name}_sum{_wrap(labels)} {total:.6f}")
+                lines.append(f"{self.name}_count{_wrap(labels)} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_wrap(_format_labels(self.label_names, label_values))} {value:g}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, *label_values: str):
+        with self._lock:
+            self._values[label_values] = value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_wrap(_format_labels(self.label_names, label_values))} {value:g}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _join_labels(labels: str, extra: str) -> str:
+    return "{" + (f"{labels},{extra}" if labels else extra) + "}"
+
+
+def _le(bound) -> str:
+    return f'le="{bound:g}"' if isinstance(bound, (int, float)) else f'le="{bound}"'
+
+
+def _wrap(labels: str) -> str:
+    return "{" + labels + "}" if labels else ""
+
+
+HTTP_REQUEST_DURATION = Histogram(
+    "ppt_http_request_duration_seconds", "Time to produce the response headers", ("path", "status")
+)
+STAGE_DURATION = Histogram(
+    "ppt_stage_duration_seconds", "Time spent in each generation stage", ("stage",)
+)
+LLM_REQUEST_DURATION = Histogram(
+    "ppt_llm_request_duration_seconds", "Latency of LLM calls", ("provider", "model", "outcome")
+)
+LLM_RESPONSE_SIZE = Histogram(
+    "ppt_llm_response_bytes", "Size of raw LLM responses", ("provider", "model"), buckets=SIZE_BUCKETS
+)
+LLM_RETRIES = Counter(
+    "ppt_llm_retries_total", "LLM calls repeated after invalid output or a provider error",
+    ("provider", "model", "reason")
+)
+LLM_HEDGES = Counter(
+    "ppt_llm_hedges_total", "Hedge requests sent for slow LLM calls, and how many of them won",
+    ("provider", "model", "result")
+)
+DECK_SIZE = Histogram(
+    "ppt_deck_size_bytes", "Size of generated PPTX files", buckets=SIZE_BUCKETS
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    "ppt_admission_in_flight", "Requests holding an admission slot", ("limiter",)
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "ppt_admission_queue_depth", "Requests waiting for an admission slot", ("limiter",)
+)
+ADMISSION_WAIT = Histogram(
+    "ppt_admission_wait_seconds", "Time requests waited for an admission slot", ("limiter", "outcome")
+)
+ADMISSION_REJECTIONS = Counter(
+    "ppt_admission_rejections_total", "Requests turned away by admission control", ("limiter", "reason")
+)
+
+_METRICS = [
+    HTTP_REQUEST_DURATION, STAGE_DURATION, LLM_REQUEST_DURATION, LLM_RESPONSE_SIZE, LLM_RETRIES, LLM_HEDGES, DECK_SIZE,
+    ADMISSION_IN_FLIGHT, ADMISSION_QUEUE_DEPTH, ADMISSION_WAIT, ADMISSION_REJECTIONS
+]
+
+
+def start_request_timings() -> Dict[str, float]:
+    """
+    Starts collecting stage timings for the current request and returns the
+    (ordered) stage -> seconds dict they are added to.
+    """
+    timings = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def record_stage(stage: str, seconds: float):
+    """
+    Adds a stage duration to the current request (summed if the stage repeats,
+    e.g. once per slide) and to the stage histogram.
+    """
+    STAGE_DURATION.observe(seconds, stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def timed(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+def record_llm_call(provider: str, model: str, seconds: float, outcome: str, response_size: int = None):
+    LLM_REQUEST_DURATION.observe(seconds, provider, model, outcome)
+    if response_size is not None:
+        LLM_RESPONSE_SIZE.observe(response_size, provider, model)
+
+
+def format_server_timing(timings: Dict[str, float]) -> str:
+    """
+    Server-Timing header value, durations in milliseconds.
+    """
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items())
+
+
+def render_metrics(extra_lines: list = ()) -> str:
+    lines = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    lines.extend(extra_lines)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,158 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from contextlib import closing
+from typing import Optional
+from app import config
+from app.services.private_dirs import ensure_private_dir
+from app.services.prompt_builder import PROMPT_VERSION
+
+logger = logging.getLogger("PlanCache")
+logger.setLevel(logging.INFO)
+
+# Content-addressed cache of validated slide plans.
+# Stored in a local SQLite database (WAL mode) so every uvicorn worker on the
+# host shares it. Entries expire after a TTL; when the total stored size goes
+# over the limit, the least recently used entries are evicted. The database
+# directory must be private to this user (see private_dirs); if it is not,
+# every lookup fails and the cache is effectively off.
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS plans (
+    key TEXT PRIMARY KEY,
+    plan TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS plans_accessed_at ON plans (accessed_at);
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+_initialized_path = None
+
+
+def make_key(text_input: str, guidance: Optional[str], provider: str, model: str) -> str:
+    """
+    Cache key: hash of the input, guidance, provider, model and prompt version.
+    The API key is never part of it.
+    """
+    payload = json.dumps([PROMPT_VERSION, provider, model, text_input, guidance or ""])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _connect() -> sqlite3.Connection:
+    global _initialized_path
+    path = config.PLAN_CACHE_PATH
+    ensure_private_dir(os.path.dirname(os.path.abspath(path)))
+    conn = sqlite3.connect(path, timeout=5.0, isolation_level=None)
+    if _initialized_path != path:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        _initialized_path = path
+    return conn
+
+
+def _count(conn: sqlite3.Connection, name: str):
+    conn.execute(
+        "INSERT INTO stats (name, value) VALUES (?, 1) "
+        "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+        (name,)
+    )
+
+
+def _get(key: str) -> Optional[dict]:
+    now = time.time()
+    with closing(_connect()) as conn:
+        row = conn.execute("SELECT plan, created_at FROM plans WHERE key = ?", (key,)).fetchone()
+        if row and now - row[1] > config.PLAN_CACHE_TTL_SECONDS:
+            conn.execute("DELETE FROM plans WHERE key = ?", (key,))
+            row = None
+        if row is None:
+            _count(conn, "misses")
+            return None
+        conn.execute("UPDATE plans SET accessed_at = ? WHERE key = ?", (now, key))
+        _count(conn, "hits")
+        return json.loads(row[0])
+
+
+def _put(key: str, plan: dict):
+    now = time.time()
+    data = json.dumps(plan)
+    with closing(_connect()) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO plans (key, plan, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+            (key, data, len(data), now, now)
+        )
+        _evict(conn, now)
+
+
+def _evict(conn: sqlite3.Connection, now: float):
+    """
+    Drops expired entries, then least recently used ones until under the size limit.
+    """
+    conn.execute("DELETE FROM plans WHERE created_at < ?", (now - config.PLAN_CACHE_TTL_SECONDS,))
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM plans").fetchone()[0]
+    if total <= config.PLAN_CACHE_MAX_BYTES:
+        return
+
+    evicted = 0
+    for key, size in conn.execute("SELECT key, size FROM plans ORDER BY accessed_at").fetchall():
+        if total <= config.PLAN_CACHE_MAX_BYTES:
+            break
+        conn.execute("DELETE FROM plans WHERE key = ?", (key,))
+        total -= size
+        evicted += 1
+        _count(conn, "evictions")
+    logger.info(f"Evicted {evicted} cached plans")
+
+
+def stats() -> dict:
+    """
+    Hit/miss/eviction counters (shared by all workers) plus current entry count and size.
+    """
+    with closing(_connect()) as conn:
+        counters = dict(conn.execute("SELECT name, value FROM stats").fetchall())
+        entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM plans").fetchone()
+    return {
+        "hits": counters.get("hits", 0),
+        "misses": counters.get("misses", 0),
+        "evictions": counters.get("evictions", 0),
+        "entries": entries,
+        "size_bytes": size
+    }
+
+
+async def get_plan(key: str) -> Optional[dict]:
+    """
+    Returns the cached plan for a key, or None. Cache errors count as misses.
+    """
+    if not config.PLAN_CACHE_ENABLED:
+        return None
+    try:
+        plan = await asyncio.to_thread(_get, key)
+    except Exception as e:
+        logger.warning(f"Plan cache read failed: {e}")
+        return None
+    if plan:
+        logger.info("Plan cache hit")
+    return plan
+
+
+async def put_plan(key: str, plan: dict):
+    """
+    Stores a validated plan. Cache errors are logged and ignored.
+    """
+    if not config.PLAN_CACHE_ENABLED:
+        return
+    try:
+        await asyncio.to_thread(_put, key, plan)
+    except Exception as e:
+        logger.warning(f"Plan cache write failed: {e}")
@@ -0,0 +1,86 @@
+import json
+import logging
+from typing import List
+
+logger = logging.getLogger("PlanStream")
+
+
+class SlideStreamParser:
+    """
+    Incremental parser for a streamed slide plan.
+
+    Feed it text chunks as they arrive from the LLM; it returns each object of
+    the top-level "slides" array as soon as that object's closing brace is seen.
+    Only the structure (brackets, strings, escapes) is tracked while streaming;
+    each completed slide object is decoded with json.loads on its own slice.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_key = None
+
+        self._slides_depth = None
+        self._slide_start = None
+
+    @property
+    def text(self) -> str:
+        """
+        All text received so far.
+        """
+        return self._text
+
+    def feed(self, chunk: str) -> List[dict]:
+        """
+        Consumes a chunk of streamed text and returns the slides completed by it.
+        """
+        self._text += chunk
+        completed = []
+        text = self._text
+
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    # Remember the last string at the top-level object depth (a key candidate)
+                    if self._depth == 1:
+                        self._last_key = text[self._string_start + 1:i]
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch in "{[":
+                self._depth += 1
+                if ch == "[" and self._depth == 2 and self._last_key == "slides":
+                    self._slides_depth = self._depth
+                elif ch == "{" and self._slides_depth and self._depth == self._slides_depth + 1:
+                    self._slide_start = i
+            elif ch in "}]":
+                if ch == "}" and self._slide_start is not None and self._depth == self._slides_depth + 1:
+                    completed.append(self._decode_slide(text[self._slide_start:i + 1]))
+                    self._slide_start = None
+                elif ch == "]" and self._depth == self._slides_depth:
+                    self._slides_depth = None
+                self._depth -= 1
+
+        self._pos = len(text)
+        return [slide for slide in completed if slide is not None]
+
+    def _decode_slide(self, raw: str):
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError as e:
+            logger.warning(f"Could not decode streamed slide: {e}")
+            return None
@@ -1,26 +1,119 @@
-from pptx import Presentation
 from pptx.enum.shapes import MSO_SHAPE_TYPE
+import hashlib
 import io
 import logging
 from typing import List, Dict, Any
 from PIL import Image
+from .template_loader import load_template
 
 logger = logging.getLogger("ImageExtractor")
 logger.setLevel(logging.INFO)
 
-def extract_images_from_template(template_bytes: bytes) -> Dict[str, Any]:
+
+class ImageRef:
+    """
+    Lazy, zero-copy handle to an image stored in the template package.
+
+    Carries the zip member name, size and sha1 of the image. The bytes stay in
+    the parsed template's image part and are only handed out by `load()`, which
+    charges them against the request's image memory budget. When pickled (e.g.
+    to return metadata from a worker process) only the descriptive fields travel.
+    """
+
+    __slots__ = ("partname", "size", "sha1", "_part")
+
+    def __init__(self, image_part):
+        blob = image_part.blob
+        self.partname = str(image_part.partname)
+        self.size = len(blob)
+        self.sha1 = hashlib.sha1(blob).hexdigest()
+        self._part = image_part
+
+    @property
+    def member(self) -> str:
+        """
+        Name of the ZIP member holding the image.
+        """
+        return self.partname.lstrip("/")
+
+    def load(self, budget=None):
+        """
+        Returns the image bytes, or None if they are unavailable or over budget.
+        """
+        if self._part is None:
+            return None
+        if budget is not None and not budget.charge(self.size):
+            logger.warning(f"Image memory budget exceeded, skipping {self.partname} ({self.size} bytes)")
+            return None
+        return self._part.blob
+
+    def __getstate__(self):
+        return {"partname": self.partname, "size": self.size, "sha1": self.sha1}
+
+    def to_dict(self) -> dict:
+        """
+        The descriptive fields, e.g. for JSON; see from_dict.
+        """
+        return self.__getstate__()
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ImageRef":
+        """
+        A detached ImageRef (no bytes), as after unpickling.
+        """
+        image_ref = cls.__new__(cls)
+        image_ref.__setstate__(data)
+        return image_ref
+
+    def __setstate__(self, state):
+        self.partname = state["partname"]
+        self.size = state["size"]
+        self.sha1 = state["sha1"]
+        self._part = None
+
+
+class ImageMemoryBudget:
+    """
+    Per-request cap on image bytes loaded from the template.
+    """
+
+    def __init__(self, limit_bytes: int):
+        self.limit_bytes = limit_bytes
+        self.used_bytes = 0
+
+    def charge(self, nbytes: int) -> bool:
+        if self.used_bytes + nbytes > self.limit_bytes:
+            return False
+        self.used_bytes += nbytes
+        return True
+
+
+def load_image_blob(image_data: dict, budget=None):
+    """
+    Returns the bytes of a catalogued image, loading them lazily from its ImageRef.
+    """
+    image_ref = image_data.get("image")
+    if image_ref is not None:
+        return image_ref.load(budget)
+    return image_data.get("blob")
+
+def extract_images_from_template(template, media: Dict[str, Any] = None) -> Dict[str, Any]:
     """
     Extracts all images from a PowerPoint template.
+    Accepts raw PPTX bytes or a ParsedTemplate. `media` (partname -> format and
+    dimensions, from the package scan) spares decoding the image headers again.
     Returns a dictionary containing image data and metadata.
     """
     try:
-        prs = Presentation(io.BytesIO(template_bytes))
+        prs = load_template(template).presentation
     except Exception as e:
         logger.error(f"Failed to load template for image extraction: {e}")
         return {"images": [], "error": str(e)}
     
     images_catalog = []
     image_id = 0
+    # One ImageRef (and one header inspection) per image part, however often it is used
+    image_refs = {}
     
     # Iterate through all slides
     for slide_idx, slide in enumerate(prs.slides):
@@ -29,14 +122,14 @@ def extract_images_from_template(template_bytes: bytes) -> Dict[str, Any]:
             try:
                 # Check if shape is a picture
                 if shape.shape_type == MSO_SHAPE_TYPE.PICTURE:
-                    image_data = extract_image_from_shape(shape, slide_idx, shape_idx, image_id)
+                    image_data = extract_image_from_shape(shape, slide_idx, shape_idx, image_id, image_refs, media)
                     if image_data:
                         images_catalog.append(image_data)
                         image_id += 1
                         
                 # Check if shape is a placeholder that might contain an image
                 elif hasattr(shape, 'image'):
-                    image_data = extract_image_from_shape(shape, slide_idx, shape_idx, image_id)
+                    image_data = extract_image_from_shape(shape, slide_idx, shape_idx, image_id, image_refs, media)
                     if image_data:
                         images_catalog.append(image_data)
                         image_id += 1
@@ -53,17 +146,37 @@ def extract_images_from_template(template_bytes: bytes) -> Dict[str, Any]:
     }
 
 
-def extract_image_from_shape(shape, slide_idx: int, shape_idx: int, image_id: int) -> Dict[str, Any]:
+def extract_image_from_shape(shape, slide_idx: int, shape_idx: int, image_id: int, image_refs: dict = None, media: dict = None) -> Dict[str, Any]:
     """
     Extracts image data from a shape.
-    Returns metadata including position, size, and binary data.
+    Returns metadata including position, size, and a lazy ImageRef to the bytes.
     """
     try:
-        # Get image binary data
-        image_blob = shape.image.blob
+        image_part = shape.part.related_part(shape._element.blip_rId)
+        partname = str(image_part.partname)
         
-        # Get image format
-        image_format = shape.image.content_type.split('/')[-1]
+        cached = image_refs.get(partname) if image_refs is not None else None
+        if cached:
+            image_ref, image_format, img_width, img_height = cached
+        else:
+            image_ref = ImageRef(image_part)
+            
+            # Get image format
+            image_format = image_part.content_type.split('/')[-1]
+            
+            # Dimensions from the package scan, else from Pillow (reads the header only)
+            scanned = media.get(partname) if media else None
+            if scanned and scanned["width"]:
+                img_width, img_height = scanned["width"], scanned["height"]
+            else:
+                try:
+                    img = Image.open(io.BytesIO(image_part.blob))
+                    img_width, img_height = img.size
+                except:
+                    img_width, img_height = None, None
+            
+            if image_refs is not None:
+                image_refs[partname] = (image_ref, image_format, img_width, img_height)
         
         # Get position and size
         left = shape.left
@@ -71,18 +184,12 @@ def extract_image_from_shape(shape, slide_idx: int, shape_idx: int, image_id: in
         width = shape.width
         height = shape.height
         
-        # Try to get image dimensions using Pillow
-        try:
-            img = Image.open(io.BytesIO(image_blob))
-            img_width, img_height = img.size
-        except:
-            img_width, img_height = None, None
-        
         return {
             "id": image_id,
             "slide_index": slide_idx,
             "shape_index": shape_idx,
-            "blob": image_blob,
+            "image": image_ref,
+            "partname": partname,
             "format": image_format,
             "position": {
                 "left": left,
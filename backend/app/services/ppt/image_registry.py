@@ -0,0 +1,96 @@
+import io
+import logging
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.util import Inches
+from .image_extractor import load_image_blob
+
+logger = logging.getLogger("ImageRegistry")
+
+
+class ImageRegistry:
+    """
+    Per-presentation registry of template images that are stamped onto generated slides.
+
+    Each catalogued image is resolved to a package image part once: the part the
+    template already contains (looked up by partname), or a new part embedded on
+    first use. Every later slide only gets a relationship to that part and a
+    `p:pic` element, so image bytes are never re-hashed or re-inspected per slide.
+
+    Each distinct image part the generated slides use is charged once against
+    the optional ImageMemoryBudget, whether it already was in the package or
+    had to be loaded: either way its bytes are kept for and written into this
+    request's deck. Images over budget are left out.
+    """
+
+    def __init__(self, prs, budget=None):
+        self.prs = prs
+        self.budget = budget
+        self._package = prs.part.package
+        self._parts_by_name = None
+        # image id -> image part, or None when the image is unavailable or over budget
+        self._parts_by_id = {}
+        # Partnames already charged against the budget
+        self._charged_parts = set()
+
+    def _find_existing_part(self, partname):
+        if not partname:
+            return None
+        if self._parts_by_name is None:
+            self._parts_by_name = {
+                str(part.partname): part for part in self._package.iter_parts()
+            }
+        return self._parts_by_name.get(partname)
+
+    def get_image_part(self, image_data: dict):
+        """
+        Returns the image part for a catalogued image, creating it at most once.
+        """
+        image_id = image_data.get("id")
+        if image_id in self._parts_by_id:
+            return self._parts_by_id[image_id]
+
+        image_part = self._find_existing_part(image_data.get("partname"))
+        if image_part is not None:
+            if not self._charge(image_part):
+                image_part = None
+        else:
+            # Charged by the load itself
+            blob = load_image_blob(image_data, self.budget)
+            if blob:
+                image_part = self._package.get_or_add_image_part(io.BytesIO(blob))
+                self._charged_parts.add(str(image_part.partname))
+
+        self._parts_by_id[image_id] = image_part
+        return image_part
+
+    def _charge(self, image_part) -> bool:
+        partname = str(image_part.partname)
+        if self.budget is None or partname in self._charged_parts:
+            return True
+        size = len(image_part.blob)
+        if not self.budget.charge(size):
+            logger.warning(f"Image memory budget exceeded, skipping {partname} ({size} bytes)")
+            return False
+        self._charged_parts.add(partname)
+        return True
+
+    def add_to_slide(self, slide, image_data: dict):
+        """
+        Adds a catalogued image to a slide at its original position.
+        """
+        image_part = self.get_image_part(image_data)
+        if image_part is None:
+            return
+
+        position = image_data.get("position", {})
+        left = position.get("left", Inches(1))
+        top = position.get("top", Inches(1))
+        width = position.get("width", Inches(1))
+        height = position.get("height", Inches(1))
+
+        rId = slide.part.relate_to(image_part, RT.IMAGE)
+        shapes = slide.shapes
+        shape_id = shapes._next_shape_id
+        shapes._spTree.add_pic(
+            shape_id, f"Picture {shape_id - 1}", image_part.desc, rId, left, top, width, height
+        )
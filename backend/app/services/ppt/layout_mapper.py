@@ -1,54 +1,385 @@
 from pptx.presentation import Presentation
 from pptx.enum.shapes import PP_PLACEHOLDER
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.oxml import parse_xml
+from pptx.oxml.ns import qn
+from pptx.util import Emu
 import logging
+import math
+import threading
 
 logger = logging.getLogger("LayoutMapper")
+logger.setLevel(logging.INFO)
+
+# Placeholder types (p:ph/@type) filled with the slide title and bullets.
+# A placeholder without a type attribute is an object placeholder. Title slides
+# usually have a subtitle instead of a body; the bullets then go there.
+_TITLE_PH_TYPES = {"title", "ctrTitle"}
+_BODY_PH_TYPES = {"body", "obj"}
+_SUBTITLE_PH_TYPE = "subTitle"
+
+_PH_PATH = "/".join((qn("p:nvSpPr"), qn("p:nvPr"), qn("p:ph")))
+_OFF_PATH = "/".join((qn("p:spPr"), qn("a:xfrm"), qn("a:off")))
+_EXT_PATH = "/".join((qn("p:spPr"), qn("a:xfrm"), qn("a:ext")))
+
+# Font sizes assumed when neither the placeholders nor the master text styles set one (Office defaults)
+_DEFAULT_FONT_PT = {"title": 44, "ctrTitle": 44, "subTitle": 24}
+_DEFAULT_BODY_FONT_PT = 28
+# Average glyph width and line height relative to the font size
+_AVG_CHAR_WIDTH_EM = 0.5
+_LINE_HEIGHT_EM = 1.2
+
+# Room a bullet takes beyond its text (indent, the unused end of its last line)
+_BULLET_OVERHEAD_CHARS = 20
+# Granularity of the demand -> candidates lookup table
+_DEMAND_BUCKET_CHARS = 100
+
+
+def _shape_elements(spTree) -> list:
+    """
+    Shape elements of a shape tree, in the order python-pptx lists the shapes.
+    """
+    return [el for el in spTree.iterchildren() if el.tag not in (qn("p:nvGrpSpPr"), qn("p:grpSpPr"))]
+
+
+def placeholder_slots(spTree) -> dict:
+    """
+    Returns {"title": index, "body": index} positions among the shapes of a shape tree.
+    A subtitle is used as the body when there is no body placeholder.
+    """
+    slots = {}
+    subtitle = None
+    for idx, el in enumerate(_shape_elements(spTree)):
+        if el.tag != qn("p:sp"):
+            continue
+        ph = el.find(_PH_PATH)
+        if ph is None:
+            continue
+        ph_type = ph.get("type", "obj")
+        if ph_type in _TITLE_PH_TYPES and "title" not in slots:
+            slots["title"] = idx
+        elif ph_type in _BODY_PH_TYPES and "body" not in slots:
+            slots["body"] = idx
+        elif ph_type == _SUBTITLE_PH_TYPE and subtitle is None:
+            subtitle = idx
+    if "body" not in slots and subtitle is not None:
+        slots["body"] = subtitle
+    return slots
+
+
+def _font_size_pt(elements, default: float) -> float:
+    """
+    First explicit font size (first-level list style, then runs) found in the given shape elements.
+    """
+    for el in elements:
+        sizes = el.xpath("./p:txBody/a:lstStyle/a:lvl1pPr/a:defRPr/@sz") or el.xpath(".//a:rPr/@sz")
+        if sizes:
+            return int(sizes[0]) / 100
+    return default
+
+
+def _typeface(elements, theme_fonts: dict, ph_type: str):
+    """
+    Latin typeface set on the given shape elements, else the theme's heading
+    (titles) or body font.
+    """
+    for el in elements:
+        faces = el.xpath("./p:txBody/a:lstStyle/a:lvl1pPr/a:defRPr/a:latin/@typeface") or el.xpath(".//a:rPr/a:latin/@typeface")
+        if faces:
+            face = faces[0]
+            if face.startswith("+mj"):
+                return theme_fonts.get("major")
+            if face.startswith("+mn"):
+                return theme_fonts.get("minor")
+            return face
+    return theme_fonts.get("major" if ph_type in _TITLE_PH_TYPES else "minor")
+
+
+def _theme_fonts(master) -> dict:
+    """
+    {"major": typeface, "minor": typeface} of a slide master's theme.
+    """
+    try:
+        theme = parse_xml(master.part.part_related_by(RT.THEME).blob)
+    except Exception as e:
+        logger.debug(f"Could not read theme fonts: {e}")
+        return {}
+    fonts = {}
+    for key, path in (("major", "a:majorFont"), ("minor", "a:minorFont")):
+        faces = theme.xpath(f".//a:fontScheme/{path}/a:latin/@typeface")
+        if faces and faces[0]:
+            fonts[key] = faces[0]
+    return fonts
+
+
+def _geometry(elements):
+    """
+    (left, top, width, height) of the first element that sets its own position.
+    """
+    for el in elements:
+        off = el.find(_OFF_PATH)
+        ext = el.find(_EXT_PATH)
+        if off is not None and ext is not None:
+            return int(off.get("x")), int(off.get("y")), int(ext.get("cx")), int(ext.get("cy"))
+    return 0, 0, 0, 0
+
+
+def _text_capacity(width: int, height: int, font_pt: float) -> dict:
+    """
+    Rough number of lines and characters per line that fit in a placeholder.
+    """
+    width_pt = Emu(width).pt
+    height_pt = Emu(height).pt
+    chars_per_line = max(1, int(width_pt / (font_pt * _AVG_CHAR_WIDTH_EM)))
+    lines = max(1, int(height_pt / (font_pt * _LINE_HEIGHT_EM)))
+    return {"font_pt": font_pt, "lines": lines, "chars_per_line": chars_per_line, "chars": lines * chars_per_line}
+
+
+def _placeholder_elements(spTree) -> list:
+    """
+    (element, type, idx) of every placeholder shape in a shape tree.
+    """
+    found = []
+    for el in spTree.iterchildren(qn("p:sp")):
+        ph = el.find(_PH_PATH)
+        if ph is not None:
+            found.append((el, ph.get("type", "obj"), int(ph.get("idx", 0))))
+    return found
+
+
+def _master_key(ph_type: str) -> str:
+    # Masters only have title and body placeholders for the text types
+    if ph_type in _TITLE_PH_TYPES:
+        return "title"
+    if ph_type in _BODY_PH_TYPES or ph_type == _SUBTITLE_PH_TYPE:
+        return "body"
+    return ph_type
+
+
+class _Inheritance:
+    """
+    Placeholder elements of one layout and its master, which slide placeholders
+    inherit position and formatting from (by idx, then by type).
+    """
+
+    def __init__(self, layout, theme_fonts: dict):
+        self.theme_fonts = theme_fonts
+        self.by_idx = {}
+        self.by_type = {}
+        for el, ph_type, idx in _placeholder_elements(layout._element.cSld.spTree):
+            self.by_idx.setdefault(idx, el)
+            self.by_type.setdefault(ph_type, el)
+        self.master = {}
+        for el, ph_type, _ in _placeholder_elements(layout.slide_master._element.cSld.spTree):
+            self.master.setdefault(_master_key(ph_type), el)
+        # Master text styles: the font size placeholders fall back to
+        self.style_pt = {}
+        for key, style in (("title", "p:titleStyle"), ("body", "p:bodyStyle")):
+            sizes = layout.slide_master._element.xpath(f"./p:txStyles/{style}/a:lvl1pPr/a:defRPr/@sz")
+            if sizes:
+                self.style_pt[key] = int(sizes[0]) / 100
+
+    def chain(self, el, ph_type: str, idx: int, on_layout: bool) -> list:
+        chain = [el]
+        if not on_layout:
+            parent = self.by_idx.get(idx)
+            if parent is None:
+                parent = self.by_type.get(ph_type)
+            if parent is not None:
+                chain.append(parent)
+        master = self.master.get(_master_key(ph_type))
+        if master is not None:
+            chain.append(master)
+        return chain
+
+
+def _placeholder_info(el, ph_type: str, idx: int, chain: list, theme_fonts: dict, style_pt: dict) -> dict:
+    """
+    Type, geometry, font and text capacity of one placeholder, resolved through its inheritance chain.
+    """
+    left, top, width, height = _geometry(chain)
+    default_pt = style_pt.get(_master_key(ph_type)) or _DEFAULT_FONT_PT.get(ph_type, _DEFAULT_BODY_FONT_PT)
+    font_pt = _font_size_pt(chain, default_pt)
+    return {
+        "type": ph_type,
+        "idx": idx,
+        "left": left,
+        "top": top,
+        "width": width,
+        "height": height,
+        "font": _typeface(chain, theme_fonts, ph_type),
+        "capacity": _text_capacity(width, height, font_pt),
+    }
+
+
+def _placeholders(spTree, inheritance: _Inheritance, on_layout: bool):
+    """
+    Returns the placeholder infos of a shape tree, and the same keyed by element.
+    """
+    by_element = {
+        el: _placeholder_info(el, ph_type, idx, inheritance.chain(el, ph_type, idx, on_layout), inheritance.theme_fonts, inheritance.style_pt)
+        for el, ph_type, idx in _placeholder_elements(spTree)
+    }
+    return list(by_element.values()), by_element
+
+
+def _kind(placeholder_types: set, has_title: bool, has_body: bool) -> str:
+    if "ctrTitle" in placeholder_types or (has_title and _SUBTITLE_PH_TYPE in placeholder_types and not placeholder_types & _BODY_PH_TYPES):
+        return "title"
+    if has_title and has_body:
+        return "content"
+    return "other"
+
+
+class LayoutIndex:
+    """
+    What each layout and template slide can hold, computed once per template.
+
+    For every layout and template slide it records the placeholder types,
+    geometry and estimated text capacity, the title/body slots, and whether it
+    suits a title or a content slide. Lookup tables map the text a planned
+    slide needs to the template slides that can hold it, so choosing a base
+    slide does not scan the template.
+    """
+
+    def __init__(self, prs: Presentation):
+        self.layouts = []
+        layout_numbers = {}
+        inheritance = {}
+        theme_fonts = {}
+        for i, layout in enumerate(prs.slide_layouts):
+            partname = str(layout.part.partname)
+            layout_numbers[partname] = i
+            master = str(layout.slide_master.part.partname)
+            if master not in theme_fonts:
+                theme_fonts[master] = _theme_fonts(layout.slide_master)
+            inheritance[partname] = _Inheritance(layout, theme_fonts[master])
+            placeholders, _ = _placeholders(layout._element.cSld.spTree, inheritance[partname], on_layout=True)
+            types = {p["type"] for p in placeholders}
+            has_title = bool(types & _TITLE_PH_TYPES)
+            has_body = bool(types & _BODY_PH_TYPES)
+            self.layouts.append({
+                "index": i,
+                "name": layout.name,
+                "partname": partname,
+                "placeholders": placeholders,
+                "has_title": has_title,
+                "has_body": has_body,
+                "kind": _kind(types, has_title, has_body),
+            })
+
+        self.slides = []
+        for i, slide in enumerate(prs.slides):
+            layout_partname = str(slide.slide_layout.part.partname)
+            spTree = slide._element.cSld.spTree
+            placeholders, by_element = _placeholders(spTree, inheritance[layout_partname], on_layout=False)
+            slots = placeholder_slots(spTree)
+            types = {p["type"] for p in placeholders}
+            body = by_element[_shape_elements(spTree)[slots["body"]]] if "body" in slots else None
+            self.slides.append({
+                "index": i,
+                "layout": layout_numbers.get(layout_partname),
+                "placeholders": placeholders,
+                "slots": slots,
+                "body": body,
+                "kind": _kind(types, "title" in slots, bool(types & _BODY_PH_TYPES)),
+            })
+        self._build_lookups()
+
+    def to_dict(self) -> dict:
+        """
+        The layouts and template slides as plain data, e.g. for JSON; see from_dict.
+        """
+        return {"layouts": self.layouts, "slides": self.slides}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LayoutIndex":
+        """
+        Rebuilds an index from to_dict output without the presentation.
+        """
+        index = cls.__new__(cls)
+        index.layouts = data["layouts"]
+        index.slides = data["slides"]
+        index._build_lookups()
+        return index
+
+    def _build_lookups(self):
+        self.title_slides = tuple(s["index"] for s in self.slides if s["kind"] == "title")
+        self.content_slides = tuple(s["index"] for s in self.slides if s["kind"] == "content")
+        self._content_by_demand = self._build_demand_table()
+
+        self.title_layout = next((l["index"] for l in self.layouts if l["kind"] == "title"), None)
+        self.content_layout = next((l["index"] for l in self.layouts if l["kind"] == "content"), None)
+
+    def _build_demand_table(self) -> list:
+        """
+        Entry d lists the content slides able to hold d buckets of text, in
+        template order. Demand beyond the table uses the roomiest slides.
+        """
+        if not self.content_slides:
+            return []
+        capacity = {i: self.slides[i]["body"]["capacity"]["chars"] for i in self.content_slides}
+        largest = max(capacity.values())
+        table = []
+        for bucket in range(largest // _DEMAND_BUCKET_CHARS + 1):
+            demand = bucket * _DEMAND_BUCKET_CHARS
+            table.append(tuple(i for i in self.content_slides if capacity[i] >= demand))
+        table.append(tuple(i for i in self.content_slides if capacity[i] == largest))
+        return table
+
+    def candidates(self, slide_data: dict, position: int) -> tuple:
+        """
+        Template slide indices suited to a planned slide, best first.
+        The first planned slide gets a title slide when the template has one.
+        """
+        if position == 0 and self.title_slides:
+            return self.title_slides
+        if self._content_by_demand:
+            bullets = slide_data.get("bullets") or []
+            demand = sum(len(b) + _BULLET_OVERHEAD_CHARS for b in bullets)
+            bucket = math.ceil(demand / _DEMAND_BUCKET_CHARS)
+            return self._content_by_demand[min(bucket, len(self._content_by_demand) - 1)]
+        return tuple(range(len(self.slides)))
+
+    def layout_for(self, slide_type: str) -> int:
+        """
+        Best layout index for "TITLE_SLIDE" or "CONTENT_SLIDE".
+        """
+        if slide_type == "TITLE_SLIDE":
+            return self.title_layout if self.title_layout is not None else 0
+        if self.content_layout is not None:
+            return self.content_layout
+        # No layout with title and body: the second layout is usually a content layout
+        return 1 if len(self.layouts) > 1 else 0
+
+
+_index_lock = threading.Lock()
+
+
+def get_layout_index(parsed_template) -> LayoutIndex:
+    """
+    Returns the layout index of a ParsedTemplate, building it on first use.
+    """
+    index = getattr(parsed_template, "_layout_index", None)
+    if index is None:
+        with _index_lock:
+            index = getattr(parsed_template, "_layout_index", None)
+            if index is None:
+                index = LayoutIndex(parsed_template.presentation)
+                parsed_template._layout_index = index
+                logger.info(
+                    f"Indexed {len(index.layouts)} layouts and {len(index.slides)} template slides "
+                    f"({len(index.title_slides)} title, {len(index.content_slides)} content)"
+                )
+    return index
+
 
 def map_layout(prs: Presentation, slide_type: str) -> int:
     """
     Selects the best layout index based on slide intent.
-    Scans layouts for specific placeholders.
-    """
-    best_layout_idx = 0
-    
-    # Define what we are looking for
-    # TITLE_SLIDE: Title (1) + optionally Subtitle (4)
-    # CONTENT_SLIDE: Title (1) + Body (2, 14, etc - usually type 2 or 7 for object)
-    
-    # Iterate through all layouts to find the best match
-    for i, layout in enumerate(prs.slide_layouts):
-        has_title = False
-        has_body = False
-        
-        for shape in layout.placeholders:
-            ph_type = shape.placeholder_format.type
-            
-            if ph_type == PP_PLACEHOLDER.TITLE or ph_type == PP_PLACEHOLDER.CENTER_TITLE:
-                has_title = True
-            
-            if ph_type == PP_PLACEHOLDER.BODY or ph_type == PP_PLACEHOLDER.OBJECT:
-                has_body = True
-        
-        if slide_type == "TITLE_SLIDE":
-            # Prefer Title-only or Title+Subtitle. try to avoid Body.
-            if has_title and not has_body:
-                return i
-            # If we find a title layout (often index 0), keep it as candidate
-            if has_title and i == 0:
-                best_layout_idx = i
-
-        elif slide_type == "CONTENT_SLIDE":
-            # Must have Title AND Body
-            if has_title and has_body:
-                return i
-    
-    # Fallback Logic if no perfect match found
-    if slide_type == "CONTENT_SLIDE":
-        # If we didn't find a layout with body, try to find one that at least looks like a content slide (usually index 1)
-        if len(prs.slide_layouts) > 1:
-            return 1
-            
-    return best_layout_idx
+    Builds a LayoutIndex; use get_layout_index for repeated lookups on a parsed template.
+    """
+    return LayoutIndex(prs).layout_for(slide_type)
 
 def find_placeholders(slide_layout):
     """
@@ -58,14 +389,14 @@ def find_placeholders(slide_layout):
     placeholders = {}
     for shape in slide_layout.placeholders:
         ph_type = shape.placeholder_format.type
-        
+
         # PP_PLACEHOLDER.TITLE = 1, CENTER_TITLE = 3
         if ph_type == PP_PLACEHOLDER.TITLE or ph_type == PP_PLACEHOLDER.CENTER_TITLE:
             placeholders['title'] = shape
-        
+
         # PP_PLACEHOLDER.BODY = 2, OBJECT = 7
         # We assign the first body found to 'body'
         if (ph_type == PP_PLACEHOLDER.BODY or ph_type == PP_PLACEHOLDER.OBJECT) and 'body' not in placeholders:
             placeholders['body'] = shape
-            
+
     return placeholders
@@ -0,0 +1,250 @@
+import hashlib
+import io
+import logging
+import math
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+from PIL import Image
+from pptx.opc.constants import CONTENT_TYPE as CT
+from pptx.oxml.ns import qn
+from app import config
+
+logger = logging.getLogger("MediaOptimizer")
+logger.setLevel(logging.INFO)
+
+# Shrinks the template images a generated deck carries. Every image part is
+# downsampled to the largest size it is displayed at in the template (at
+# MEDIA_TARGET_DPI) and re-encoded per MEDIA_POLICY:
+# - "lossless": PNGs stay PNG; only resampling changes them
+# - "lossy": opaque PNGs become JPEGs as well
+# JPEGs are re-encoded at MEDIA_JPEG_QUALITY either way. Results are cached
+# per process by content hash and target parameters, so each asset is
+# processed once however many decks use it.
+
+_EMU_PER_INCH = 914400
+# srcRect offsets are in 1/1000 of a percent
+_CROP_UNITS = 100000
+_CONTENT_TYPES = {CT.PNG, CT.JPEG}
+
+_targets_lock = threading.Lock()
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+# (sha1, width px, height px, policy, quality) -> optimized (blob, content type) or None
+_cache: "OrderedDict[tuple, Optional[tuple]]" = OrderedDict()
+_cache_bytes = 0
+_in_flight: "dict[tuple, Future]" = {}
+_cache_lock = threading.Lock()
+
+
+def _display_extent(blip, slide_size: tuple) -> Optional[tuple]:
+    """
+    Largest (cx, cy) in EMU the image of a blip needs, or None when it must be
+    kept as is (tiled fills). Backgrounds, grouped shapes and anything without
+    its own extent are assumed to cover the slide.
+    """
+    fill = blip.getparent()
+    if fill.find(qn("a:tile")) is not None:
+        return None
+
+    extent = None
+    for ancestor in blip.iterancestors():
+        if ancestor.tag in (qn("p:grpSp"), qn("p:bg")):
+            extent = None
+            break
+        if extent is None and ancestor.tag in (qn("p:pic"), qn("p:sp")):
+            ext = ancestor.find(f"{qn('p:spPr')}/{qn('a:xfrm')}/{qn('a:ext')}")
+            if ext is not None:
+                extent = (int(ext.get("cx")), int(ext.get("cy")))
+    if extent is None:
+        extent = slide_size
+
+    # A cropped image shows only part of its pixels at that extent
+    crop = fill.find(qn("a:srcRect"))
+    if crop is not None:
+        visible_x = 1 - (int(crop.get("l", 0)) + int(crop.get("r", 0))) / _CROP_UNITS
+        visible_y = 1 - (int(crop.get("t", 0)) + int(crop.get("b", 0))) / _CROP_UNITS
+        if visible_x <= 0 or visible_y <= 0:
+            return None
+        extent = (extent[0] / visible_x, extent[1] / visible_y)
+    return extent
+
+
+def _collect_targets(prs) -> dict:
+    """
+    Maps image partname -> {"sha1", "cx", "cy"}: the largest extent it is displayed
+    at anywhere in the template. Images that must not be resampled are left out.
+    """
+    slide_size = (prs.slide_width, prs.slide_height)
+    extents = {}
+    keep = set()
+    for part in prs.part.package.iter_parts():
+        element = getattr(part, "_element", None)
+        if element is None:
+            continue
+        for blip in element.iter(qn("a:blip")):
+            rId = blip.get(qn("r:embed"))
+            if not rId or rId not in part.rels:
+                continue
+            rel = part.rels[rId]
+            if rel.is_external:
+                continue
+            image_part = rel.target_part
+            if image_part.content_type not in _CONTENT_TYPES:
+                continue
+            partname = str(image_part.partname)
+            extent = _display_extent(blip, slide_size)
+            if extent is None:
+                keep.add(partname)
+                continue
+            cx, cy, _ = extents.get(partname, (0, 0, image_part))
+            extents[partname] = (max(cx, extent[0]), max(cy, extent[1]), image_part)
+
+    return {
+        partname: {"sha1": hashlib.sha1(image_part.blob).hexdigest(), "cx": cx, "cy": cy}
+        for partname, (cx, cy, image_part) in extents.items()
+        if partname not in keep
+    }
+
+
+def get_media_targets(parsed_template) -> dict:
+    """
+    Returns the optimization targets of a ParsedTemplate, collecting them on first use.
+    """
+    targets = getattr(parsed_template, "_media_targets", None)
+    if targets is None:
+        with _targets_lock:
+            targets = getattr(parsed_template, "_media_targets", None)
+            if targets is None:
+                targets = _collect_targets(parsed_template.presentation)
+                parsed_template._media_targets = targets
+                logger.info(f"Collected display sizes of {len(targets)} template images")
+    return targets
+
+
+def _has_alpha(img: Image.Image) -> bool:
+    if img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info):
+        alpha = img.convert("RGBA").getchannel("A")
+        return alpha.getextrema()[0] < 255
+    return False
+
+
+def optimize_image(blob: bytes, content_type: str, width_px: int, height_px: int,
+                   policy: str, quality: int) -> Optional[tuple]:
+    """
+    Downsamples an image so it still covers width_px x height_px and re-encodes it.
+    Returns (blob, content type), or None when the result would not be smaller.
+    """
+    img = Image.open(io.BytesIO(blob))
+    scale = max(width_px / img.width, height_px / img.height)
+    convert_to_jpeg = policy == "lossy" and content_type == CT.PNG and not _has_alpha(img)
+    if scale >= 1 and content_type == CT.PNG and not convert_to_jpeg:
+        return None
+
+    if scale < 1:
+        size = (max(1, math.ceil(img.width * scale)), max(1, math.ceil(img.height * scale)))
+        if img.mode not in ("RGB", "RGBA", "L", "LA"):
+            img = img.convert("RGBA" if _has_alpha(img) else "RGB")
+        # Decodes JPEGs at reduced scale first, then resamples with Lanczos
+        img.thumbnail(size, Image.LANCZOS, reducing_gap=3.0)
+
+    output = io.BytesIO()
+    if content_type == CT.JPEG or convert_to_jpeg:
+        if img.mode not in ("RGB", "L", "CMYK"):
+            img = img.convert("RGB")
+        img.save(output, "JPEG", quality=quality, optimize=True)
+        new_type = CT.JPEG
+    else:
+        img.save(output, "PNG", optimize=True)
+        new_type = CT.PNG
+
+    optimized = output.getvalue()
+    if len(optimized) >= len(blob):
+        return None
+    return optimized, new_type
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=config.MEDIA_OPTIMIZER_WORKERS, thread_name_prefix="media")
+        return _pool
+
+
+def _remember(key: tuple, result: Optional[tuple]):
+    global _cache_bytes
+    with _cache_lock:
+        _in_flight.pop(key, None)
+        if key in _cache:
+            return
+        _cache[key] = result
+        _cache_bytes += len(result[0]) if result else 0
+        while _cache_bytes > config.MEDIA_CACHE_MAX_BYTES and _cache:
+            _, evicted = _cache.popitem(last=False)
+            _cache_bytes -= len(evicted[0]) if evicted else 0
+
+
+def _optimize_cached(key: tuple, blob: bytes, content_type: str) -> Optional[tuple]:
+    _, width_px, height_px, policy, quality = key
+    try:
+        result = optimize_image(blob, content_type, width_px, height_px, policy, quality)
+    except Exception as e:
+        logger.warning(f"Could not optimize image {key[0]}: {e}")
+        result = None
+    _remember(key, result)
+    return result
+
+
+def _submit(key: tuple, blob: bytes, content_type: str) -> Future:
+    """
+    Future for an optimization result: cached, already running for another
+    request, or newly started in the pool.
+    """
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            future = Future()
+            future.set_result(_cache[key])
+            return future
+        future = _in_flight.get(key)
+        if future is None:
+            future = _get_pool().submit(_optimize_cached, key, blob, content_type)
+            _in_flight[key] = future
+        return future
+
+
+def optimize_media(prs, targets: dict):
+    """
+    Replaces the template images a presentation still uses with their optimized
+    versions. Call right before saving, once the slides are final.
+    """
+    dpi = config.MEDIA_TARGET_DPI
+    pending = []
+    for part in prs.part.package.iter_parts():
+        target = targets.get(str(part.partname))
+        if target is None:
+            continue
+        width_px = max(1, math.ceil(target["cx"] * dpi / _EMU_PER_INCH))
+        height_px = max(1, math.ceil(target["cy"] * dpi / _EMU_PER_INCH))
+        key = (target["sha1"], width_px, height_px, config.MEDIA_POLICY, config.MEDIA_JPEG_QUALITY)
+        pending.append((part, _submit(key, part.blob, part.content_type)))
+
+    saved = 0
+    for part, future in pending:
+        result = future.result()
+        if result is None:
+            continue
+        blob, content_type = result
+        saved += len(part.blob) - len(blob)
+        if content_type != part.content_type:
+            # The extension must match the new content type
+            part.partname = prs.part.package.next_image_partname("jpg")
+            part._content_type = content_type
+            # python-pptx caches the content type on first access
+            part.__dict__.pop("content_type", None)
+        part.blob = blob
+    if saved:
+        logger.info(f"Optimized template images: {saved} bytes smaller")
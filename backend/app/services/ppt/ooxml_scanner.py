@@ -0,0 +1,277 @@
+import io
+import logging
+import mmap
+import posixpath
+import zipfile
+from xml.etree import ElementTree
+from PIL import Image
+
+logger = logging.getLogger("OOXMLScanner")
+logger.setLevel(logging.INFO)
+
+# Reads what template analysis needs straight from the PPTX ZIP container,
+# without building a python-pptx Presentation: slide size, masters and their
+# layouts (names and placeholder types), theme colors and fonts, and media
+# dimensions. Only presentation.xml, the masters, their layouts, the theme and
+# the media headers are read, with a streaming XML parser; slide content is
+# never touched, so the cost grows with the number of layouts, not with what
+# the slides contain.
+
+_P = "{http://schemas.openxmlformats.org/presentationml/2006/main}"
+_A = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+_R = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}Relationship"
+
+_RT_THEME = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/theme"
+
+_PRESENTATION = "ppt/presentation.xml"
+# Theme color slots in clrScheme order
+_SCHEME_COLORS = ("dk1", "lt1", "dk2", "lt2", "accent1", "accent2", "accent3",
+                  "accent4", "accent5", "accent6", "hlink", "folHlink")
+_IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".bmp", ".tif", ".tiff"}
+_READ_CHUNK = 16384
+
+
+def _iterparse(stream, events=("end",)):
+    """
+    Streams (event, element) pairs from a ZIP member.
+    Unlike ElementTree.iterparse, stopping early frees the parser at once
+    instead of leaving a reference cycle for the garbage collector.
+    """
+    parser = ElementTree.XMLPullParser(events)
+    while True:
+        chunk = stream.read(_READ_CHUNK)
+        if not chunk:
+            break
+        parser.feed(chunk)
+        yield from parser.read_events()
+    parser.close()
+    yield from parser.read_events()
+
+
+class _MappedFile(io.RawIOBase):
+    """
+    Seekable read-only file over a memory map, which zipfile needs (mmap has no seekable()).
+    """
+
+    def __init__(self, mapped: mmap.mmap):
+        self._map = mapped
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        self._map.seek(offset, whence)
+        return self._map.tell()
+
+    def tell(self) -> int:
+        return self._map.tell()
+
+    def __deepcopy__(self, memo):
+        # python-pptx keeps the file it was opened from; copies of a parsed
+        # template share this read-only view instead of failing on the mmap
+        return self
+
+    def read(self, size: int = -1) -> bytes:
+        return self._map.read(None if size is None or size < 0 else size)
+
+    def readinto(self, buffer) -> int:
+        data = self._map.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def package_stream(source):
+    """
+    A file object over PPTX bytes or a memory map of a PPTX file, without
+    copying the mapped file into memory.
+    """
+    if isinstance(source, mmap.mmap):
+        return _MappedFile(source)
+    return io.BytesIO(source)
+
+
+def _rels(zf: zipfile.ZipFile, member: str) -> dict:
+    """
+    Maps rId -> (target member name, relationship type) for one part.
+    """
+    directory, filename = posixpath.split(member)
+    rels_member = posixpath.join(directory, "_rels", filename + ".rels")
+    rels = {}
+    try:
+        stream = zf.open(rels_member)
+    except KeyError:
+        return rels
+    with stream:
+        for _, el in _iterparse(stream):
+            if el.tag == _REL and el.get("TargetMode") != "External":
+                target = el.get("Target", "")
+                if target.startswith("/"):
+                    target = target[1:]
+                else:
+                    target = posixpath.normpath(posixpath.join(directory, target))
+                rels[el.get("Id")] = (target, el.get("Type"))
+    return rels
+
+
+def _scan_presentation(zf: zipfile.ZipFile) -> tuple:
+    """
+    Returns (master rIds in order, (slide width, slide height) in EMU).
+    """
+    master_ids = []
+    slide_size = None
+    with zf.open(_PRESENTATION) as stream:
+        for _, el in _iterparse(stream):
+            if el.tag == _P + "sldMasterId":
+                master_ids.append(el.get(_R + "id"))
+            elif el.tag == _P + "sldSz":
+                slide_size = (int(el.get("cx")), int(el.get("cy")))
+                break
+    return master_ids, slide_size
+
+
+def _scan_master(zf: zipfile.ZipFile, member: str) -> list:
+    """
+    Layout rIds of a master, in order.
+    """
+    layout_ids = []
+    with zf.open(member) as stream:
+        for _, el in _iterparse(stream):
+            if el.tag == _P + "sldLayoutId":
+                layout_ids.append(el.get(_R + "id"))
+            elif el.tag == _P + "sldLayoutIdLst":
+                break
+            elif el.tag in (_P + "sp", _P + "pic", _P + "grpSp", _P + "graphicFrame", _P + "cxnSp"):
+                # Shapes are not needed; drop them as they are parsed
+                el.clear()
+    return layout_ids
+
+
+def _scan_layout(zf: zipfile.ZipFile, member: str) -> dict:
+    """
+    Name and placeholder types (p:ph/@type, "obj" when absent) of a layout,
+    in the order of its top-level shapes.
+    """
+    layout = {"name": "", "partname": "/" + member, "placeholders": []}
+    # Tags of the open elements: sldLayout/cSld/spTree/<shape>/<nvXxPr>/nvPr/ph
+    stack = []
+    with zf.open(member) as stream:
+        for event, el in _iterparse(stream, ("start", "end")):
+            if event == "start":
+                stack.append(el.tag)
+                if el.tag == _P + "cSld":
+                    layout["name"] = el.get("name", "")
+                continue
+            stack.pop()
+            if el.tag == _P + "ph" and len(stack) == 6 and stack[2] == _P + "spTree":
+                layout["placeholders"].append(el.get("type", "obj"))
+            elif len(stack) == 3:
+                el.clear()
+            elif el.tag == _P + "cSld":
+                break
+    return layout
+
+
+def _color_value(el) -> str:
+    for child in el:
+        if child.tag == _A + "srgbClr":
+            return "#" + child.get("val", "").lower()
+        if child.tag == _A + "sysClr":
+            return "#" + child.get("lastClr", "").lower()
+    return None
+
+
+def _scan_theme(zf: zipfile.ZipFile, member: str) -> dict:
+    """
+    Scheme colors (clrScheme) and fonts (fontScheme) of a theme.
+    Stops before the format scheme, which can be large.
+    """
+    colors = {}
+    fonts = {}
+    with zf.open(member) as stream:
+        for _, el in _iterparse(stream):
+            name = el.tag[len(_A):] if el.tag.startswith(_A) else None
+            if name in _SCHEME_COLORS:
+                value = _color_value(el)
+                if value:
+                    colors[name] = value
+            elif name in ("majorFont", "minorFont"):
+                latin = el.find(_A + "latin")
+                key = "major" if name == "majorFont" else "minor"
+                if latin is not None and latin.get("typeface"):
+                    fonts[key] = latin.get("typeface")
+            elif name == "fontScheme":
+                fonts["scheme"] = el.get("name", "")
+                break
+    return {"colors": colors, "fonts": fonts}
+
+
+def _scan_media(zf: zipfile.ZipFile) -> dict:
+    """
+    Maps image partname -> format, size and pixel dimensions (read from the image header).
+    """
+    media = {}
+    for info in zf.infolist():
+        name = info.filename
+        extension = posixpath.splitext(name)[1].lower()
+        if not name.startswith("ppt/media/") or extension not in _IMAGE_EXTENSIONS:
+            continue
+        width = height = None
+        try:
+            with zf.open(info) as stream, Image.open(stream) as img:
+                width, height = img.size
+        except Exception:
+            pass
+        media["/" + name] = {
+            "format": extension[1:],
+            "size": info.file_size,
+            "width": width,
+            "height": height,
+        }
+    return media
+
+
+def scan_template(source) -> dict:
+    """
+    Scans a PPTX (bytes, memory map, path or binary file object).
+
+    Returns {"slide_size", "masters", "layouts", "theme", "media"}. `layouts`
+    are those of the first master, in the order python-pptx lists
+    `slide_layouts`. Raises ValueError if the file is not a readable PPTX.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+        source = package_stream(source)
+    try:
+        with zipfile.ZipFile(source) as zf:
+            master_ids, slide_size = _scan_presentation(zf)
+            presentation_rels = _rels(zf, _PRESENTATION)
+
+            masters = []
+            layouts = []
+            theme = {"colors": {}, "fonts": {}}
+            for number, master_id in enumerate(master_ids):
+                master_member = presentation_rels[master_id][0]
+                master_rels = _rels(zf, master_member)
+                layout_members = [master_rels[rid][0] for rid in _scan_master(zf, master_member) if rid in master_rels]
+                masters.append({"partname": "/" + master_member, "layouts": ["/" + m for m in layout_members]})
+                if number == 0:
+                    layouts = [_scan_layout(zf, member) for member in layout_members]
+                    for target, reltype in master_rels.values():
+                        if reltype == _RT_THEME:
+                            theme = _scan_theme(zf, target)
+                            break
+
+            for index, layout in enumerate(layouts):
+                layout["index"] = index
+            return {
+                "slide_size": slide_size,
+                "masters": masters,
+                "layouts": layouts,
+                "theme": theme,
+                "media": _scan_media(zf),
+            }
+    except (zipfile.BadZipFile, KeyError, ElementTree.ParseError) as e:
+        raise ValueError(f"Invalid PPTX package: {e}")
@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import os
+import queue
+import tempfile
+import threading
+from typing import AsyncIterator
+
+logger = logging.getLogger("OutputWriter")
+
+CHUNK_SIZE = 64 * 1024
+
+_END = object()
+
+
+class PipeWriter:
+    """
+    Write-only, non-seekable file object that hands written bytes to a reader.
+
+    python-pptx saves through zipfile, which falls back to data descriptors on
+    non-seekable outputs, so the ZIP container can be produced incrementally.
+    Writes are grouped into CHUNK_SIZE blocks; the queue is bounded, so a slow
+    client pauses the writer instead of letting output pile up in memory.
+    """
+
+    def __init__(self, max_chunks: int = 16):
+        self._queue = queue.Queue(maxsize=max_chunks)
+        self._pending = bytearray()
+        self._closed = False
+        self._aborted = False
+        self.bytes_written = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        if self._aborted:
+            raise OSError("Output stream was closed by the reader")
+        self._pending += data
+        self.bytes_written += len(data)
+        if len(self._pending) >= CHUNK_SIZE:
+            self._queue.put(bytes(self._pending))
+            self._pending.clear()
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self, error: BaseException = None):
+        if self._closed:
+            return
+        self._closed = True
+        if self._pending and error is None:
+            self._queue.put(bytes(self._pending))
+        self._pending.clear()
+        self._queue.put(error if error is not None else _END)
+
+    def abort(self):
+        """
+        Called by the reader when it stops consuming (e.g. client disconnected).
+        Unblocks a waiting writer and makes further writes fail.
+        """
+        self._aborted = True
+        try:
+            while True:
+                self._queue.get_nowait()
+        except queue.Empty:
+            pass
+
+    def read_chunk(self):
+        """
+        Blocks until the next chunk is available. Returns None at the end,
+        or raises the error the writer was closed with.
+        """
+        item = self._queue.get()
+        if item is _END:
+            return None
+        if isinstance(item, BaseException):
+            raise item
+        return item
+
+
+async def stream_save(save) -> AsyncIterator[bytes]:
+    """
+    Runs `save(fileobj)` in a thread and yields the output as it is written.
+    """
+    pipe = PipeWriter()
+
+    def run():
+        try:
+            save(pipe)
+        except BaseException as e:
+            logger.error(f"Streaming save failed: {e}")
+            pipe.close(e)
+        else:
+            pipe.close()
+
+    threading.Thread(target=run, name="pptx-stream-save", daemon=True).start()
+    try:
+        while True:
+            chunk = await asyncio.to_thread(pipe.read_chunk)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        pipe.abort()
+
+
+async def spool_save(save, threshold: int) -> AsyncIterator[bytes]:
+    """
+    Runs `save(fileobj)` into a spooled temp file (in memory below `threshold`
+    bytes, on disk above it) and yields the file in chunks.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=threshold)
+    try:
+        await asyncio.to_thread(save, spool)
+        spool.seek(0)
+        async for chunk in iter_fileobj(spool):
+            yield chunk
+    finally:
+        spool.close()
+
+
+async def iter_fileobj(fileobj) -> AsyncIterator[bytes]:
+    """
+    Yields an open file from its current position in chunks, then closes it.
+    """
+    try:
+        while True:
+            chunk = await asyncio.to_thread(fileobj.read, CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        fileobj.close()
+
+
+async def iter_file(path: str, delete: bool = False) -> AsyncIterator[bytes]:
+    """
+    Yields a file in chunks, optionally deleting it afterwards.
+    """
+    try:
+        with open(path, "rb") as f:
+            while True:
+                chunk = await asyncio.to_thread(f.read, CHUNK_SIZE)
+                if not chunk:
+                    return
+                yield chunk
+    finally:
+        if delete:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+async def iter_bytes(data: bytes) -> AsyncIterator[bytes]:
+    """
+    Yields an in-memory buffer in chunks without copying it.
+    """
+    view = memoryview(data)
+    for start in range(0, len(view), CHUNK_SIZE):
+        yield view[start:start + CHUNK_SIZE]
+
+
+async def primed(body: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Pulls the first chunk up front so that failures before any output is
+    produced surface to the caller (and can become an error response), then
+    returns an iterator over the whole body.
+    """
+    try:
+        first = await body.__anext__()
+    except StopAsyncIteration:
+        first = b""
+
+    async def chain():
+        if first:
+            yield first
+        async for chunk in body:
+            yield chunk
+
+    return chain()
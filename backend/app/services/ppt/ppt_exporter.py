@@ -1,71 +1,200 @@
-from pptx import Presentation
 import io
 import logging
-from .slide_cloner import clone_slide
+from app import config
+from app.services import metrics
+from .slide_cloner import clone_slide, get_slide_stamps, index_parts
+from .layout_mapper import get_layout_index
+from .text_fitter import fit_bullets
 from .slide_builder import update_slide_content
+from .image_registry import ImageRegistry
+from .image_extractor import ImageMemoryBudget
+from .media_optimizer import get_media_targets, optimize_media
+from .template_loader import load_template
 
 logger = logging.getLogger("PPTExporter")
 logger.setLevel(logging.INFO)
 
-def generate_presentation(template_content: bytes, slide_plan: dict, template_metadata: dict = None) -> io.BytesIO:
+
+class PresentationBuilder:
     """
-    Generates a PPTX file by cloning slides from the template.
-    Strictly follows slide plan count and reuses template images.
-    
-    Args:
-        template_content: Binary content of the template PPTX
-        slide_plan: Dictionary containing slides and metadata
-        template_metadata: Optional metadata including images, colors, fonts
+    Builds a presentation one planned slide at a time.
+    Lets slides be cloned and filled while later slides are still being planned.
+    Not thread-safe: add_slide and finish must be called sequentially.
     """
+
+    def __init__(self, template, template_metadata: dict = None):
+        try:
+            parsed = load_template(template)
+            # Work on a copy so the shared parsed template is never modified
+            self.prs = parsed.copy_presentation()
+        except Exception as e:
+            logger.error(f"Failed to load template: {e}")
+            raise ValueError("Invalid template file")
+
+        # Capture original templates
+        self.template_slides = list(self.prs.slides)
+        if not self.template_slides:
+            raise ValueError("Template has no slides to clone from")
+
+        # Template slides compiled once per parsed template, resolved against this copy
+        self.stamps = get_slide_stamps(parsed)
+        self.parts_by_name = index_parts(self.prs)
+        self.layout_index = get_layout_index(parsed)
+
+        # Extract template images if available
+        self.template_images = None
+        if template_metadata and template_metadata.get("images"):
+            self.template_images = template_metadata["images"]
+            logger.info(f"Using {self.template_images.get('total', 0)} images from template")
+        self.image_registry = ImageRegistry(self.prs, ImageMemoryBudget(config.IMAGE_MEMORY_BUDGET_BYTES))
+        # Displayed sizes of the template images, collected once per parsed template
+        self.media_targets = get_media_targets(parsed) if config.MEDIA_OPTIMIZATION_ENABLED else None
+
+        self.slide_count = 0
+        # Rotates through suitable template slides so decks keep the template's variety
+        self._picks = 0
+        self._template_slides_removed = False
+
+    def add_slide(self, slide_data: dict):
+        """
+        Clones the next template slide and fills it with one planned slide.
+        Bullets that do not fit the body go to continuation slides.
+        """
+        title = slide_data.get("title", "")
+        while slide_data is not None:
+            logger.debug(f"Creating slide {self.slide_count + 1}")
+
+            base_index = self._pick_base_slide(slide_data)
+            slide_data, body_font_pt, remainder = self._fit(slide_data, base_index)
+
+            # Clone (Must return a NEW object)
+            with metrics.timed("clone"):
+                new_slide, placeholders = clone_slide(
+                    self.prs, self.template_slides[base_index], self.stamps[base_index], self.parts_by_name
+                )
+
+            # Update with content and images
+            with metrics.timed("fill"):
+                update_slide_content(
+                    new_slide, slide_data, self.template_images, self.image_registry, placeholders, body_font_pt
+                )
+            self.slide_count += 1
+
+            slide_data = {"title": f"{title} (cont.)", "bullets": remainder} if remainder else None
+
+    def _fit(self, slide_data: dict, base_index: int):
+        """
+        Returns (slide_data, body_font_pt, remainder): the bullets that fit the
+        base slide's body, the font size when it had to shrink (else None), and
+        the bullets left for a continuation slide.
+        """
+        body = self.layout_index.slides[base_index]["body"]
+        bullets = slide_data.get("bullets") or []
+        if not config.AUTOFIT_ENABLED or body is None or not bullets:
+            return slide_data, None, None
+        if not body.get("width") or not body.get("height"):
+            # Geometry could not be resolved: keep the bullets as planned
+            return slide_data, None, None
+
+        with metrics.timed("autofit"):
+            count, font_pt = fit_bullets(bullets, body)
+        body_font_pt = font_pt if font_pt < body["capacity"]["font_pt"] else None
+        if count < len(bullets):
+            logger.info(f"Slide '{slide_data.get('title', '')}' overflows, moving {len(bullets) - count} bullets to a continuation slide")
+            return {**slide_data, "bullets": bullets[:count]}, body_font_pt, bullets[count:]
+        return slide_data, body_font_pt, None
+
+    def _pick_base_slide(self, slide_data: dict) -> int:
+        """
+        Template slide to clone for a planned slide: the title slide first, then
+        content slides whose body fits the bullets, taken in turn.
+        """
+        candidates = self.layout_index.candidates(slide_data, self.slide_count)
+        if self.slide_count == 0 and self.layout_index.title_slides:
+            return candidates[0]
+        base_index = candidates[self._picks % len(candidates)]
+        self._picks += 1
+        return base_index
+
+    def save(self, fileobj):
+        """
+        Removes the original template slides and writes the presentation to `fileobj`.
+        `fileobj` may be non-seekable; the ZIP container is then written incrementally.
+        """
+        if not self.slide_count:
+            raise ValueError("Empty slide plan")
+
+        # Cleanup: Remove the original template slides
+        # Iterate backwards through the original count and remove element
+        prs = self.prs
+        if not self._template_slides_removed:
+            for i in range(len(self.template_slides) - 1, -1, -1):
+                rId = prs.slides._sldIdLst[i].rId
+                prs.part.drop_rel(rId)
+                del prs.slides._sldIdLst[i]
+            self._template_slides_removed = True
+
+        if self.media_targets:
+            with metrics.timed("media_optimize"):
+                optimize_media(prs, self.media_targets)
+
+        # Export
+        with metrics.timed("save"):
+            prs.save(fileobj)
+
+        size = _output_size(fileobj)
+        if size is not None:
+            metrics.DECK_SIZE.observe(size)
+
+        logger.info(f"Generated presentation with {self.slide_count} slides")
+
+    def finish(self) -> io.BytesIO:
+        """
+        Saves the presentation into an in-memory buffer.
+        """
+        output = io.BytesIO()
+        self.save(output)
+        output.seek(0)
+        return output
+
+
+def _output_size(fileobj):
+    """
+    Bytes written by a save, when the file object can tell.
+    """
+    if hasattr(fileobj, "bytes_written"):
+        return fileobj.bytes_written
     try:
-        prs = Presentation(io.BytesIO(template_content))
-    except Exception as e:
-        logger.error(f"Failed to load template: {e}")
-        raise ValueError("Invalid template file")
+        return fileobj.tell()
+    except (AttributeError, OSError):
+        return None
+
+
+def build_presentation(template, slide_plan: dict, template_metadata: dict = None) -> PresentationBuilder:
+    """
+    Clones and fills every planned slide; the returned builder is ready to save.
+    """
+    builder = PresentationBuilder(template, template_metadata)
 
     slides_data = slide_plan.get("slides", [])
     if not slides_data:
         raise ValueError("Empty slide plan")
 
-    # Capture original templates
-    template_slides = list(prs.slides)
-    if not template_slides:
-        raise ValueError("Template has no slides to clone from")
-
-    num_template_slides = len(template_slides)
-    
-    # Extract template images if available
-    template_images = None
-    if template_metadata and template_metadata.get("images"):
-        template_images = template_metadata["images"]
-        logger.info(f"Using {template_images.get('total', 0)} images from template")
-    
-    # 3. Generate New Slides
     # Loop ONLY over slide_plan["slides"]
-    for i, slide_data in enumerate(slides_data):
-        logger.debug(f"Creating slide {i+1}/{len(slides_data)}")
-        
-        # Strict modulo mapping
-        base_slide = template_slides[i % num_template_slides]
-        
-        # Clone (Must return a NEW object)
-        new_slide = clone_slide(prs, base_slide)
-        
-        # Update with content and images
-        update_slide_content(new_slide, slide_data, template_images)
-
-    # 4. Cleanup: Remove the original template slides
-    # Iterate backwards through the original count and remove element
-    for i in range(num_template_slides - 1, -1, -1):
-        rId = prs.slides._sldIdLst[i].rId
-        prs.part.drop_rel(rId)
-        del prs.slides._sldIdLst[i]
-
-    # 5. Export
-    output = io.BytesIO()
-    prs.save(output)
-    output.seek(0)
-    
-    logger.info(f"Generated presentation with {len(slides_data)} slides")
+    for slide_data in slides_data:
+        builder.add_slide(slide_data)
+
+    return builder
+
+
+def generate_presentation(template, slide_plan: dict, template_metadata: dict = None) -> io.BytesIO:
+    """
+    Generates a PPTX file by cloning slides from the template.
+    Strictly follows slide plan count and reuses template images.
     
-    return output
+    Args:
+        template: ParsedTemplate (or binary content of the template PPTX)
+        slide_plan: Dictionary containing slides and metadata
+        template_metadata: Optional metadata including images, colors, fonts
+    """
+    return build_presentation(template, slide_plan, template_metadata).finish()
@@ -1,11 +1,12 @@
 import logging
 from pptx.enum.shapes import PP_PLACEHOLDER, MSO_SHAPE_TYPE
-from pptx.util import Inches
+from pptx.util import Inches, Pt
 import io
+from .image_extractor import load_image_blob
 
 logger = logging.getLogger("SlideBuilder")
 
-def update_slide_content(slide, slide_data: dict, template_images: dict = None):
+def update_slide_content(slide, slide_data: dict, template_images: dict = None, image_registry=None, placeholders: dict = None, body_font_pt: float = None, image_budget=None):
     """
     Updates the text content of a slide's placeholders and adds images from template.
     
@@ -13,14 +14,22 @@ def update_slide_content(slide, slide_data: dict, template_images: dict = None):
         slide: The slide object to update
         slide_data: Dictionary containing title, bullets, and notes
         template_images: Dictionary containing categorized images from template
+        image_registry: Optional ImageRegistry that embeds each image only once per deck
+        placeholders: Optional {"title": shape, "body": shape} already located by the slide stamp
+        body_font_pt: Optional font size for the bullets, set when autofit shrank the text
+        image_budget: Optional ImageMemoryBudget for images added without a registry
     """
     
     # 1. Identify Placeholders
     title_ph = None
     body_ph = None
     
-    # Scan shapes to find placeholders (even if cloned)
-    for shape in slide.shapes:
+    if placeholders is not None:
+        title_ph = placeholders.get("title")
+        body_ph = placeholders.get("body")
+    
+    # Otherwise scan shapes to find placeholders (even if cloned)
+    for shape in (slide.shapes if placeholders is None else []):
         if not shape.is_placeholder:
             continue
             
@@ -53,10 +62,14 @@ def update_slide_content(slide, slide_data: dict, template_images: dict = None):
             text_frame.clear() 
             
             bullets = slide_data.get("bullets", [])
-            for bullet_text in bullets:
-                p = text_frame.add_paragraph()
+            for i, bullet_text in enumerate(bullets):
+                # clear() leaves one empty paragraph; the first bullet goes there
+                p = text_frame.paragraphs[0] if i == 0 else text_frame.add_paragraph()
                 p.text = bullet_text
                 p.level = 0
+                if body_font_pt:
+                    for run in p.runs:
+                        run.font.size = Pt(body_font_pt)
         except Exception as e:
             logger.warning(f"Failed to update body: {e}")
             
@@ -75,12 +88,12 @@ def update_slide_content(slide, slide_data: dict, template_images: dict = None):
     # 5. Add Images from Template (if available)
     if template_images and template_images.get("categorized"):
         try:
-            add_template_images_to_slide(slide, template_images)
+            add_template_images_to_slide(slide, template_images, image_registry, image_budget)
         except Exception as e:
             logger.warning(f"Failed to add template images: {e}")
 
 
-def add_template_images_to_slide(slide, template_images: dict):
+def add_template_images_to_slide(slide, template_images: dict, image_registry=None, image_budget=None):
     """
     Adds images from the template to the slide.
     Prioritizes logos and reuses them in consistent positions.
@@ -91,7 +104,7 @@ def add_template_images_to_slide(slide, template_images: dict):
     logos = categorized.get("logos", [])
     for logo in logos[:2]:  # Limit to 2 logos to avoid clutter
         try:
-            add_image_to_slide(slide, logo)
+            add_image_to_slide(slide, logo, image_registry, image_budget)
             logger.debug(f"Added logo to slide")
         except Exception as e:
             logger.debug(f"Could not add logo: {e}")
@@ -101,18 +114,25 @@ def add_template_images_to_slide(slide, template_images: dict):
     backgrounds = categorized.get("backgrounds", [])
     if backgrounds and len(logos) == 0:  # Only if no logos were added
         try:
-            add_image_to_slide(slide, backgrounds[0])
+            add_image_to_slide(slide, backgrounds[0], image_registry, image_budget)
             logger.debug(f"Added background image to slide")
         except Exception as e:
             logger.debug(f"Could not add background: {e}")
 
 
-def add_image_to_slide(slide, image_data: dict):
+def add_image_to_slide(slide, image_data: dict, image_registry=None, budget=None):
     """
     Adds a single image to a slide at its original position.
+    With an image registry, the image part is shared instead of re-embedded
+    (and charged against the registry's budget); otherwise the loaded bytes
+    are charged against `budget`, if given.
     """
     try:
-        blob = image_data.get("blob")
+        if image_registry is not None:
+            image_registry.add_to_slide(slide, image_data)
+            return
+
+        blob = load_image_blob(image_data, budget)
         position = image_data.get("position", {})
         
         if not blob:
@@ -1,35 +1,163 @@
-from pptx import Presentation
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.oxml.ns import qn
+from pptx.shapes.shapetree import SlideShapeFactory
 import copy
 import logging
+import threading
+from .layout_mapper import placeholder_slots
 
 logger = logging.getLogger("SlideCloner")
 
-def clone_slide(pres, source_slide):
+_R_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+
+# Relationships that are not carried over to a cloned slide: the layout is set
+# when the slide is created, notes and comments belong to the source slide only,
+# and links to other (template) slides would keep removed slides alive.
+_SKIPPED_RELTYPES = {RT.SLIDE_LAYOUT, RT.NOTES_SLIDE, RT.COMMENTS, RT.SLIDE}
+
+# Elements that are dropped from a cloned slide when their link target was not
+# carried over; any other r:* attribute without a target is removed on its own.
+_LINK_TAGS = {qn("a:hlinkClick"), qn("a:hlinkHover"), qn("a:hlinkMouseOver")}
+
+
+class SlideStamp:
+    """
+    A template slide compiled once into a reusable "stamp".
+
+    Holds a detached copy of the slide's shape tree, its relationships keyed by
+    target partname (or external URL), the positions of attributes that carry
+    rIds, and the title/body placeholder slots. Instantiating it only copies the
+    tree, re-creates the relationships on the new slide and rewrites the rIds,
+    so the cost per slide does not depend on re-scanning the template slide.
+    """
+
+    def __init__(self, source_slide):
+        slide_part = source_slide.part
+        self.layout_partname = str(source_slide.slide_layout.part.partname)
+        self.cSld = copy.deepcopy(source_slide._element.cSld)
+
+        # (rId, reltype, target partname or URL, is_external)
+        self.rels = []
+        for rel in slide_part.rels.values():
+            if rel.reltype in _SKIPPED_RELTYPES:
+                continue
+            if rel.is_external:
+                self.rels.append((rel.rId, rel.reltype, rel.target_ref, True))
+            else:
+                self.rels.append((rel.rId, rel.reltype, str(rel.target_part.partname), False))
+
+        # (element index in document order, attribute name) for every r:* attribute
+        self.rid_attrs = [
+            (i, attr)
+            for i, el in enumerate(self.cSld.iter())
+            for attr in el.attrib
+            if attr.startswith(_R_NS)
+        ]
+
+        self.placeholder_slots = placeholder_slots(self.cSld.spTree)
+
+    def instantiate(self, pres, parts_by_name: dict):
+        """
+        Appends a new slide built from this stamp to `pres`.
+        Returns (slide, placeholders) where placeholders maps "title"/"body" to shapes.
+        """
+        layout = parts_by_name[self.layout_partname].slide_layout
+        rId, new_slide = pres.part.add_slide(layout)
+        sldId = pres.slides._sldIdLst.add_sldId(rId)
+        try:
+            placeholders = self._fill(new_slide, parts_by_name)
+        except Exception:
+            # Never leave a half-built slide in the deck
+            pres.slides._sldIdLst.remove(sldId)
+            pres.part.drop_rel(rId)
+            raise
+        return new_slide, placeholders
+
+    def _fill(self, new_slide, parts_by_name: dict) -> dict:
+        # Recreate relationships on the new slide and map old rIds to new ones
+        rid_map = {}
+        for old_rId, reltype, target, is_external in self.rels:
+            if is_external:
+                rid_map[old_rId] = new_slide.part.relate_to(target, reltype, is_external=True)
+            elif target in parts_by_name:
+                rid_map[old_rId] = new_slide.part.relate_to(parts_by_name[target], reltype)
+
+        cSld = copy.deepcopy(self.cSld)
+        if self.rid_attrs:
+            elements = list(cSld.iter())
+            for i, attr in self.rid_attrs:
+                el = elements[i]
+                old_rId = el.get(attr)
+                if not old_rId:
+                    # An empty r:id (e.g. a "next slide" action) refers to nothing
+                    continue
+                new_rId = rid_map.get(old_rId)
+                if new_rId:
+                    el.set(attr, new_rId)
+                elif el.tag in _LINK_TAGS:
+                    # The link target (another slide, a missing part) was not
+                    # carried over: drop the link rather than keep an rId that
+                    # may now name a different relationship
+                    parent = el.getparent()
+                    if parent is not None:
+                        parent.remove(el)
+                else:
+                    del el.attrib[attr]
+
+        slide_el = new_slide._element
+        slide_el.replace(slide_el.cSld, cSld)
+
+        # Wrap only the slotted shapes instead of building a proxy for every shape
+        shape_elms = [el for el in cSld.spTree.iterchildren() if el.tag not in (qn("p:nvGrpSpPr"), qn("p:grpSpPr"))]
+        placeholders = {
+            name: SlideShapeFactory(shape_elms[idx], new_slide.shapes)
+            for name, idx in self.placeholder_slots.items()
+        }
+        return placeholders
+
+
+_stamps_lock = threading.Lock()
+
+
+def get_slide_stamps(parsed_template) -> list:
+    """
+    Returns the stamps of every slide of a ParsedTemplate, compiling them on first use.
+    Stamps only refer to parts by name, so they are shared by every export of the template.
+    """
+    stamps = getattr(parsed_template, "_slide_stamps", None)
+    if stamps is None:
+        with _stamps_lock:
+            stamps = getattr(parsed_template, "_slide_stamps", None)
+            if stamps is None:
+                stamps = [SlideStamp(slide) for slide in parsed_template.presentation.slides]
+                parsed_template._slide_stamps = stamps
+                logger.info(f"Compiled {len(stamps)} slide stamps")
+    return stamps
+
+
+def index_parts(pres) -> dict:
+    """
+    Maps partname -> part for a presentation, used to resolve stamp relationships.
+    """
+    return {str(part.partname): part for part in pres.part.package.iter_parts()}
+
+
+def clone_slide(pres, source_slide, stamp: SlideStamp = None, parts_by_name: dict = None):
     """
-    Duplicate a slide in a presentation by deep-copying its XML.
+    Duplicate a slide in a presentation from its compiled stamp.
     Adds the new slide to the end of the presentation.
+    Returns (slide, placeholders) as produced by SlideStamp.instantiate, or
+    (slide, None) for the fallback slide so its placeholders are found by scanning.
     """
     try:
-        # 1. Create a new slide based on the same layout
-        # This gives us a container linked to the correct layout
-        new_slide = pres.slides.add_slide(source_slide.slide_layout)
-        
-        # 2. Clear default shapes
-        # We assume the source slide has the 'true' state of the placeholders/shapes we want.
-        # We must clear the default ones created by add_slide so we don't get duplicates.
-        for shape in list(new_slide.shapes):
-             sp = shape.element
-             sp.getparent().remove(sp)
-             
-        # 3. Copy shapes from source to new
-        # Append deeper copies of source shapes to the new slide
-        for shape in source_slide.shapes:
-            new_el = copy.deepcopy(shape.element)
-            new_slide.shapes._spTree.append(new_el)
-            
-        return new_slide
+        if stamp is None:
+            stamp = SlideStamp(source_slide)
+        if parts_by_name is None:
+            parts_by_name = index_parts(pres)
+        return stamp.instantiate(pres, parts_by_name)
 
     except Exception as e:
         logger.error(f"Slide cloning failed: {e}")
-        # Fail safe: return a fresh slide (may lose content but prevents crash)
-        return pres.slides.add_slide(source_slide.slide_layout)
+        # Fail safe: return a fresh slide (may lose content but prevents crash);
+        # the partially built clone has already been removed
+        return pres.slides.add_slide(source_slide.slide_layout), None
@@ -0,0 +1,86 @@
+from pptx import Presentation
+from app.services.ppt.ooxml_scanner import package_stream, scan_template
+import copy
+import io
+import logging
+
+logger = logging.getLogger("TemplateLoader")
+logger.setLevel(logging.INFO)
+
+
+class ParsedTemplate:
+    """
+    A template PPTX parsed once and shared by analysis, image cataloguing and export.
+
+    The freshly parsed package is kept untouched as a snapshot. Readers get their own
+    copy through `presentation`, and every export gets another one through
+    `copy_presentation()`, so no stage can alter what the next one sees.
+
+    The package bytes are kept until `package_scan` has read them, so analysis
+    can work on the ZIP members it needs instead of the parsed slides.
+    """
+
+    def __init__(self, presentation: Presentation, source: bytes = None):
+        # Never accessed directly: python-pptx caches proxy objects holding XML
+        # sub-elements, and a deep copy taken after those caches exist would
+        # detach them from the copied tree.
+        self._snapshot = presentation
+        self._presentation = None
+        self._source = source
+        self._package_scan = None
+
+    @classmethod
+    def from_bytes(cls, template_bytes, keep_source: bool = True) -> "ParsedTemplate":
+        """
+        Parses PPTX bytes or a memory map of a PPTX file (read in place, not copied).
+        Pass keep_source=False when the template will not be analyzed (its
+        analysis is already known), so the bytes are not held in memory.
+        """
+        try:
+            prs = Presentation(package_stream(template_bytes))
+        except Exception as e:
+            logger.error(f"Failed to load template: {e}")
+            raise ValueError("Invalid PPTX file")
+        return cls(prs, template_bytes if keep_source else None)
+
+    @property
+    def package_scan(self) -> dict:
+        """
+        Layouts, theme and media headers read straight from the package (see ooxml_scanner).
+        """
+        if self._package_scan is None:
+            source = self._source
+            if source is None:
+                buffer = io.BytesIO()
+                self.presentation.save(buffer)
+                source = buffer.getvalue()
+            self._package_scan = scan_template(source)
+            self._source = None
+        return self._package_scan
+
+    @property
+    def presentation(self) -> Presentation:
+        """
+        Read-only view used by analysis and image cataloguing.
+        """
+        if self._presentation is None:
+            self._presentation = self.copy_presentation()
+        return self._presentation
+
+    def copy_presentation(self) -> Presentation:
+        """
+        Returns an independent copy of the parsed presentation for export.
+        XML parts are duplicated, but binary parts (images, media) share their
+        immutable blobs with the snapshot, so this is much cheaper than re-parsing.
+        """
+        return copy.deepcopy(self._snapshot)
+
+
+def load_template(template) -> ParsedTemplate:
+    """
+    Accepts either raw PPTX bytes or an already parsed template.
+    Raises ValueError if the bytes are not a valid PPTX file.
+    """
+    if isinstance(template, ParsedTemplate):
+        return template
+    return ParsedTemplate.from_bytes(template)
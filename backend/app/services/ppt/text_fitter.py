@@ -0,0 +1,243 @@
+import functools
+import logging
+import math
+import os
+from typing import List, Tuple
+from PIL import ImageFont
+from pptx.util import Emu
+from app import config
+
+logger = logging.getLogger("TextFitter")
+logger.setLevel(logging.INFO)
+
+# Fits bullets to a body placeholder. Text is measured with per-font glyph
+# width tables (from the font file through Pillow when it is installed on this
+# host, otherwise a built-in Helvetica-like table), loaded once per font and
+# kept for the life of the process. Widths are in ems, so one measurement of a
+# slide's words serves every font size tried.
+
+# Advance widths of ASCII 32..126 in 1/1000 em (Helvetica metrics, close to Arial)
+_FALLBACK_ASCII_WIDTHS = (
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+)
+_FALLBACK_DEFAULT_WIDTH = 0.556
+# CJK and other full-width scripts take a full em per character
+_WIDE_CODEPOINT_START = 0x2E80
+
+_SYSTEM_FONT_DIRS = (
+    "/usr/share/fonts",
+    "/usr/local/share/fonts",
+    os.path.expanduser("~/.fonts"),
+    "/Library/Fonts",
+    "/System/Library/Fonts",
+    os.path.join(os.environ.get("WINDIR", "C:\\Windows"), "Fonts"),
+)
+_FONT_EXTENSIONS = (".ttf", ".otf", ".ttc")
+# Size the font file is loaded at; widths are divided by it to get ems
+_MEASURE_SIZE = 1000
+
+# Text frame insets (python-pptx/Office defaults) and the hanging indent of a bullet
+_INSET_X_EMU = 2 * 91440
+_INSET_Y_EMU = 2 * 45720
+_BULLET_INDENT_EMU = 342900
+_LINE_HEIGHT_EM = 1.2
+_PARAGRAPH_SPACING_EM = 0.2
+_FONT_STEP_PT = 1
+
+
+class FontMetrics:
+    """
+    Glyph advance widths of one font, in ems.
+    Characters outside the preloaded table are measured on first use.
+    """
+
+    def __init__(self, name: str, font=None):
+        self.name = name
+        self._font = font
+        if font is not None:
+            self.widths = {chr(c): font.getlength(chr(c)) / _MEASURE_SIZE for c in range(32, 256)}
+        else:
+            self.widths = {chr(c + 32): w / 1000 for c, w in enumerate(_FALLBACK_ASCII_WIDTHS)}
+
+    def _char_width(self, char: str) -> float:
+        if self._font is not None:
+            width = self._font.getlength(char) / _MEASURE_SIZE
+        elif ord(char) >= _WIDE_CODEPOINT_START:
+            width = 1.0
+        else:
+            width = _FALLBACK_DEFAULT_WIDTH
+        self.widths[char] = width
+        return width
+
+    def measure(self, text: str) -> float:
+        widths = self.widths
+        total = 0.0
+        for char in text:
+            width = widths.get(char)
+            total += width if width is not None else self._char_width(char)
+        return total
+
+
+def _normalize_font_name(name: str) -> str:
+    return "".join(c for c in name.lower() if c.isalnum())
+
+
+@functools.lru_cache(maxsize=1)
+def _font_files() -> dict:
+    """
+    Maps normalised font file names to paths, scanning the font directories once.
+    """
+    files = {}
+    for directory in (*config.AUTOFIT_FONT_DIRS, *_SYSTEM_FONT_DIRS):
+        if not os.path.isdir(directory):
+            continue
+        for root, _, names in os.walk(directory):
+            for filename in names:
+                stem, ext = os.path.splitext(filename)
+                if ext.lower() in _FONT_EXTENSIONS:
+                    files.setdefault(_normalize_font_name(stem), os.path.join(root, filename))
+    return files
+
+
+@functools.lru_cache(maxsize=64)
+def get_font_metrics(name: str) -> FontMetrics:
+    """
+    Metrics of a font by typeface name, loaded once per process.
+    Falls back to the built-in table if the font is not installed or Pillow cannot read it.
+    """
+    key = _normalize_font_name(name or "")
+    files = _font_files()
+    path = files.get(key) or files.get(key + "regular")
+    if path:
+        try:
+            metrics = FontMetrics(name, ImageFont.truetype(path, _MEASURE_SIZE))
+            logger.info(f"Loaded metrics of font '{name}' from {path}")
+            return metrics
+        except Exception as e:
+            logger.warning(f"Could not load font '{name}' from {path}: {e}")
+    logger.info(f"Font '{name}' not found, measuring text with built-in metrics")
+    return FontMetrics(name)
+
+
+class _MeasuredBullets:
+    """
+    Word widths (in ems) of a slide's bullets, measured once and wrapped at any font size.
+    """
+
+    def __init__(self, bullets: List[str], metrics: FontMetrics):
+        word_widths = {}
+        self.bullets = []
+        for bullet in bullets:
+            widths = []
+            for word in bullet.split():
+                width = word_widths.get(word)
+                if width is None:
+                    width = word_widths[word] = metrics.measure(word)
+                widths.append(width)
+            self.bullets.append(widths)
+        self.space = metrics.measure(" ")
+
+    def lines(self, index: int, line_em: float) -> int:
+        """
+        Lines bullet `index` wraps to when a line holds `line_em` ems.
+        """
+        lines = 1
+        used = 0.0
+        for width in self.bullets[index]:
+            if used and used + self.space + width <= line_em:
+                used += self.space + width
+                continue
+            if used:
+                lines += 1
+            # A word wider than the line is broken across lines
+            extra = max(0, math.ceil(width / line_em) - 1)
+            lines += extra
+            used = width - extra * line_em
+        return lines
+
+    def height_em(self, start: int, end: int, line_em: float) -> float:
+        """
+        Height of bullets start..end in ems of the font size.
+        """
+        height = 0.0
+        for index in range(start, end):
+            height += self.lines(index, line_em) * _LINE_HEIGHT_EM + _PARAGRAPH_SPACING_EM
+        return height
+
+
+def _font_sizes(base_pt: float) -> List[float]:
+    """
+    Font sizes to try, largest first: the template's size down to the smallest allowed.
+    """
+    smallest = base_pt * config.AUTOFIT_MIN_FONT_SCALE
+    sizes = []
+    size = base_pt
+    while size > smallest:
+        sizes.append(size)
+        size -= _FONT_STEP_PT
+    sizes.append(smallest)
+    return sizes
+
+
+def _largest_fitting_size(measured: _MeasuredBullets, count: int, sizes: List[float], width_pt: float, height_pt: float):
+    """
+    Largest of `sizes` (descending) at which the first `count` bullets fit, or None.
+    The needed height only grows with the font size, so this is a binary search.
+    """
+    def fits(size):
+        return measured.height_em(0, count, width_pt / size) * size <= height_pt
+
+    low, high = 0, len(sizes)
+    while low < high:
+        middle = (low + high) // 2
+        if fits(sizes[middle]):
+            high = middle
+        else:
+            low = middle + 1
+    return sizes[low] if low < len(sizes) else None
+
+
+def fit_bullets(bullets: List[str], body: dict) -> Tuple[int, float]:
+    """
+    Fits bullets to a body placeholder described by the layout index.
+
+    Returns (count, font_pt): the number of leading bullets that go on the
+    slide and the font size to use. All bullets fit when the font can shrink
+    enough; otherwise the first share of an even split is kept and the rest
+    is left for continuation slides. At least one bullet is always placed.
+    Without a known body size (zero width or height) all bullets are kept at
+    the base size.
+    """
+    base_pt = body["capacity"]["font_pt"]
+    if not bullets:
+        return 0, base_pt
+    if body.get("width", 0) <= 0 or body.get("height", 0) <= 0:
+        return len(bullets), base_pt
+    width_pt = Emu(max(body["width"] - _INSET_X_EMU - _BULLET_INDENT_EMU, 1)).pt
+    height_pt = Emu(max(body["height"] - _INSET_Y_EMU, 1)).pt
+    measured = _MeasuredBullets(bullets, get_font_metrics(body.get("font") or ""))
+    sizes = _font_sizes(base_pt)
+
+    size = _largest_fitting_size(measured, len(bullets), sizes, width_pt, height_pt)
+    if size is not None:
+        return len(bullets), size
+
+    # Overflow: split over as many slides as the smallest size needs, in
+    # even parts, so the continuation is not left with a few stray bullets
+    smallest = sizes[-1]
+    line_em = width_pt / smallest
+    heights = [measured.height_em(i, i + 1, line_em) * smallest for i in range(len(bullets))]
+    fits = 0
+    used = 0.0
+    while fits < len(bullets) and used + heights[fits] <= height_pt:
+        used += heights[fits]
+        fits += 1
+    slides = max(2, math.ceil(sum(heights) / height_pt))
+    count = max(1, min(fits, math.ceil(len(bullets) / slides)))
+
+    return count, _largest_fitting_size(measured, count, sizes, width_pt, height_pt) or smallest
@@ -0,0 +1,315 @@
+import asyncio
+import contextlib
+import io
+import logging
+import multiprocessing
+import os
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncContextManager, AsyncIterator, Callable, Optional
+from app import config
+from app.services.template_parser import analyze_presentation
+from app.services.ppt.ppt_exporter import PresentationBuilder, build_presentation, generate_presentation
+from app.services.ppt import output_writer
+from app.services.ppt.template_loader import ParsedTemplate
+from app.services import template_registry
+from app.services.uploads import map_template_file
+from app.services.metrics import timed
+
+logger = logging.getLogger("PPTExecutor")
+logger.setLevel(logging.INFO)
+
+# Shared process pool (only used in "process" execution mode)
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+# Per worker process: recently opened templates, keyed by temp file path
+_worker_templates: "OrderedDict[str, tuple]" = OrderedDict()
+_WORKER_CACHE_SIZE = 2
+
+
+def start_executor():
+    """
+    Starts the process pool if the process execution mode is enabled.
+    Called once on application startup.
+    """
+    global _process_pool
+    if config.PPT_EXECUTION_MODE != "process" or _process_pool is not None:
+        return
+
+    # "spawn" avoids forking a process that already runs an event loop and threads
+    _process_pool = ProcessPoolExecutor(
+        max_workers=config.PPT_PROCESS_WORKERS,
+        mp_context=multiprocessing.get_context("spawn")
+    )
+    logger.info(f"Started PPTX process pool with {config.PPT_PROCESS_WORKERS} workers")
+
+
+def shutdown_executor():
+    """
+    Stops the process pool. Called once on application shutdown.
+    """
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=True, cancel_futures=True)
+        _process_pool = None
+        logger.info("PPTX process pool stopped")
+
+
+class TemplateSource:
+    """
+    The uploaded template as handed to the CPU-bound stages.
+
+    In thread mode it wraps the ParsedTemplate shared by analysis and export.
+    In process mode the bytes are written once to a temp file that worker
+    processes open by path, so the template is never pickled across processes.
+    Registered templates are opened from their stored file, which is kept.
+    """
+
+    def __init__(self, parsed: ParsedTemplate = None, path: str = None, owns_path: bool = True):
+        self.parsed = parsed
+        self.path = path
+        self.owns_path = owns_path
+
+    def close(self):
+        if self.path and self.owns_path:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            self.path = None
+
+
+def _write_temp_template(template_bytes: bytes) -> str:
+    fd, path = tempfile.mkstemp(suffix=".pptx", prefix="template-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(template_bytes)
+    return path
+
+
+async def open_template(template_bytes) -> TemplateSource:
+    """
+    Prepares the template (bytes or a memory map) for analysis and export.
+    Raises ValueError if the template cannot be parsed (thread mode only;
+    in process mode invalid files are reported by the analysis step).
+    """
+    if _process_pool is not None:
+        path = await asyncio.to_thread(_write_temp_template, template_bytes)
+        return TemplateSource(path=path)
+
+    parsed = await asyncio.to_thread(ParsedTemplate.from_bytes, template_bytes)
+    return TemplateSource(parsed=parsed)
+
+
+async def open_registered_template(template_id: str) -> Optional[tuple]:
+    """
+    Returns (TemplateSource, metadata) for a registered template, or None if
+    the id is unknown. Nothing is parsed or analyzed when the template is
+    already loaded; otherwise only the PPTX package is parsed, and in process
+    mode only the precompiled metadata is read here.
+    """
+    if _process_pool is not None:
+        metadata = await asyncio.to_thread(template_registry.get_metadata, template_id)
+        if metadata is None:
+            return None
+        return TemplateSource(path=template_registry.template_path(template_id), owns_path=False), metadata
+
+    registered = await asyncio.to_thread(template_registry.get_template, template_id)
+    if registered is None:
+        return None
+    return TemplateSource(parsed=registered.parsed), registered.metadata
+
+
+async def analyze_template(source: TemplateSource) -> dict:
+    """
+    Runs analyze_presentation off the event loop.
+    """
+    if source.path:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_process_pool, _analyze_in_worker, source.path)
+    return await asyncio.to_thread(analyze_presentation, source.parsed)
+
+
+async def _export_in_pool(*args):
+    """
+    Runs _export_in_worker in the process pool. Cloning, filling and saving
+    happen in the worker, so they are timed here as a single "build" stage.
+    """
+    loop = asyncio.get_running_loop()
+    with timed("build"):
+        return await loop.run_in_executor(_process_pool, _export_in_worker, *args)
+
+
+async def export_presentation(source: TemplateSource, slide_plan: dict, template_metadata: dict = None) -> io.BytesIO:
+    """
+    Runs generate_presentation off the event loop.
+    In process mode the worker reuses its own analysis of the template.
+    """
+    if source.path:
+        output = await _export_in_pool(source.path, slide_plan)
+        return io.BytesIO(output)
+    return await asyncio.to_thread(generate_presentation, source.parsed, slide_plan, template_metadata)
+
+
+async def save_presentation(source: TemplateSource, slide_plan: dict, template_metadata: dict, output_path: str):
+    """
+    Builds the deck off the event loop and writes it to `output_path`.
+    """
+    if source.path:
+        await _export_in_pool(source.path, slide_plan, output_path)
+        return
+
+    builder = await asyncio.to_thread(build_presentation, source.parsed, slide_plan, template_metadata)
+
+    def save():
+        with open(output_path, "wb") as f:
+            builder.save(f)
+
+    await asyncio.to_thread(save)
+
+
+async def stream_presentation(source: TemplateSource, slide_plan: dict, template_metadata: dict = None) -> AsyncIterator[bytes]:
+    """
+    Builds the deck off the event loop and returns its bytes as a response body,
+    written according to PPT_OUTPUT_MODE (see render_output).
+    Build failures and failures before the first output byte are raised here.
+    """
+    if source.path:
+        if config.PPT_OUTPUT_MODE == "buffer":
+            output = await _export_in_pool(source.path, slide_plan)
+            return await output_writer.primed(output_writer.iter_bytes(output))
+
+        # The worker writes the deck to a temp file that is streamed and then deleted
+        fd, output_path = tempfile.mkstemp(suffix=".pptx", prefix="output-")
+        os.close(fd)
+        try:
+            await _export_in_pool(source.path, slide_plan, output_path)
+            return await output_writer.primed(output_writer.iter_file(output_path, delete=True))
+        except BaseException:
+            os.remove(output_path)
+            raise
+
+    builder = await asyncio.to_thread(build_presentation, source.parsed, slide_plan, template_metadata)
+    return await render_output(builder)
+
+
+async def render_output(builder: PresentationBuilder) -> AsyncIterator[bytes]:
+    """
+    Saves a built deck as a response body, according to PPT_OUTPUT_MODE:
+    - "buffer": save into memory, then send
+    - "spool": save into a temp file that spills to disk above PPT_OUTPUT_SPOOL_BYTES
+    - "stream": write the ZIP container straight into the response while saving
+    """
+    mode = config.PPT_OUTPUT_MODE
+    if mode == "stream":
+        body = output_writer.stream_save(builder.save)
+    elif mode == "spool":
+        body = output_writer.spool_save(builder.save, config.PPT_OUTPUT_SPOOL_BYTES)
+    else:
+        output = await asyncio.to_thread(builder.finish)
+        body = output_writer.iter_bytes(output.getbuffer())
+    return await output_writer.primed(body)
+
+
+def supports_streamed_export(source: TemplateSource) -> bool:
+    """
+    Streamed export keeps the deck under construction in this process,
+    so it is only available when the template was parsed here (thread mode).
+    """
+    return source.parsed is not None
+
+
+async def export_streamed(source: TemplateSource, slides, template_metadata: dict = None,
+                          cpu_slot: Callable[[], AsyncContextManager] = None) -> AsyncIterator[bytes]:
+    """
+    Builds the deck while its slides are still arriving, then returns it as a
+    response body (see render_output).
+
+    `slides` is an async iterable of slide dicts (e.g. a StreamedPlan). Each
+    slide is cloned and filled in a worker thread as soon as it arrives, while
+    the next ones keep streaming in; slides are added strictly in order.
+    `cpu_slot`, if given, is entered around each CPU-bound step (setup, every
+    slide, the save) but not while waiting for the next slide.
+    """
+    cpu_slot = cpu_slot or contextlib.nullcontext
+    async with cpu_slot():
+        builder = await asyncio.to_thread(PresentationBuilder, source.parsed, template_metadata)
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def build_slides():
+        while True:
+            slide_data = await queue.get()
+            if slide_data is None:
+                return
+            async with cpu_slot():
+                await asyncio.to_thread(builder.add_slide, slide_data)
+
+    build_task = asyncio.create_task(build_slides())
+    try:
+        async for slide_data in slides:
+            if build_task.done():
+                break
+            queue.put_nowait(slide_data)
+    except BaseException:
+        build_task.cancel()
+        raise
+
+    queue.put_nowait(None)
+    await build_task
+    async with cpu_slot():
+        return await render_output(builder)
+
+
+# --- Worker process side ---
+
+def _open_in_worker(path: str) -> tuple:
+    """
+    Returns (ParsedTemplate, metadata) for a template file, parsing it at most
+    once per worker process while it stays in the small per-worker cache.
+    """
+    cached = _worker_templates.get(path)
+    if cached:
+        _worker_templates.move_to_end(path)
+        return cached
+
+    # Registered templates come with their artifacts and their own cache
+    template_id = template_registry.template_id_for_path(path)
+    if template_id:
+        registered = template_registry.get_template(template_id)
+        if registered is None:
+            return None, {"error": "Template not found"}
+        return registered.parsed, registered.metadata
+
+    try:
+        parsed = ParsedTemplate.from_bytes(map_template_file(path))
+    except ValueError:
+        return None, {"error": "Invalid PPTX file"}
+    metadata = analyze_presentation(parsed)
+
+    _worker_templates[path] = (parsed, metadata)
+    while len(_worker_templates) > _WORKER_CACHE_SIZE:
+        _worker_templates.popitem(last=False)
+    return parsed, metadata
+
+
+def _analyze_in_worker(path: str) -> dict:
+    # Image entries only carry lazy ImageRefs, which pickle without their bytes
+    _, metadata = _open_in_worker(path)
+    return metadata
+
+
+def _export_in_worker(path: str, slide_plan: dict, output_path: str = None) -> Optional[bytes]:
+    """
+    Builds the deck. Writes it to `output_path` if given (nothing is pickled
+    back), otherwise returns its bytes.
+    """
+    parsed, metadata = _open_in_worker(path)
+    if parsed is None:
+        raise ValueError("Invalid template file")
+    builder = build_presentation(parsed, slide_plan, metadata)
+    if output_path:
+        with open(output_path, "wb") as f:
+            builder.save(f)
+        return None
+    return builder.finish().getvalue()
+
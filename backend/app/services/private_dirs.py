@@ -0,0 +1,84 @@
+import logging
+import os
+import stat
+import threading
+
+logger = logging.getLogger("PrivateDirs")
+logger.setLevel(logging.INFO)
+
+# Directories for local state that must not be shared with other users of the
+# host: the job queue (API keys, uploaded templates), the plan cache (plans
+# served to users) and the template registry. Their defaults live under the
+# system temp directory, where another local user could create them first, so
+# before use each one is checked:
+# - it belongs to this process's user and nobody else can write to it
+#   (a directory only others can read is tightened to 0700)
+# - every parent directory belongs to this user or root and is not writable
+#   by others, unless it has the sticky bit (like /tmp), so the directory
+#   cannot be renamed or replaced
+# Missing directories are created with owner-only permissions, parents included.
+
+_verified = set()
+_verified_lock = threading.Lock()
+
+
+class UnsafeDirectoryError(Exception):
+    """
+    A private directory could be read or modified by another user.
+    """
+
+
+def _makedirs_private(path: str):
+    parent = os.path.dirname(path)
+    if parent != path and not os.path.isdir(parent):
+        _makedirs_private(parent)
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+
+
+def _check(path: str):
+    uid = os.geteuid()
+    st = os.stat(path)
+    if not stat.S_ISDIR(st.st_mode):
+        raise UnsafeDirectoryError(f"{path} is not a directory")
+    if st.st_uid != uid:
+        raise UnsafeDirectoryError(f"Refusing {path}: it is owned by another user")
+    if st.st_mode & 0o022:
+        raise UnsafeDirectoryError(f"Refusing {path}: other users can write to it")
+    if st.st_mode & 0o077:
+        os.chmod(path, 0o700)
+        logger.warning(f"Restricted {path} to its owner")
+
+    parent = os.path.dirname(path)
+    while True:
+        st = os.stat(parent)
+        if st.st_uid not in (uid, 0):
+            raise UnsafeDirectoryError(f"Refusing {path}: parent {parent} is owned by another user")
+        if st.st_mode & 0o022 and not st.st_mode & stat.S_ISVTX:
+            raise UnsafeDirectoryError(f"Refusing {path}: other users can write to parent {parent}")
+        if os.path.dirname(parent) == parent:
+            return
+        parent = os.path.dirname(parent)
+
+
+def ensure_private_dir(path: str, create: bool = True) -> bool:
+    """
+    Checks (and with `create`, first creates) a directory for private state.
+    Returns False if it does not exist and was not created.
+    Raises UnsafeDirectoryError if another user could tamper with it.
+    """
+    path = os.path.abspath(path)
+    if path in _verified:
+        return True
+    if create:
+        _makedirs_private(path)
+    elif not os.path.isdir(path):
+        return False
+    # No ownership or mode bits to check on Windows
+    if hasattr(os, "geteuid"):
+        _check(path)
+    with _verified_lock:
+        _verified.add(path)
+    return True
@@ -0,0 +1,221 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from typing import Optional
+from starlette.responses import StreamingResponse
+from app import config
+
+logger = logging.getLogger("Profiler")
+logger.setLevel(logging.INFO)
+
+# Opt-in profiling of a single request.
+# A sampling profiler records the Python stacks of every busy thread at a fixed
+# interval (the request's work spans the event loop and worker threads), and
+# tracemalloc records where memory was allocated. Results are written to
+# PPT_PROFILE_DIR/<request_id>/. Only one request is profiled at a time; samples
+# can include other requests running concurrently on the same threads. A profile
+# ends when its response has been sent (or sending failed), or after
+# PPT_PROFILE_MAX_SECONDS, whichever comes first.
+
+_profile_lock = threading.Lock()
+
+# Innermost frames of threads that are idle (waiting for I/O or for work)
+_IDLE_FILES = ("selectors.py", "threading.py", "queue.py")
+_IDLE_FUNCTIONS = {("thread.py", "_worker"), ("process.py", "_queue_management_worker")}
+
+
+def _is_idle(frame) -> bool:
+    filename = os.path.basename(frame.f_code.co_filename)
+    return filename in _IDLE_FILES or (filename, frame.f_code.co_name) in _IDLE_FUNCTIONS
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of all other threads from a background thread.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or _is_idle(frame):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                self.stacks[tuple(reversed(stack))] += 1
+                self.samples += 1
+
+    def report(self, top: int = 40) -> str:
+        """
+        Functions ranked by samples where they were running (self) and on the stack (total).
+        """
+        own = Counter()
+        total = Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for label in set(stack):
+                total[label] += count
+
+        lines = [f"Samples: {self.samples} (interval {self.interval * 1000:g} ms)", "", "Self samples:"]
+        lines += [f"{count:8d}  {count / max(self.samples, 1):6.1%}  {label}" for label, count in own.most_common(top)]
+        lines += ["", "Total samples (function on the stack):"]
+        lines += [f"{count:8d}  {count / max(self.samples, 1):6.1%}  {label}" for label, count in total.most_common(top)]
+        return "\n".join(lines) + "\n"
+
+    def collapsed_stacks(self) -> str:
+        """
+        One "frame;frame;frame count" line per stack, the input format of flame graph tools.
+        """
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class RequestProfile:
+    """
+    Profiles one request from start() until stop(); stop() writes the results.
+    """
+
+    def __init__(self):
+        self.request_id = uuid.uuid4().hex
+        self.directory = os.path.join(config.PPT_PROFILE_DIR, self.request_id)
+        self._profiler = SamplingProfiler(config.PPT_PROFILE_INTERVAL_SECONDS)
+        self._started_tracemalloc = False
+        self._start_time = 0.0
+        self._stopped = False
+        self._expiry = None
+        self._expiry_task = None
+
+    def start(self):
+        """
+        Must be called from the event loop, which enforces PPT_PROFILE_MAX_SECONDS.
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(config.PPT_PROFILE_TRACEBACK_DEPTH)
+            self._started_tracemalloc = True
+        tracemalloc.reset_peak()
+        self._start_time = time.perf_counter()
+        self._profiler.start()
+        self._expiry = asyncio.get_running_loop().call_later(config.PPT_PROFILE_MAX_SECONDS, self._expire)
+        logger.info(f"Profiling request {self.request_id}")
+
+    def _expire(self):
+        logger.warning(
+            f"Request {self.request_id} still profiled after {config.PPT_PROFILE_MAX_SECONDS:g} s, stopping the profile"
+        )
+        self._expiry_task = asyncio.ensure_future(self.stop())
+
+    def _finish(self) -> Optional[tuple]:
+        """
+        Stops sampling and tracing and frees the profiling slot, without
+        awaiting anything. Returns (elapsed, snapshot, peak), or None if the
+        profile was already stopped.
+        """
+        if self._stopped:
+            return None
+        self._stopped = True
+        try:
+            if self._expiry is not None:
+                self._expiry.cancel()
+            elapsed = time.perf_counter() - self._start_time
+            self._profiler.stop()
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            return elapsed, snapshot, peak
+        finally:
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+            _profile_lock.release()
+
+    async def stop(self):
+        try:
+            result = self._finish()
+            if result is None:
+                return
+            await asyncio.to_thread(self._write, *result)
+            logger.info(f"Profile of request {self.request_id} written to {self.directory}")
+        except Exception as e:
+            logger.error(f"Could not write profile of request {self.request_id}: {e}")
+
+    def _write(self, elapsed: float, snapshot, peak: int):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, "profile.txt"), "w") as f:
+            f.write(f"Request {self.request_id}: {elapsed:.3f} s\n")
+            f.write(self._profiler.report())
+        with open(os.path.join(self.directory, "stacks.txt"), "w") as f:
+            f.write(self._profiler.collapsed_stacks())
+
+        # Our own bookkeeping is not part of the request's allocations
+        snapshot = snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ])
+        stats = snapshot.statistics("traceback")
+        with open(os.path.join(self.directory, "allocations.txt"), "w") as f:
+            f.write(f"Peak traced memory: {peak / 1024 / 1024:.1f} MiB\n")
+            f.write(f"Still allocated at the end: {sum(s.size for s in stats) / 1024 / 1024:.1f} MiB\n")
+            for index, stat in enumerate(stats[:config.PPT_PROFILE_TOP_ALLOCATIONS], 1):
+                f.write(f"\n#{index}: {stat.size / 1024:.1f} KiB in {stat.count} blocks\n")
+                for line in stat.traceback.format():
+                    f.write(f"{line}\n")
+
+
+
+class ProfiledStreamingResponse(StreamingResponse):
+    """
+    A StreamingResponse that keeps profiling while it is sent, and stops its
+    profile once sending ends, whether the body completed, the client went
+    away or sending failed.
+    """
+
+    def __init__(self, *args, profile: RequestProfile, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.profile = profile
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.profile.stop()
+
+
+def start_request_profile() -> Optional[RequestProfile]:
+    """
+    Starts profiling the current request, or returns None if another
+    request is already being profiled.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        logger.warning("Another request is being profiled, running this one without profiling")
+        return None
+    try:
+        profile = RequestProfile()
+        profile.start()
+    except BaseException:
+        _profile_lock.release()
+        raise
+    return profile
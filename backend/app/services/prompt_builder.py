@@ -1,6 +1,9 @@
 import json
 
-def build_planning_prompt(text_input: str, guidance: str | None) -> str:
+# Bump whenever the prompts change, so cached plans from older prompts are not reused
+PROMPT_VERSION = "2"
+
+def build_planning_prompt(text_input: str, guidance: str | None, slide_count_rule: str = "Create at least 3 slides.") -> str:
     """
     Constructs the system verification prompt for the LLM.
     """
@@ -21,7 +24,7 @@ Transform the input text into a slide deck plan.
 CONSTRAINTS:
 - Use JSON format ONLY.
 - The JSON must match the schema provided below.
-- Create at least 3 slides.
+- {slide_count_rule}
 - Do NOT hallucinate facts not present in the input text.
 - Do NOT use markdown code blocks (```json). Just raw JSON.
 
@@ -47,3 +50,57 @@ INPUT TEXT:
 {guidance_section}
 """
     return prompt.strip()
+
+
+def build_chunk_planning_prompt(chunk_text: str, guidance: str | None, part_number: int, part_count: int, min_slides: int = 1) -> str:
+    """
+    Constructs the planning prompt for one part of a long document (map step of chunked planning).
+    """
+    rule = (
+        f"This text is part {part_number} of {part_count} of a longer document. "
+        f"Create {min_slides} or more slides covering ONLY this part. "
+        "Do not add a title, agenda or closing slide unless this part contains one."
+    )
+    return build_planning_prompt(chunk_text, guidance, slide_count_rule=rule)
+
+
+def build_repair_prompt(failed_output: str, errors: str) -> str:
+    """
+    Constructs a prompt asking the LLM to fix its own invalid plan.
+    Only the failing output and the validation errors are sent, not the input text,
+    so the model regenerates far fewer tokens than with the full planning prompt.
+    """
+    prompt = f"""
+Your previous answer was meant to be a JSON slide plan but failed validation.
+Fix the errors listed below and return the corrected JSON.
+
+RULES:
+- Return the complete corrected JSON ONLY, with no explanation.
+- Do NOT use markdown code blocks (```json). Just raw JSON.
+- Keep all valid content unchanged; only fix what the errors point to.
+- Every slide needs a non-empty "title" and at least one bullet.
+- If there are too few slides, split existing content into more slides.
+
+SCHEMA:
+{{
+  "slides": [
+    {{
+      "title": "string",
+      "bullets": ["string", "string"],
+      "notes": "string (speaker notes for this slide)"
+    }}
+  ],
+  "meta": {{
+    "estimated_duration_minutes": number,
+    "slide_count": number,
+    "tone": "string"
+  }}
+}}
+
+VALIDATION ERRORS:
+{errors}
+
+PREVIOUS ANSWER:
+{failed_output}
+"""
+    return prompt.strip()
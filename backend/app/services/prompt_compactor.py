@@ -0,0 +1,172 @@
+import math
+import re
+from collections import Counter
+from typing import List
+from app import config
+
+# Input preprocessing before prompting: whitespace normalisation, removal of
+# repeated boilerplate (page headers/footers, page numbers) and duplicated
+# paragraphs, plus rough token estimates used to size the output budget.
+# Boilerplate is only recognised at page boundaries (form feeds, as emitted by
+# PDF/Word text extraction, and page labels such as "Page 3"); text without
+# pages keeps every line, so repeated labels and figures in data survive.
+
+_INLINE_SPACE_RE = re.compile(r"[ \t\v\u00a0]+")
+_PAGE_BREAK = "\f"
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+_PAGE_LABEL_RE = re.compile(r"^(page\s*\d{1,4}(\s*(of|/)\s*\d{1,4})?|\d{1,4}\s*(of|/)\s*\d{1,4})$", re.IGNORECASE)
+_BARE_NUMBER_RE = re.compile(r"^\d{1,3}$")
+
+# A line at the edge of this many pages is treated as a running header/footer
+_BOILERPLATE_MIN_REPEATS = 3
+# Non-blank lines at the top and bottom of a page where headers/footers are looked for
+_PAGE_EDGE_LINES = 2
+# Shorter paragraphs (e.g. headings) may legitimately repeat and are kept
+_DEDUPE_MIN_PARAGRAPH_CHARS = 40
+
+# Rough size of one planned slide in output tokens (title, bullets, notes, JSON syntax)
+_TOKENS_PER_SLIDE = 220
+_PLAN_OVERHEAD_TOKENS = 120
+# Roughly one slide per this many input tokens
+_INPUT_TOKENS_PER_SLIDE = 180
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count (about 4 characters per token for English text).
+    """
+    return math.ceil(len(text) / 4)
+
+
+def normalize_whitespace(text: str) -> str:
+    """
+    Unifies line endings, collapses runs of spaces and blank lines, trims lines.
+    Page breaks (form feeds) are kept on lines of their own.
+    """
+    text = text.replace("\r\n", "\n").replace("\r", "\n").replace(_PAGE_BREAK, f"\n{_PAGE_BREAK}\n")
+    lines = [
+        line if line == _PAGE_BREAK else _INLINE_SPACE_RE.sub(" ", line).strip(" \f")
+        for line in text.split("\n")
+    ]
+    return _BLANK_LINES_RE.sub("\n\n", "\n".join(lines)).strip()
+
+
+def _line_key(line: str) -> str:
+    return line.casefold()
+
+
+def _pages(lines: List[str]) -> List[List[int]]:
+    """
+    Indices of the non-blank lines of each page. Pages end at form feeds and page labels.
+    """
+    pages = [[]]
+    for i, line in enumerate(lines):
+        if line == _PAGE_BREAK or _PAGE_LABEL_RE.match(line):
+            pages.append([])
+        elif line:
+            pages[-1].append(i)
+    return [page for page in pages if page]
+
+
+def _page_numbers(lines: List[str], pages: List[List[int]]) -> set:
+    """
+    Indices of bare numbers that number the pages: the last (or else first)
+    line of a page, increasing from page to page, on enough pages.
+    """
+    numbers = []
+    for page in pages:
+        for i in (page[-1], page[0]):
+            if _BARE_NUMBER_RE.match(lines[i]):
+                numbers.append(i)
+                break
+    values = [int(lines[i]) for i in numbers]
+    if len(numbers) < _BOILERPLATE_MIN_REPEATS or any(b <= a for a, b in zip(values, values[1:])):
+        return set()
+    return set(numbers)
+
+
+def remove_boilerplate_lines(text: str) -> str:
+    """
+    Drops page labels ("Page 3", "3 of 12") and, when the text has page
+    breaks, page numbers and running headers/footers: lines that open or
+    close several pages keep only their first occurrence there.
+    Lines away from page edges are never dropped, however often they repeat.
+    """
+    lines = text.split("\n")
+    pages = _pages(lines)
+    dropped = set()
+    if len(pages) >= _BOILERPLATE_MIN_REPEATS:
+        dropped = _page_numbers(lines, pages)
+        pages = [[i for i in page if i not in dropped] for page in pages]
+        counts = Counter(
+            key for page in pages
+            for key in {_line_key(lines[i]) for i in page[:_PAGE_EDGE_LINES] + page[-_PAGE_EDGE_LINES:]}
+        )
+        seen = set()
+        for page in pages:
+            # Headers and footers touch the page boundary: walk inwards from
+            # each edge and stop at the first line that is not recurring
+            visited = set()
+            for edge in (page[:_PAGE_EDGE_LINES], page[::-1][:_PAGE_EDGE_LINES]):
+                for i in edge:
+                    key = _line_key(lines[i])
+                    if counts[key] < _BOILERPLATE_MIN_REPEATS:
+                        break
+                    if i in visited:
+                        continue
+                    visited.add(i)
+                    if key in seen:
+                        dropped.add(i)
+                    seen.add(key)
+
+    kept: List[str] = []
+    for i, line in enumerate(lines):
+        if i in dropped or (line and _PAGE_LABEL_RE.match(line)):
+            continue
+        kept.append("" if line == _PAGE_BREAK else line)
+    return _BLANK_LINES_RE.sub("\n\n", "\n".join(kept)).strip()
+
+
+def dedupe_paragraphs(text: str) -> str:
+    """
+    Keeps only the first occurrence of paragraphs that appear more than once.
+    """
+    seen = set()
+    kept = []
+    for paragraph in text.split("\n\n"):
+        key = " ".join(paragraph.split()).casefold()
+        if len(key) >= _DEDUPE_MIN_PARAGRAPH_CHARS:
+            if key in seen:
+                continue
+            seen.add(key)
+        kept.append(paragraph)
+    return "\n\n".join(kept)
+
+
+def compact_text(text: str) -> str:
+    """
+    Normalised, deduplicated input text. Returns the text unchanged if
+    compaction is disabled.
+    """
+    if not config.PROMPT_COMPACTION_ENABLED:
+        return text
+    return dedupe_paragraphs(remove_boilerplate_lines(normalize_whitespace(text)))
+
+
+def plan_output_budget(input_text: str, min_slides: int = 3) -> int:
+    """
+    Output token budget for planning `input_text`: enough for the slide count
+    the input is expected to produce (with headroom, so large decks are not
+    truncated into invalid JSON), but no more, so small decks return sooner.
+    """
+    expected_slides = max(min_slides, math.ceil(estimate_tokens(input_text) / _INPUT_TOKENS_PER_SLIDE))
+    budget = int((_PLAN_OVERHEAD_TOKENS + expected_slides * _TOKENS_PER_SLIDE) * 1.5)
+    return max(config.LLM_MIN_OUTPUT_TOKENS, min(budget, config.LLM_MAX_OUTPUT_TOKENS))
+
+
+def repair_output_budget(failed_output: str) -> int:
+    """
+    Output token budget for repairing a plan: the size of the failed output plus headroom.
+    """
+    budget = int(estimate_tokens(failed_output) * 1.5) + _PLAN_OVERHEAD_TOKENS
+    return max(config.LLM_MIN_OUTPUT_TOKENS, min(budget, config.LLM_MAX_OUTPUT_TOKENS))
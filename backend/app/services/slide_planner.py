@@ -1,10 +1,24 @@
+import asyncio
 import json
 import logging
+import math
+import random
+from collections import Counter
+from pydantic import ValidationError
+from app import config
 from app.services.llm.openai import OpenAIClient
 from app.services.llm.gemini import GeminiClient
 from app.services.llm.anthropic import AnthropicClient
-from app.services.prompt_builder import build_planning_prompt
-from app.services.validators import SlidePlan
+from app.services.llm import hedging
+from app.services.llm.base import ProviderError
+from app.services.prompt_builder import build_planning_prompt, build_chunk_planning_prompt, build_repair_prompt
+from app.services.text_chunker import chunk_text
+from app.services.prompt_compactor import compact_text, estimate_tokens, plan_output_budget, repair_output_budget
+from app.services.validators import Slide, SlidePlan, partial_plan_model
+from app.services.plan_stream import SlideStreamParser
+from app.services import plan_cache
+from app.services import metrics
+import time
 
 logger = logging.getLogger("SlidePlanner")
 logger.setLevel(logging.INFO)
@@ -15,6 +29,14 @@ if not logger.handlers:
     logger.addHandler(sh)
 logger.propagate = False
 
+# Clients are stateless (the API key is passed per call), so one instance per provider is shared
+_LLM_CLIENTS = {
+    "anthropic": AnthropicClient(),
+    "openai": OpenAIClient(),
+    "gemini": GeminiClient(),
+}
+LLM_PROVIDERS = tuple(_LLM_CLIENTS)
+
 def get_llm_client(api_key: str):
     """
     Factory to choose the correct LLM provider based on API key format.
@@ -22,50 +44,336 @@ def get_llm_client(api_key: str):
     """
     if api_key.startswith("sk-ant-"):
         logger.info("Detected Anthropic API key")
-        return AnthropicClient()
+        return _LLM_CLIENTS["anthropic"]
     elif api_key.startswith("sk-"):
         logger.info("Detected OpenAI API key")
-        return OpenAIClient()
+        return _LLM_CLIENTS["openai"]
     else:
         # Assuming Google API key (starts with AIza usually, or just default to Gemini for non-sk keys)
         logger.info("Detected Gemini API key")
-        return GeminiClient()
+        return _LLM_CLIENTS["gemini"]
 
-async def generate_slide_plan(text_input: str, guidance: str | None, api_key: str) -> dict:
-    prompt = build_planning_prompt(text_input, guidance)
+class PlanValidationError(ValueError):
+    """
+    The LLM answered, but its output is not a valid plan.
+    Keeps the raw output and a readable list of the errors, for the repair prompt.
+    """
+
+    def __init__(self, message: str, raw_response: str, errors: str):
+        super().__init__(message)
+        self.raw_response = raw_response
+        self.errors = errors
+
+def parse_plan_response(raw_response: str, plan_model=SlidePlan):
+    """
+    Strips code fences from a raw LLM response and validates it as a SlidePlan
+    (or the given plan model). Raises PlanValidationError.
+    """
+    cleaned_response = raw_response.strip()
+    if cleaned_response.startswith("```json"):
+        cleaned_response = cleaned_response[7:]
+    if cleaned_response.endswith("```"):
+        cleaned_response = cleaned_response[:-3]
+    
+    try:
+        data = json.loads(cleaned_response)
+    except json.JSONDecodeError as e:
+        raise PlanValidationError("Invalid JSON output from LLM", raw_response, f"- Invalid JSON: {e}")
+    if not isinstance(data, dict):
+        raise PlanValidationError("Invalid JSON output from LLM", raw_response, "- The top level must be a JSON object")
     
-    max_retries = 2
-    last_error = None
+    try:
+        return plan_model(**data)
+    except ValidationError as e:
+        errors = "\n".join(
+            f"- {'.'.join(str(part) for part in error['loc']) or 'plan'}: {error['msg']}"
+            for error in e.errors()
+        )
+        raise PlanValidationError(str(e), raw_response, errors)
+
+def needs_chunked_planning(text_input: str) -> bool:
+    """
+    Whether the input is long enough to be planned in parallel chunks.
+    """
+    return len(text_input) > config.PLAN_CHUNK_THRESHOLD_CHARS
+
+def _compact_input(text_input: str) -> str:
+    """
+    Normalises and dedupes the input before it goes into a prompt.
+    """
+    with metrics.timed("compaction"):
+        compacted = compact_text(text_input)
+    if len(compacted) < len(text_input):
+        logger.info(
+            f"Compacted input from ~{estimate_tokens(text_input)} to ~{estimate_tokens(compacted)} tokens"
+        )
+    return compacted
+
+async def generate_slide_plan(text_input: str, guidance: str | None, api_key: str) -> dict:
+    client = get_llm_client(api_key)
+    text_input = _compact_input(text_input)
+
+    # Same input, guidance, provider, model and prompt version: reuse the plan, skip the LLM
+    cache_key = plan_cache.make_key(text_input, guidance, client.provider, client.model)
+    with metrics.timed("plan_cache"):
+        cached_plan = await plan_cache.get_plan(cache_key)
+    if cached_plan:
+        return cached_plan
+
+    if needs_chunked_planning(text_input):
+        plan = await generate_chunked_slide_plan(text_input, guidance, api_key)
+    else:
+        with metrics.timed("prompt_build"):
+            prompt = build_planning_prompt(text_input, guidance)
+        max_tokens = plan_output_budget(text_input)
+        plan = (await _generate_with_retries(client, prompt, api_key, SlidePlan, max_tokens)).model_dump()
+
+    await plan_cache.put_plan(cache_key, plan)
+    return plan
+
+# Provider statuses worth retrying (None: the provider could not be reached)
+_RETRYABLE_STATUSES = {None, 408, 429, 500, 502, 503, 504}
+
+def _backoff_delay(error: ProviderError, retry: int) -> float:
+    """
+    Full-jitter exponential backoff, but never shorter than the provider's Retry-After.
+    """
+    delay = random.uniform(0, min(config.LLM_BACKOFF_MAX_SECONDS, config.LLM_BACKOFF_BASE_SECONDS * 2 ** retry))
+    if error.retry_after is not None:
+        delay = max(delay, error.retry_after)
+    return delay
+
+async def _generate_with_retries(client, prompt: str, api_key: str, plan_model, max_tokens: int = None):
+    """
+    Generates and validates a plan, with two independent retry budgets:
+    - invalid output (bad JSON, schema errors) is sent back to the model with
+      its validation errors for repair, up to 2 times, without waiting;
+    - provider errors (429/5xx, connection failures) are retried after a
+      jittered backoff that honours Retry-After, up to LLM_PROVIDER_MAX_RETRIES
+      times. Other provider errors (e.g. 401) fail right away.
+    `max_tokens` is the output budget for the full prompt; repairs are sized
+    from the output being repaired.
+    """
+    max_repairs = 2
+    repairs = 0
+    provider_retries = 0
+    call = 0
+    current_prompt = prompt
+    current_max_tokens = max_tokens
     
-    for attempt in range(max_retries + 1):
+    while True:
+        call += 1
         try:
-            logger.info(f"Generating plan (Attempt {attempt + 1}/{max_retries + 1})...")
-            
-            client = get_llm_client(api_key)
-            raw_response = await client.generate(prompt, api_key)
-            
-            cleaned_response = raw_response.strip()
-            if cleaned_response.startswith("```json"):
-                cleaned_response = cleaned_response[7:]
-            if cleaned_response.endswith("```"):
-                cleaned_response = cleaned_response[:-3]
+            logger.info(f"Generating plan (Attempt {call})...")
             
-            try:
-                data = json.loads(cleaned_response)
-            except json.JSONDecodeError:
-                raise ValueError("Invalid JSON output from LLM")
-            
-            plan = SlidePlan(**data)
+            plan = await _hedged_attempt(client, current_prompt, api_key, plan_model, call, current_max_tokens)
             
             logger.info(f"Plan validation successful. {len(plan.slides)} slides generated.")
-            return plan.model_dump()
+            return plan
             
-        except ValueError as e:
+        except PlanValidationError as e:
             logger.warning(f"Validation failed: {e}")
-            last_error = e
+            if repairs >= max_repairs:
+                logger.error("All generation attempts failed.")
+                raise ValueError(f"Failed to generate valid plan after retries: {e}")
+            repairs += 1
+            metrics.LLM_RETRIES.inc(client.provider, client.model, "validation")
+            # A failed repair is not repaired again: start over from the full prompt
+            if current_prompt is prompt:
+                current_prompt = build_repair_prompt(e.raw_response, e.errors)
+                current_max_tokens = repair_output_budget(e.raw_response)
+            else:
+                current_prompt = prompt
+                current_max_tokens = max_tokens
+            
+        except ProviderError as e:
+            if e.status_code not in _RETRYABLE_STATUSES or provider_retries >= config.LLM_PROVIDER_MAX_RETRIES:
+                logger.error(f"Provider call failed: {e}")
+                raise ValueError(f"Failed to generate valid plan after retries: {e}")
+            delay = _backoff_delay(e, provider_retries)
+            if delay > config.LLM_RETRY_AFTER_MAX_SECONDS:
+                logger.error(f"Provider asked to retry after {delay:.0f}s, giving up")
+                raise ValueError(f"Failed to generate valid plan after retries: {e}")
+            provider_retries += 1
+            metrics.LLM_RETRIES.inc(client.provider, client.model, "provider")
+            logger.warning(f"{e}, retrying in {delay:.1f}s")
+            with metrics.timed("backoff"):
+                await asyncio.sleep(delay)
+            
         except Exception as e:
             logger.error(f"Unexpected error: {e}")
-            last_error = e
-            
-    logger.error("All generation attempts failed.")
-    raise ValueError(f"Failed to generate valid plan after retries: {last_error}")
+            raise ValueError(f"Failed to generate valid plan after retries: {e}")
+
+async def _hedged_attempt(client, prompt: str, api_key: str, plan_model, call: int, max_tokens: int = None):
+    """
+    One attempt: generate and validate a plan. If the call is slow, an identical
+    hedge request is raced against it (see hedging.hedged); the first valid plan wins.
+    """
+    async def generate_and_validate(is_hedge: bool):
+        stage = f"llm_attempt_{call}" + ("_hedge" if is_hedge else "")
+        raw_response = await _timed_generate(client, prompt, api_key, stage, max_tokens)
+        with metrics.timed("validation"):
+            return parse_plan_response(raw_response, plan_model)
+
+    def on_hedge(result: str):
+        metrics.LLM_HEDGES.inc(client.provider, client.model, result)
+
+    return await hedging.hedged(generate_and_validate, client.provider, on_hedge)
+
+async def _timed_generate(client, prompt: str, api_key: str, stage: str, max_tokens: int = None) -> str:
+    """
+    One LLM call, recorded as `stage` and in the LLM latency metrics.
+    """
+    start = time.perf_counter()
+    try:
+        raw_response = await client.generate(prompt, api_key, max_tokens)
+    except asyncio.CancelledError:
+        # Lost a hedge race
+        metrics.record_llm_call(client.provider, client.model, time.perf_counter() - start, "cancelled")
+        raise
+    except Exception:
+        elapsed = time.perf_counter() - start
+        metrics.record_llm_call(client.provider, client.model, elapsed, "error")
+        metrics.record_stage(stage, elapsed)
+        raise
+    elapsed = time.perf_counter() - start
+    hedging.record_latency(client.provider, elapsed)
+    metrics.record_llm_call(client.provider, client.model, elapsed, "ok", len(raw_response.encode("utf-8")))
+    metrics.record_stage(stage, elapsed)
+    return raw_response
+
+async def generate_chunked_slide_plan(text_input: str, guidance: str | None, api_key: str) -> dict:
+    """
+    Map-reduce planning for long documents.
+    Splits the input along section boundaries, plans each chunk concurrently
+    (bounded by PLAN_CHUNK_CONCURRENCY) and merges the partial plans in order.
+    """
+    chunks = chunk_text(text_input, config.PLAN_CHUNK_MAX_CHARS)
+    logger.info(f"Planning long input in {len(chunks)} chunks")
+
+    client = get_llm_client(api_key)
+    semaphore = asyncio.Semaphore(config.PLAN_CHUNK_CONCURRENCY)
+
+    # Each chunk must contribute enough slides for the merged plan to reach
+    # SlidePlan's minimum of 3 (e.g. 2 per chunk when there are only 2 chunks)
+    min_slides = math.ceil(3 / len(chunks))
+    plan_model = partial_plan_model(min_slides)
+
+    async def plan_chunk(index: int, chunk: str):
+        with metrics.timed("prompt_build"):
+            prompt = build_chunk_planning_prompt(chunk, guidance, index + 1, len(chunks), min_slides)
+        async with semaphore:
+            logger.info(f"Planning chunk {index + 1}/{len(chunks)}")
+            return await _generate_with_retries(
+                client, prompt, api_key, plan_model, plan_output_budget(chunk, min_slides=min_slides)
+            )
+
+    partial_plans = await asyncio.gather(*(plan_chunk(i, c) for i, c in enumerate(chunks)))
+    return merge_partial_plans(partial_plans, guidance)
+
+def merge_partial_plans(partial_plans, guidance: str | None) -> dict:
+    """
+    Concatenates partial plans in document order into one validated SlidePlan
+    with a single consistent meta block.
+    """
+    slides = [slide for partial in partial_plans for slide in partial.slides]
+
+    duration = 0.0
+    tones = Counter()
+    for partial in partial_plans:
+        meta = partial.meta or {}
+        try:
+            duration += float(meta.get("estimated_duration_minutes") or 0)
+        except (TypeError, ValueError):
+            pass
+        if meta.get("tone"):
+            tones[str(meta["tone"])] += 1
+
+    tone = tones.most_common(1)[0][0] if tones else (guidance or "Professional")
+    plan = SlidePlan(
+        slides=slides,
+        meta={
+            # Fall back to ~1 minute per slide if the parts gave no estimate
+            "estimated_duration_minutes": duration or float(len(slides)),
+            "slide_count": len(slides),
+            "tone": tone
+        }
+    )
+    logger.info(f"Merged {len(partial_plans)} partial plans into {len(slides)} slides")
+    return plan.model_dump()
+
+class StreamedPlan:
+    """
+    Streams a slide plan from the LLM in a single attempt.
+
+    Iterating yields each validated slide as soon as its JSON object closes,
+    so callers can start building it while later slides are still generated.
+    Once iteration finishes, `plan` holds the full validated plan.
+    Raises ValueError if a slide or the final plan fails validation; there are
+    no retries here since slides may already have been consumed.
+    """
+
+    def __init__(self, text_input: str, guidance: str | None, api_key: str):
+        self.text_input = _compact_input(text_input)
+        self.guidance = guidance
+        self.api_key = api_key
+        self.plan = None
+
+    def __aiter__(self):
+        return self._stream()
+
+    async def _stream(self):
+        client = get_llm_client(self.api_key)
+
+        cache_key = plan_cache.make_key(self.text_input, self.guidance, client.provider, client.model)
+        with metrics.timed("plan_cache"):
+            cached_plan = await plan_cache.get_plan(cache_key)
+        if cached_plan:
+            for slide_data in cached_plan["slides"]:
+                yield slide_data
+            self.plan = cached_plan
+            return
+
+        with metrics.timed("prompt_build"):
+            prompt = build_planning_prompt(self.text_input, self.guidance)
+        parser = SlideStreamParser()
+        streamed_count = 0
+
+        # Time spent waiting on the stream (building slides in between is timed separately)
+        llm_seconds = 0.0
+        outcome = "error"
+        logger.info("Streaming plan...")
+        chunks = client.stream(prompt, self.api_key, plan_output_budget(self.text_input)).__aiter__()
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    chunk = await chunks.__anext__()
+                except StopAsyncIteration:
+                    outcome = "ok"
+                    break
+                finally:
+                    llm_seconds += time.perf_counter() - start
+                for slide_data in parser.feed(chunk):
+                    slide = Slide(**slide_data)
+                    streamed_count += 1
+                    logger.debug(f"Streamed slide {streamed_count}")
+                    yield slide.model_dump()
+        finally:
+            metrics.record_llm_call(
+                client.provider, client.model, llm_seconds, outcome,
+                len(parser.text.encode("utf-8")) if outcome == "ok" else None
+            )
+            metrics.record_stage("llm_stream", llm_seconds)
+            # If the consumer stopped early or a slide failed validation, close the
+            # provider stream now so its HTTP response is released, not at GC time
+            await chunks.aclose()
+
+        with metrics.timed("validation"):
+            plan = parse_plan_response(parser.text)
+        if len(plan.slides) != streamed_count:
+            raise ValueError("Streamed slides do not match the final plan")
+
+        logger.info(f"Plan validation successful. {streamed_count} slides streamed.")
+        self.plan = plan.model_dump()
+        await plan_cache.put_plan(cache_key, self.plan)
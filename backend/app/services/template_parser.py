@@ -1,8 +1,9 @@
-from pptx import Presentation
-import io
+from pptx.enum.shapes import PP_PLACEHOLDER
 import logging
 from typing import Dict, Any
 from app.services.ppt.image_extractor import extract_images_from_template, categorize_images
+from app.services.ppt.template_loader import load_template
+from app.services.metrics import timed
 
 # Configure logger
 logger = logging.getLogger("TemplateParser")
@@ -19,70 +20,65 @@ if not logger.handlers:
 logger.propagate = False
 
 
-def analyze_presentation(file_content: bytes) -> dict:
+def analyze_presentation(template) -> dict:
     """
     Analyzes a PPTX file and extracts comprehensive metadata including:
     - Layout information
     - Theme colors and fonts
     - Images catalog
+    Layouts and theme come from the package scan, which reads only the
+    masters, layouts and theme, so their cost does not grow with slide content.
+    Accepts raw PPTX bytes or a ParsedTemplate (preferred, avoids re-parsing).
     Returns a dictionary with all extracted information.
     """
     try:
-        prs = Presentation(io.BytesIO(file_content))
+        parsed = load_template(template)
     except Exception as e:
         logger.error(f"Failed to load presentation: {e}")
         return {"error": "Invalid PPTX file"}
 
+    try:
+        with timed("package_scan"):
+            scan = parsed.package_scan
+    except Exception as e:
+        logger.error(f"Failed to scan presentation package: {e}")
+        return {"error": "Invalid PPTX file"}
+
     metadata = {
-        "layout_count": len(prs.slide_layouts),
+        "layout_count": len(scan["layouts"]),
         "layouts": [],
         "theme": {
-            "colors": {},
-            "fonts": {}
+            "colors": extract_theme_colors(scan["theme"]),
+            "fonts": extract_theme_fonts(scan["theme"])
         },
         "image_placeholders": [],
         "images": []
     }
 
     # Extract layout information
-    for index, layout in enumerate(prs.slide_layouts):
+    for layout in scan["layouts"]:
         layout_data = {
-            "index": index,
-            "name": layout.name,
+            "index": layout["index"],
+            "name": layout["name"],
             "placeholders": []
         }
         
-        for shape in layout.placeholders:
-            ph_type = str(shape.placeholder_format.type)
+        for xml_type in layout["placeholders"]:
+            ph_type = str(PP_PLACEHOLDER.from_xml(xml_type))
             layout_data["placeholders"].append(ph_type)
             
             if 'PICTURE' in ph_type or 'BITMAP' in ph_type: 
                 metadata["image_placeholders"].append({
-                    "layout_index": index,
+                    "layout_index": layout["index"],
                     "placeholder_type": ph_type
                 })
 
         metadata["layouts"].append(layout_data)
 
-    # Extract theme colors
-    try:
-        theme_colors = extract_theme_colors(prs)
-        metadata["theme"]["colors"] = theme_colors
-    except Exception as e:
-        logger.warning(f"Could not extract theme colors: {e}")
-        metadata["theme"]["colors"] = {"note": "Color extraction failed"}
-
-    # Extract theme fonts
-    try:
-        theme_fonts = extract_theme_fonts(prs)
-        metadata["theme"]["fonts"] = theme_fonts
-    except Exception as e:
-        logger.warning(f"Could not extract theme fonts: {e}")
-        metadata["theme"]["fonts"] = {"note": "Font extraction failed"}
-
     # Extract images from template
     try:
-        images_data = extract_images_from_template(file_content)
+        with timed("image_extraction"):
+            images_data = extract_images_from_template(parsed, scan["media"])
         if images_data.get("images"):
             categorized = categorize_images(images_data["images"])
             metadata["images"] = {
@@ -103,81 +99,44 @@ def analyze_presentation(file_content: bytes) -> dict:
     return metadata
 
 
-def extract_theme_colors(prs: Presentation) -> Dict[str, Any]:
+def extract_theme_colors(theme: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Extracts theme colors from the presentation.
-    Returns a dictionary of color names and their RGB values.
+    Theme colors from the theme's color scheme (clrScheme).
+    Returns the scheme by slot name plus its distinct colors, accents first.
     """
-    colors = {}
-    
-    try:
-        # Access the theme part
-        theme = prs.part.package.part_related_by(
-            'http://schemas.openxmlformats.org/officeDocument/2006/relationships/theme'
-        )
-        
-        # Parse theme XML for color scheme
-        theme_xml = theme.blob
-        # Note: Full XML parsing would be complex, so we'll extract basic info
-        
-        # For now, extract colors from actual slides as a fallback
-        color_samples = []
-        for slide in prs.slides:
-            for shape in slide.shapes:
-                try:
-                    if hasattr(shape, 'fill') and shape.fill.type == 1:  # SOLID fill
-                        if hasattr(shape.fill, 'fore_color'):
-                            rgb = shape.fill.fore_color.rgb
-                            if rgb:
-                                color_samples.append({
-                                    "rgb": f"#{rgb[0]:02x}{rgb[1]:02x}{rgb[2]:02x}"
-                                })
-                except:
-                    continue
-        
-        # Get unique colors (limit to first 10)
-        unique_colors = []
-        seen = set()
-        for color in color_samples:
-            rgb = color["rgb"]
-            if rgb not in seen and len(unique_colors) < 10:
-                unique_colors.append(color)
-                seen.add(rgb)
-        
-        colors["extracted_colors"] = unique_colors
-        colors["count"] = len(unique_colors)
-        
-    except Exception as e:
-        logger.debug(f"Theme color extraction error: {e}")
-        colors["note"] = "Using fallback color extraction"
-    
-    return colors
+    scheme = theme.get("colors", {})
+    ordered = [name for name in scheme if name.startswith("accent")]
+    ordered += [name for name in scheme if not name.startswith("accent")]
+
+    unique_colors = []
+    seen = set()
+    for name in ordered:
+        rgb = scheme[name]
+        if rgb not in seen:
+            unique_colors.append({"name": name, "rgb": rgb})
+            seen.add(rgb)
+
+    return {
+        "scheme": scheme,
+        "extracted_colors": unique_colors,
+        "count": len(unique_colors)
+    }
 
 
-def extract_theme_fonts(prs: Presentation) -> Dict[str, Any]:
+def extract_theme_fonts(theme: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Extracts theme fonts from the presentation.
-    Returns a dictionary of font information.
+    Theme fonts from the theme's font scheme (fontScheme): major is used for
+    headings, minor for body text.
     """
-    fonts = {}
-    
-    try:
-        # Extract fonts from actual text in slides
-        font_samples = set()
-        for slide in prs.slides:
-            for shape in slide.shapes:
-                if hasattr(shape, 'text_frame'):
-                    for paragraph in shape.text_frame.paragraphs:
-                        for run in paragraph.runs:
-                            if run.font.name:
-                                font_samples.add(run.font.name)
-        
-        fonts["detected_fonts"] = list(font_samples)[:5]  # Limit to 5 most common
-        fonts["count"] = len(font_samples)
-        
-    except Exception as e:
-        logger.debug(f"Font extraction error: {e}")
-        fonts["note"] = "Font extraction failed"
-    
-    return fonts
-
+    scheme = theme.get("fonts", {})
+    detected = []
+    for key in ("major", "minor"):
+        if scheme.get(key) and scheme[key] not in detected:
+            detected.append(scheme[key])
+
+    return {
+        "major": scheme.get("major"),
+        "minor": scheme.get("minor"),
+        "detected_fonts": detected,
+        "count": len(detected)
+    }
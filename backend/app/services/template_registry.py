@@ -0,0 +1,302 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from app import config
+from app.services.template_parser import analyze_presentation
+from app.services.ppt.image_extractor import ImageRef
+from app.services.ppt.layout_mapper import LayoutIndex, get_layout_index
+from app.services.ppt.template_loader import ParsedTemplate
+from app.services.private_dirs import UnsafeDirectoryError, ensure_private_dir
+from app.services.uploads import map_template_file
+
+logger = logging.getLogger("TemplateRegistry")
+logger.setLevel(logging.INFO)
+
+# Templates registered once and then referenced by id from /generate.
+# Each template is stored under TEMPLATE_REGISTRY_DIR/<sha256 of its bytes>/
+# together with its precompiled artifacts: the analyze_presentation metadata
+# (layouts, theme, image catalogue with image part names, sizes and hashes)
+# and the layout index, stored as one JSON file that loads in milliseconds.
+# Loading a registered template therefore only parses the PPTX package; the
+# most recently used ones stay parsed in memory. The artifacts are plain data
+# (never pickled), and the registry directory must belong to this user with
+# owner-only permissions, so files planted there cannot run code or be served.
+
+_TEMPLATE_FILE = "template.pptx"
+_ARTIFACTS_FILE = "artifacts.json"
+# Bump whenever the artifacts change shape; older ones are rebuilt on load
+_ARTIFACTS_VERSION = 3
+# Key marking a serialised ImageRef in the artifacts JSON
+_IMAGE_REF_KEY = "__image_ref__"
+
+_TEMPLATE_ID_RE = re.compile(r"^[0-9a-f]{64}$")
+
+_cache: "OrderedDict[str, RegisteredTemplate]" = OrderedDict()
+_cache_lock = threading.Lock()
+_register_lock = threading.Lock()
+
+
+class RegistryFullError(Exception):
+    pass
+
+
+class RegistryUnsafeError(UnsafeDirectoryError):
+    """
+    The registry directory could be tampered with by another user.
+    """
+
+
+class RegisteredTemplate:
+    """
+    A registered template, parsed, with its precompiled artifacts attached.
+    """
+
+    def __init__(self, template_id: str, parsed: ParsedTemplate, metadata: dict, summary: dict):
+        self.template_id = template_id
+        self.parsed = parsed
+        self.metadata = metadata
+        self.summary = summary
+
+
+def is_valid_id(template_id: str) -> bool:
+    return bool(template_id) and bool(_TEMPLATE_ID_RE.match(template_id))
+
+
+def template_path(template_id: str) -> str:
+    return os.path.join(config.TEMPLATE_REGISTRY_DIR, template_id, _TEMPLATE_FILE)
+
+
+def template_id_for_path(path: str) -> Optional[str]:
+    """
+    Id of the registered template stored at `path`, or None for any other file.
+    """
+    directory, filename = os.path.split(os.path.abspath(path))
+    template_id = os.path.basename(directory)
+    if filename != _TEMPLATE_FILE or not is_valid_id(template_id):
+        return None
+    if os.path.dirname(directory) != os.path.abspath(config.TEMPLATE_REGISTRY_DIR):
+        return None
+    return template_id
+
+
+def _artifacts_path(template_id: str) -> str:
+    return os.path.join(config.TEMPLATE_REGISTRY_DIR, template_id, _ARTIFACTS_FILE)
+
+
+def _compile(template_id: str, parsed: ParsedTemplate, size: int) -> dict:
+    """
+    Builds the artifacts of a parsed template. Raises ValueError if it cannot be analyzed.
+    """
+    metadata = analyze_presentation(parsed)
+    if metadata.get("error"):
+        raise ValueError(metadata["error"])
+    layout_index = get_layout_index(parsed)
+    images = metadata.get("images") or {}
+    summary = {
+        "template_id": template_id,
+        "size_bytes": size,
+        "layout_count": metadata.get("layout_count", 0),
+        "slide_count": len(layout_index.slides),
+        "title_slides": len(layout_index.title_slides),
+        "content_slides": len(layout_index.content_slides),
+        "image_count": images.get("total", 0) if isinstance(images, dict) else 0,
+        "registered_at": time.time(),
+    }
+    return {
+        "version": _ARTIFACTS_VERSION,
+        "summary": summary,
+        "metadata": metadata,
+        "layout_index": layout_index,
+    }
+
+
+def _check_root(create: bool = False):
+    """
+    Refuses a registry directory that another user could tamper with, since
+    anything planted in it would be loaded (see private_dirs).
+    """
+    try:
+        ensure_private_dir(config.TEMPLATE_REGISTRY_DIR, create=create)
+    except UnsafeDirectoryError as e:
+        raise RegistryUnsafeError(f"Refusing template registry: {e}")
+
+
+def _encode(value):
+    if isinstance(value, ImageRef):
+        return {_IMAGE_REF_KEY: value.to_dict()}
+    if isinstance(value, LayoutIndex):
+        return value.to_dict()
+    raise TypeError(f"Cannot store {type(value).__name__} in template artifacts")
+
+
+def _decode(value: dict):
+    if _IMAGE_REF_KEY in value:
+        return ImageRef.from_dict(value[_IMAGE_REF_KEY])
+    return value
+
+
+def _write_artifacts(path: str, artifacts: dict):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(artifacts, f, default=_encode, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def _count_templates() -> int:
+    try:
+        return sum(1 for name in os.listdir(config.TEMPLATE_REGISTRY_DIR) if is_valid_id(name))
+    except FileNotFoundError:
+        return 0
+
+
+def register_template(template_bytes) -> tuple:
+    """
+    Stores a template (bytes or a memory map) and its artifacts under the hash of its bytes.
+    Returns (summary, created); registering the same file again is a no-op.
+    Raises ValueError for an invalid template and RegistryFullError when
+    TEMPLATE_REGISTRY_MAX_TEMPLATES are already registered.
+    """
+    template_id = hashlib.sha256(template_bytes).hexdigest()
+    existing = get_summary(template_id)
+    if existing is not None:
+        return existing, False
+
+    parsed = ParsedTemplate.from_bytes(template_bytes)
+    artifacts = _compile(template_id, parsed, len(template_bytes))
+
+    root = config.TEMPLATE_REGISTRY_DIR
+    _check_root(create=True)
+    # Serialised per process so the limit is not overshot by concurrent registrations
+    with _register_lock:
+        if _count_templates() >= config.TEMPLATE_REGISTRY_MAX_TEMPLATES:
+            raise RegistryFullError(f"At most {config.TEMPLATE_REGISTRY_MAX_TEMPLATES} templates can be registered")
+
+        # Written to a scratch directory and renamed, so a template is never seen half-written
+        staging = tempfile.mkdtemp(prefix=".staging-", dir=root)
+        try:
+            with open(os.path.join(staging, _TEMPLATE_FILE), "wb") as f:
+                f.write(template_bytes)
+            _write_artifacts(os.path.join(staging, _ARTIFACTS_FILE), artifacts)
+            try:
+                os.rename(staging, os.path.join(root, template_id))
+            except OSError:
+                # Registered concurrently by another process
+                return get_summary(template_id) or artifacts["summary"], False
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    _remember(RegisteredTemplate(template_id, parsed, artifacts["metadata"], artifacts["summary"]))
+    logger.info(f"Registered template {template_id} ({len(template_bytes)} bytes)")
+    return artifacts["summary"], True
+
+
+def _read_artifacts(template_id: str) -> Optional[dict]:
+    """
+    The stored artifacts, with ImageRefs and the LayoutIndex restored, or None
+    if they are missing or unreadable (they are then rebuilt).
+    """
+    _check_root()
+    try:
+        with open(_artifacts_path(template_id), encoding="utf-8") as f:
+            artifacts = json.load(f, object_hook=_decode)
+    except FileNotFoundError:
+        return None
+    except ValueError as e:
+        logger.warning(f"Unreadable artifacts of template {template_id}: {e}")
+        return None
+    if artifacts.get("version") == _ARTIFACTS_VERSION:
+        artifacts["layout_index"] = LayoutIndex.from_dict(artifacts["layout_index"])
+    return artifacts
+
+
+def get_summary(template_id: str) -> Optional[dict]:
+    """
+    Summary of a registered template (layout, slide and image counts), or None.
+    """
+    if not is_valid_id(template_id):
+        return None
+    with _cache_lock:
+        cached = _cache.get(template_id)
+    if cached is not None:
+        return cached.summary
+    artifacts = _read_artifacts(template_id)
+    if artifacts is None:
+        # Missing or unreadable artifacts are rebuilt when the template is loaded
+        loaded = get_template(template_id)
+        return loaded.summary if loaded else None
+    return artifacts["summary"]
+
+
+def get_metadata(template_id: str) -> Optional[dict]:
+    """
+    analyze_presentation output of a registered template, without parsing it.
+    """
+    if not is_valid_id(template_id):
+        return None
+    with _cache_lock:
+        cached = _cache.get(template_id)
+    if cached is not None:
+        return cached.metadata
+    artifacts = _read_artifacts(template_id)
+    if artifacts is None or artifacts.get("version") != _ARTIFACTS_VERSION:
+        loaded = get_template(template_id)
+        return loaded.metadata if loaded else None
+    return artifacts["metadata"]
+
+
+def _load(template_id: str) -> Optional[RegisteredTemplate]:
+    _check_root()
+    try:
+        template_bytes = map_template_file(template_path(template_id))
+    except FileNotFoundError:
+        return None
+
+    artifacts = _read_artifacts(template_id)
+    stale = artifacts is None or artifacts.get("version") != _ARTIFACTS_VERSION
+    # The bytes are only kept for analysis when the artifacts have to be rebuilt
+    parsed = ParsedTemplate.from_bytes(template_bytes, keep_source=stale)
+    if stale:
+        logger.info(f"Rebuilding artifacts of template {template_id}")
+        artifacts = _compile(template_id, parsed, len(template_bytes))
+        _write_artifacts(_artifacts_path(template_id), artifacts)
+    else:
+        # Precompiled index: get_layout_index finds it instead of building one
+        parsed._layout_index = artifacts["layout_index"]
+    return RegisteredTemplate(template_id, parsed, artifacts["metadata"], artifacts["summary"])
+
+
+def _remember(template: RegisteredTemplate):
+    with _cache_lock:
+        _cache[template.template_id] = template
+        _cache.move_to_end(template.template_id)
+        while len(_cache) > config.TEMPLATE_REGISTRY_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def get_template(template_id: str) -> Optional[RegisteredTemplate]:
+    """
+    A registered template ready for export, or None if the id is unknown.
+    Kept parsed in memory while it is among the TEMPLATE_REGISTRY_CACHE_SIZE most recently used.
+    """
+    if not is_valid_id(template_id):
+        return None
+    with _cache_lock:
+        cached = _cache.get(template_id)
+        if cached is not None:
+            _cache.move_to_end(template_id)
+            return cached
+
+    # Loaded outside the lock; a concurrent load of the same template is harmless
+    loaded = _load(template_id)
+    if loaded is not None:
+        _remember(loaded)
+        logger.info(f"Loaded registered template {template_id}")
+    return loaded
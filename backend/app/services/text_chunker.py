@@ -0,0 +1,71 @@
+import re
+from typing import List
+
+# Lines that start a new section: markdown headings, numbered headings
+# ("1.", "2.3 Title"), or short ALL-CAPS lines
+_HEADING_RE = re.compile(
+    r"^\s*(#{1,6}\s+\S.*|\d+(\.\d+)*\.?\s+[A-Z].{0,80}|[A-Z][A-Z0-9 ,:&/\-]{2,80})\s*$"
+)
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def split_into_sections(text: str) -> List[str]:
+    """
+    Splits text into sections at heading-like lines.
+    Text before the first heading becomes its own section.
+    """
+    sections = []
+    current = []
+    for line in text.splitlines():
+        if _HEADING_RE.match(line) and any(l.strip() for l in current):
+            sections.append("\n".join(current).strip())
+            current = []
+        current.append(line)
+    if any(l.strip() for l in current):
+        sections.append("\n".join(current).strip())
+    return sections
+
+
+def _split_oversized(section: str, max_chars: int) -> List[str]:
+    """
+    Splits a section longer than max_chars at paragraph, then sentence boundaries.
+    """
+    pieces = []
+    for paragraph in re.split(r"\n\s*\n", section):
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+            continue
+        pieces.extend(_SENTENCE_RE.split(paragraph))
+
+    parts = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + len(piece) + 2 > max_chars:
+            parts.append(current)
+            current = ""
+        # A single sentence longer than max_chars is hard-cut
+        while len(piece) > max_chars:
+            parts.append(piece[:max_chars])
+            piece = piece[max_chars:]
+        current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        parts.append(current)
+    return parts
+
+
+def chunk_text(text: str, max_chars: int) -> List[str]:
+    """
+    Splits text into chunks of at most max_chars, along section boundaries.
+    Consecutive small sections are packed into the same chunk.
+    """
+    chunks = []
+    current = ""
+    for section in split_into_sections(text):
+        for part in ([section] if len(section) <= max_chars else _split_oversized(section, max_chars)):
+            if current and len(current) + len(part) + 2 > max_chars:
+                chunks.append(current)
+                current = ""
+            current = f"{current}\n\n{part}" if current else part
+    if current:
+        chunks.append(current)
+    return chunks
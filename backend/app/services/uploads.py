@@ -0,0 +1,96 @@
+import io
+import logging
+import mmap
+import zipfile
+from xml.etree import ElementTree
+from starlette.formparsers import MultiPartParser
+from app import config
+
+logger = logging.getLogger("Uploads")
+logger.setLevel(logging.INFO)
+
+# Uploaded templates are never read into one bytes object. The multipart
+# parser spools each file to disk above UPLOAD_SPOOL_BYTES; the upload is then
+# checked from its ZIP central directory and [Content_Types].xml alone, and
+# handed to parsing as a read-only memory map of the spooled file.
+
+_CONTENT_TYPES = "[Content_Types].xml"
+_CONTENT_TYPES_MAX_BYTES = 1024 * 1024
+_CT = "{http://schemas.openxmlformats.org/package/2006/content-types}"
+# Content types of the main part of a presentation, template or slide show
+_PRESENTATION_CONTENT_TYPES = {
+    "application/vnd.openxmlformats-officedocument.presentationml.presentation.main+xml",
+    "application/vnd.openxmlformats-officedocument.presentationml.template.main+xml",
+    "application/vnd.openxmlformats-officedocument.presentationml.slideshow.main+xml",
+    "application/vnd.ms-powerpoint.presentation.macroEnabled.main+xml",
+    "application/vnd.ms-powerpoint.template.macroEnabled.main+xml",
+    "application/vnd.ms-powerpoint.slideshow.macroEnabled.main+xml",
+}
+
+
+def configure_upload_spooling():
+    """
+    Makes form file parts spill to disk above UPLOAD_SPOOL_BYTES.
+    Called once on application startup.
+    """
+    MultiPartParser.spool_max_size = config.UPLOAD_SPOOL_BYTES
+
+
+def validate_template_file(fileobj):
+    """
+    Checks that a file is a PPTX package without parsing it: the ZIP central
+    directory must be readable and [Content_Types].xml must declare a
+    presentation part that exists. Raises ValueError otherwise.
+    """
+    fileobj.seek(0)
+    try:
+        with zipfile.ZipFile(fileobj) as zf:
+            try:
+                info = zf.getinfo(_CONTENT_TYPES)
+            except KeyError:
+                raise ValueError(f"Missing {_CONTENT_TYPES}")
+            if info.file_size > _CONTENT_TYPES_MAX_BYTES:
+                raise ValueError(f"{_CONTENT_TYPES} is too large ({info.file_size} bytes)")
+            content_types = ElementTree.fromstring(zf.read(info))
+
+            members = set(zf.namelist())
+            for override in content_types.iter(_CT + "Override"):
+                if (override.get("ContentType") in _PRESENTATION_CONTENT_TYPES
+                        and override.get("PartName", "").lstrip("/") in members):
+                    return
+    except (zipfile.BadZipFile, ElementTree.ParseError, OSError, EOFError) as e:
+        raise ValueError(f"Not a PPTX package: {e}")
+    finally:
+        fileobj.seek(0)
+    raise ValueError("No presentation part declared in the package")
+
+
+def map_upload(fileobj):
+    """
+    Returns the contents of a spooled upload for parsing: its bytes while it
+    is still small enough to be held in memory, otherwise a read-only memory
+    map of the spooled file.
+    """
+    fileobj.seek(0, io.SEEK_END)
+    size = fileobj.tell()
+    fileobj.seek(0)
+    if size <= config.UPLOAD_SPOOL_BYTES:
+        return fileobj.read()
+    return mmap.mmap(fileobj.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def open_upload(fileobj):
+    """
+    Validates an uploaded template (see validate_template_file) and returns it
+    as map_upload does. Raises ValueError for anything that is not a PPTX package.
+    """
+    validate_template_file(fileobj)
+    return map_upload(fileobj)
+
+
+def map_template_file(path: str) -> mmap.mmap:
+    """
+    Read-only memory map of a stored template. Raises ValueError if it is empty.
+    """
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
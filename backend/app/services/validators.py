@@ -1,3 +1,4 @@
+from functools import lru_cache
 from pydantic import BaseModel, Field, field_validator
 from typing import List, Optional
 
@@ -27,3 +28,19 @@ class SlidePlan(BaseModel):
         if len(v) < 3:
             raise ValueError('Plan must have at least 3 slides')
         return v
+
+class PartialSlidePlan(BaseModel):
+    """
+    Plan for one part of a long document; merged into a full SlidePlan afterwards.
+    """
+    slides: List[Slide] = Field(..., min_length=1)
+    meta: Optional[dict] = None
+
+@lru_cache(maxsize=None)
+def partial_plan_model(min_slides: int):
+    """
+    PartialSlidePlan that requires at least `min_slides` slides.
+    """
+    class MinSlidesPartialPlan(PartialSlidePlan):
+        slides: List[Slide] = Field(..., min_length=min_slides)
+    return MinSlidesPartialPlan
@@ -0,0 +1,252 @@
+"""
+Micro-benchmarks for the template and export hot path.
+
+Runs offline against synthetic templates and a stubbed LLM client:
+
+    python -m benchmarks.run_benchmarks                    # run and print results
+    python -m benchmarks.run_benchmarks --save-baseline    # store results as the baseline
+    python -m benchmarks.run_benchmarks --compare          # exit 1 if a stage regressed
+
+Run from the backend directory.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from app import config
+from app.services import slide_planner
+from app.services.template_parser import analyze_presentation
+from app.services.ppt.template_loader import ParsedTemplate
+from app.services.ppt.image_extractor import extract_images_from_template
+from app.services.ppt.slide_cloner import clone_slide, get_slide_stamps, index_parts
+from app.services.ppt.slide_builder import update_slide_content
+from app.services.ppt.ppt_exporter import generate_presentation
+from benchmarks.synthetic_templates import build_template
+from benchmarks.stub_llm import StubLLMClient
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Each scenario stresses one axis of the template; `plan_slides` is the generated deck size
+SCENARIOS = {
+    "small": dict(slides=4, shapes_per_slide=4, images=2, image_px=256, layouts=2, plan_slides=10),
+    "many_slides": dict(slides=60, shapes_per_slide=4, images=2, image_px=256, layouts=2, plan_slides=60),
+    "dense_shapes": dict(slides=6, shapes_per_slide=60, images=2, image_px=256, layouts=2, plan_slides=20),
+    "large_images": dict(slides=6, shapes_per_slide=4, images=8, image_px=1600, layouts=2, plan_slides=20),
+    "many_layouts": dict(slides=11, shapes_per_slide=4, images=2, image_px=256, layouts=11, plan_slides=22),
+}
+
+STAGES = [
+    "parse",
+    "analyze_presentation",
+    "extract_images_from_template",
+    "plan",
+    "clone_slide",
+    "update_slide_content",
+    "generate_presentation",
+]
+
+
+def calibrate(rounds: int = 15) -> float:
+    """
+    Time of a fixed pure-Python workload on this machine. Stage times are also
+    stored relative to it, so baselines stay comparable across machines.
+    """
+    payload = {"slides": [{"title": f"t{i}", "bullets": ["x" * 40] * 5} for i in range(200)]}
+
+    def work():
+        for _ in range(20):
+            json.loads(json.dumps(payload))
+        sorted(range(200000, 0, -1))
+
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        work()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run_pipeline(template_bytes: bytes, stub: StubLLMClient, measure) -> None:
+    """
+    Runs every stage once; `measure(stage, fn)` runs and records a stage.
+    """
+    parsed = measure("parse", lambda: ParsedTemplate.from_bytes(template_bytes))
+    metadata = measure("analyze_presentation", lambda: analyze_presentation(parsed))
+    measure("extract_images_from_template", lambda: extract_images_from_template(parsed))
+    plan = measure("plan", lambda: asyncio.run(slide_planner.generate_slide_plan("Benchmark input text.", None, "stub")))
+
+    template_images = metadata["images"]["categorized"]
+    prs = parsed.copy_presentation()
+    stamps = get_slide_stamps(parsed)
+    parts_by_name = index_parts(prs)
+    template_slides = list(prs.slides)
+
+    def clone_all():
+        return [
+            clone_slide(prs, template_slides[i % len(template_slides)], stamps[i % len(stamps)], parts_by_name)
+            for i in range(len(plan["slides"]))
+        ]
+
+    clones = measure("clone_slide", clone_all)
+
+    def update_all():
+        for (slide, placeholders), slide_data in zip(clones, plan["slides"]):
+            update_slide_content(slide, slide_data, template_images, None, placeholders)
+
+    measure("update_slide_content", update_all)
+    measure("generate_presentation", lambda: generate_presentation(parsed, plan, metadata).getbuffer().nbytes)
+
+
+def run_scenario(name: str, repeat: int) -> dict:
+    params = dict(SCENARIOS[name])
+    plan_slides = params.pop("plan_slides")
+    template_bytes = build_template(**params)
+    stub = StubLLMClient(slide_count=plan_slides)
+    slide_planner.get_llm_client = lambda api_key: stub
+
+    # Timings: best of `repeat` runs (the least disturbed by other load), without tracemalloc overhead
+    timings = {stage: [] for stage in STAGES}
+
+    def timed(stage, fn):
+        # Like timeit: collect beforehand and keep the collector out of the measurement
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            result = fn()
+            timings[stage].append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+        return result
+
+    run_pipeline(template_bytes, stub, lambda stage, fn: fn())  # warm-up
+    for _ in range(repeat):
+        run_pipeline(template_bytes, stub, timed)
+
+    # Peak memory: one separate run under tracemalloc
+    peaks = {}
+
+    def traced(stage, fn):
+        # Start from a collected heap too: otherwise garbage left by earlier stages
+        # is freed at whatever point the collector happens to run, which lowers the
+        # peak by an amount that depends on those stages, not on this one
+        gc.collect()
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        result = fn()
+        peaks[stage] = tracemalloc.get_traced_memory()[1] - before
+        return result
+
+    tracemalloc.start()
+    try:
+        run_pipeline(template_bytes, stub, traced)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "template_bytes": len(template_bytes),
+        "stages": {
+            stage: {"seconds": min(timings[stage]), "peak_bytes": peaks[stage]}
+            for stage in STAGES
+        }
+    }
+
+
+def run(scenarios, repeat: int) -> dict:
+    # Planning is measured without the on-disk plan cache
+    config.PLAN_CACHE_ENABLED = False
+    calibration = calibrate()
+    results = {"calibration_seconds": calibration, "scenarios": {}}
+    for name in scenarios:
+        result = run_scenario(name, repeat)
+        for stage in result["stages"].values():
+            stage["relative"] = stage["seconds"] / calibration
+        results["scenarios"][name] = result
+    return results
+
+
+def print_results(results: dict):
+    print(f"calibration: {results['calibration_seconds'] * 1000:.1f} ms")
+    for name, result in results["scenarios"].items():
+        print(f"\n{name} (template {result['template_bytes'] / 1024:.0f} KiB)")
+        print(f"  {'stage':<30} {'time (ms)':>10} {'peak (KiB)':>11}")
+        for stage, values in result["stages"].items():
+            print(f"  {stage:<30} {values['seconds'] * 1000:>10.2f} {values['peak_bytes'] / 1024:>11.0f}")
+
+
+def compare(results: dict, baseline: dict, time_tolerance: float, memory_tolerance: float) -> list:
+    """
+    Returns the stages that got slower (relative to calibration) or used more
+    peak memory than the baseline allows. Slowdowns under 2 ms and peaks
+    under 64 KiB are too noisy to judge and are ignored.
+    """
+    regressions = []
+    for name, result in results["scenarios"].items():
+        base_result = baseline["scenarios"].get(name)
+        if base_result is None:
+            continue
+        for stage, values in result["stages"].items():
+            base = base_result["stages"].get(stage)
+            if base is None:
+                continue
+            if (values["seconds"] - base["seconds"] > 0.002
+                    and values["relative"] > base["relative"] * (1 + time_tolerance)):
+                regressions.append(
+                    f"{name}/{stage}: time {values['relative'] / base['relative'] - 1:+.0%} "
+                    f"({base['seconds'] * 1000:.2f} -> {values['seconds'] * 1000:.2f} ms)"
+                )
+            if (values["peak_bytes"] > 64 * 1024
+                    and values["peak_bytes"] > base["peak_bytes"] * (1 + memory_tolerance)):
+                regressions.append(
+                    f"{name}/{stage}: peak memory {values['peak_bytes'] / max(base['peak_bytes'], 1) - 1:+.0%} "
+                    f"({base['peak_bytes'] / 1024:.0f} -> {values['peak_bytes'] / 1024:.0f} KiB)"
+                )
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark template parsing, cloning and export")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="Scenario to run (repeatable, default: all)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per scenario (the best is kept)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline file")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the baseline")
+    parser.add_argument("--compare", action="store_true", help="Fail if a stage regressed against the baseline")
+    parser.add_argument("--time-tolerance", type=float, default=0.30, help="Allowed relative slowdown")
+    parser.add_argument("--memory-tolerance", type=float, default=0.20, help="Allowed relative peak memory growth")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.WARNING)
+    results = run(args.scenario or list(SCENARIOS), args.repeat)
+    print_results(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+
+    if args.compare:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.time_tolerance, args.memory_tolerance)
+        if regressions:
+            print("\nRegressions against the baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("\nNo regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,30 @@
+import json
+from typing import Optional
+from app.services.llm.base import LLMClient
+
+
+class StubLLMClient(LLMClient):
+    """
+    Offline LLM client returning a fixed, valid slide plan.
+    Lets the planning stage (prompt, parsing, validation) be measured without a network.
+    """
+
+    provider = "stub"
+    model = "stub"
+
+    def __init__(self, slide_count: int = 10, bullets_per_slide: int = 4):
+        plan = {
+            "slides": [
+                {
+                    "title": f"Generated slide {i + 1}",
+                    "bullets": [f"Point {j + 1} of slide {i + 1} with a few more words" for j in range(bullets_per_slide)],
+                    "notes": f"Speaker notes for slide {i + 1}."
+                }
+                for i in range(slide_count)
+            ],
+            "meta": {"estimated_duration_minutes": slide_count * 1.5, "slide_count": slide_count, "tone": "neutral"}
+        }
+        self.response = json.dumps(plan)
+
+    async def generate(self, prompt: str, api_key: str, max_tokens: Optional[int] = None) -> str:
+        return self.response
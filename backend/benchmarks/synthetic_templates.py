@@ -0,0 +1,66 @@
+import io
+import random
+from pptx import Presentation
+from pptx.util import Inches, Pt
+from PIL import Image
+
+# Default template layouts, most useful first: "Title and Content", "Title Slide", then the rest
+_LAYOUT_ORDER = [1, 0, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+
+
+def make_image(width: int, height: int, seed: int) -> bytes:
+    """
+    PNG of random noise, so every image is distinct and does not compress away.
+    """
+    rng = random.Random(seed)
+    image = Image.frombytes("RGB", (width, height), rng.randbytes(width * height * 3))
+    out = io.BytesIO()
+    image.save(out, format="PNG", compress_level=1)
+    return out.getvalue()
+
+
+def build_template(
+    slides: int,
+    shapes_per_slide: int,
+    images: int,
+    image_px: int,
+    layouts: int,
+    seed: int = 0
+) -> bytes:
+    """
+    Builds a synthetic template PPTX.
+
+    - `slides` slides cycling through the first `layouts` layouts
+      (unused layouts are removed, so the template has exactly that many)
+    - `shapes_per_slide` extra text boxes on every slide
+    - `images` distinct images of `image_px` x 3/4 `image_px` pixels,
+      spread round-robin over the slides
+    """
+    prs = Presentation()
+    all_layouts = list(prs.slide_layouts)
+    used_layouts = [all_layouts[i] for i in _LAYOUT_ORDER[:max(1, min(layouts, len(all_layouts)))]]
+
+    for i in range(slides):
+        slide = prs.slides.add_slide(used_layouts[i % len(used_layouts)])
+        if slide.shapes.title is not None:
+            slide.shapes.title.text = f"Template slide {i + 1}"
+        for j in range(shapes_per_slide):
+            box = slide.shapes.add_textbox(
+                Inches(0.2 + (j % 8) * 1.2), Inches(5.5 + (j // 8 % 6) * 0.3), Inches(1.1), Inches(0.3)
+            )
+            box.text_frame.text = f"Shape {j + 1}"
+            box.text_frame.paragraphs[0].runs[0].font.size = Pt(8)
+
+    slide_list = list(prs.slides)
+    for k in range(images):
+        blob = make_image(image_px, image_px * 3 // 4, seed + k)
+        slide = slide_list[k % len(slide_list)]
+        slide.shapes.add_picture(io.BytesIO(blob), Inches(0.2 + (k % 6) * 1.5), Inches(0.2), width=Inches(1.2))
+
+    for layout in all_layouts:
+        if layout not in used_layouts:
+            prs.slide_layouts.remove(layout)
+
+    out = io.BytesIO()
+    prs.save(out)
+    return out.getvalue()
@@ -0,0 +1,31 @@
+from app.services.prompt_compactor import compact_text, remove_boilerplate_lines
+
+
+REGIONS = (
+    "Results by region\n\n"
+    "North\nRevenue\n120\nGrowth\n15\n\n"
+    "South\nRevenue\n95\nGrowth\n8\n\n"
+    "West\nRevenue\n70\nGrowth\n4"
+)
+
+
+def test_repeated_labels_and_figures_survive():
+    assert remove_boilerplate_lines(REGIONS) == REGIONS
+
+
+def test_repeated_labels_and_figures_survive_compaction(monkeypatch):
+    monkeypatch.setattr("app.config.PROMPT_COMPACTION_ENABLED", True)
+    assert compact_text(REGIONS) == REGIONS
+
+
+def test_running_headers_and_page_numbers_are_dropped():
+    pages = [
+        "ACME Annual Report\nConfidential\nIntro\nRevenue\n120\n1",
+        "ACME Annual Report\nConfidential\nOutlook\nRevenue\n95\n2",
+        "ACME Annual Report\nConfidential\nRisks\nRevenue\n70\n3",
+    ]
+    assert remove_boilerplate_lines("\n\f\n".join(pages)) == (
+        "ACME Annual Report\nConfidential\nIntro\nRevenue\n120\n\n"
+        "Outlook\nRevenue\n95\n\n"
+        "Risks\nRevenue\n70"
+    )